@@ -22,10 +22,12 @@ be merged into an IPA product.
 
 import os
 import re
-import subprocess
 import sys
 import zipfile
 
+from tools.wrapper_common import macho
+from tools.wrapper_common import macho_metadata
+
 def normalize_clang_lip_path(path, local_developer_dir):
   return re.sub(".*\.app/Contents/Developer",
                 local_developer_dir,
@@ -63,7 +65,7 @@ class ClangRuntimeTool(object):
     self._binary_path = binary_path
     self._output_zip_path = output_zip_path
 
-  def _get_xcode_clang_path_and_clang_libs(self, objdump_output):
+  def _get_xcode_clang_path_and_clang_libs(self, link_info):
     """Returns the path to the clang directory inside of Xcode.
 
     Each version of Xcode comes with clang packaged under a versioned directory
@@ -83,7 +85,7 @@ class ClangRuntimeTool(object):
     any version of Xcode, installed into any location on the system.
 
     Args:
-      header: A Mach-O header object to parse.
+      link_info: The macho.LinkInfo of the binary.
 
     Returns:
       A tuple with the first element as a string representing the path to the
@@ -91,40 +93,28 @@ class ClangRuntimeTool(object):
       element as a set of library names.
     """
     found_rpath = None
+    for rpath in link_info.rpaths:
+      if not rpath.startswith("@") and "lib/clang" in rpath:
+        found_rpath = rpath
+
     libs = set()
-    for index, line in enumerate(objdump_output):
-      if line.endswith(" LC_RPATH"):
-        rpath_line = objdump_output[index + 2].strip()
-        rpath_segments = rpath_line.split(" ")
-        if len(rpath_segments) != 4:
-          raise ClangRuntimeToolError("Unexpected objdump format.")
-        rpath = rpath_segments[1]
-        if not rpath.startswith("@") and "lib/clang" in rpath:
-          found_rpath = rpath
-      elif line.endswith(" LC_LOAD_DYLIB"):
-        # TODO(b/249129510): Make sure we have test coverage for this case when
-        # LC_RPATH is absent from the objdump output.
-        library_line = objdump_output[index + 2].strip()
-        library_segments = library_line.split(" ")
-        if len(library_segments) != 4:
-          raise ClangRuntimeToolError("Unexpected objdump format.")
-        library = library_segments[1]
-        if library.startswith("@rpath/libclang_rt"):
-          libs.add(library[len("@rpath/"):])
+    for library in link_info.dylibs:
+      if library.startswith("@rpath/libclang_rt"):
+        libs.add(library[len("@rpath/"):])
 
     return found_rpath, libs
 
   def run(self):
-    objdump_args = [
-        "xcrun", "llvm-objdump", "--macho", "--private-headers",
-        "--non-verbose", binary_path
-    ]
-    objdump_output = subprocess.check_output(objdump_args,
-                                             encoding="utf8",
-                                             errors="replace")
-    objdump_output = [x.strip() for x in objdump_output.splitlines()]
+    # The load commands are read directly instead of parsing the output of
+    # `llvm-objdump --private-headers`, which is slow for the large binaries
+    # sanitizers produce.
+    try:
+      link_info = macho_metadata.link_info(self._binary_path)
+    except (OSError, macho.MachOError) as e:
+      raise ClangRuntimeToolError(
+          "Could not read the load commands of %s: %s" % (self._binary_path, e))
     clang_lib_path, clang_libraries = self._get_xcode_clang_path_and_clang_libs(
-        objdump_output)
+        link_info)
     if not clang_lib_path:
       raise ClangRuntimeToolError("Could not find clang library path.")
 
@@ -135,7 +125,8 @@ class ClangRuntimeTool(object):
     if "DEVELOPER_DIR" in os.environ:
       clang_lib_path = normalize_clang_lip_path(clang_lib_path, os.environ["DEVELOPER_DIR"])
 
-    with zipfile.ZipFile(out_path, "w", strict_timestamps=False) as out_zip:
+    with zipfile.ZipFile(
+        self._output_zip_path, "w", strict_timestamps=False) as out_zip:
       for lib in clang_libraries:
         full_path = os.path.join(clang_lib_path, lib)
         if os.path.exists(full_path):
@@ -1,7 +1,12 @@
 import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
+import zipfile
 
-from tools.clangrttool.clangrttool import normalize_clang_lip_path, ClangRuntimeToolError
+from tools.clangrttool.clangrttool import normalize_clang_lip_path, ClangRuntimeTool, ClangRuntimeToolError
+from tools.wrapper_common import macho_test_utils
 
 clang_lib_path_common = "Toolchains/XcodeDefault.xctoolchain/usr/lib/clang/14.0.0/lib/darwin"
 xcode_developer_dir_default = "/Applications/Xcode.app/Contents/Developer"
@@ -76,5 +81,57 @@ class ClangRuntimeToolTest(unittest.TestCase):
       remote=non_xcode_developer_dir
     )
 
+
+_LC_LOAD_DYLIB = macho_test_utils.LC_LOAD_DYLIB
+_LC_RPATH = macho_test_utils.LC_RPATH
+
+_path_command = macho_test_utils.path_command
+
+
+class ClangRuntimeToolRunTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self._tmp_dir)
+    self._clang_lib_path = os.path.join(
+        self._tmp_dir, "lib/clang/17/lib/darwin")
+    os.makedirs(self._clang_lib_path)
+    self._binary_path = os.path.join(self._tmp_dir, "binary")
+    self._zip_path = os.path.join(self._tmp_dir, "out.zip")
+
+  def _run(self, *load_commands):
+    with open(self._binary_path, "wb") as f:
+      f.write(macho_test_utils.thin_macho(
+          macho_test_utils.ARM64, load_commands,
+          filetype=macho_test_utils.MH_EXECUTE))
+    with mock.patch.dict(os.environ):
+      os.environ.pop("DEVELOPER_DIR", None)
+      ClangRuntimeTool(self._binary_path, self._zip_path).run()
+
+  def test_packages_referenced_runtime_libraries(self):
+    lib = "libclang_rt.asan_ios_dynamic.dylib"
+    with open(os.path.join(self._clang_lib_path, lib), "wb") as f:
+      f.write(b"asan")
+    self._run(
+        _path_command(_LC_RPATH, "@executable_path/Frameworks"),
+        _path_command(_LC_RPATH, self._clang_lib_path),
+        _path_command(_LC_LOAD_DYLIB, "/usr/lib/libSystem.B.dylib"),
+        _path_command(_LC_LOAD_DYLIB, "@rpath/" + lib))
+    with zipfile.ZipFile(self._zip_path) as z:
+      self.assertEqual([lib], z.namelist())
+      self.assertEqual(b"asan", z.read(lib))
+
+  def test_missing_clang_rpath(self):
+    with self.assertRaisesRegex(ClangRuntimeToolError, "clang library path"):
+      self._run(_path_command(
+          _LC_LOAD_DYLIB, "@rpath/libclang_rt.tsan_osx_dynamic.dylib"))
+
+  def test_not_a_binary(self):
+    with open(self._binary_path, "w") as f:
+      f.write("not a binary")
+    with self.assertRaisesRegex(ClangRuntimeToolError, "load commands"):
+      ClangRuntimeTool(self._binary_path, self._zip_path).run()
+
 if __name__ == '__main__':
   unittest.main()
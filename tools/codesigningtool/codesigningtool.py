@@ -15,7 +15,9 @@
 
 import argparse
 import base64
+import concurrent.futures
 import datetime
+import hashlib
 import os
 import plistlib
 import re
@@ -23,7 +25,11 @@ import subprocess
 import sys
 from typing import Optional, Union
 
+from tools.wrapper_common import caching
 from tools.wrapper_common import execute
+from tools.wrapper_common import identity_cache
+from tools.wrapper_common import toolchain
+from tools.wrapper_common import x509
 
 
 # Regex with benign codesign messages that can be safely ignored.
@@ -40,28 +46,29 @@ _BENIGN_CODESIGN_OUTPUT_REGEX = re.compile(
     r"(signed.*Mach-O (universal|thin)|: replacing existing signature|signed generic|Executable=/|Warning: --resource-rules has been deprecated)"
 )
 
+# The maximum number of codesign invocations to run at the same time. Signing
+# is mostly CPU bound (hashing every page of every binary).
+_MAX_SIGNING_JOBS = os.cpu_count() or 1
 
-def _find_codesign_allocate():
-  cmd = ["xcrun", "--find", "codesign_allocate"]
-  _, stdout, _ = execute.execute_and_filter_output(cmd, raise_on_failure=True)
-  return stdout.strip()
+# Where successful `codesign --verify` results are remembered, see
+# _verify_signature. The cache is disabled when this isn't set.
+_VERIFY_CACHE_DIR_ENV = "CODESIGN_VERIFY_CACHE_DIR"
 
 
-def invoke_codesign(*, codesign_path, identity, entitlements, force_signing,
-                    disable_timestamp, full_path_to_sign, extra):
-  """Invokes the codesign tool on the given path to sign.
+def _codesign(*, codesign_path, identity, entitlements, force_signing,
+              disable_timestamp, full_path_to_sign, extra):
+  """Runs the codesign tool on the given path to sign, without printing.
 
   Args:
-    codesign_path: Path to the codesign tool as a string.
-    identity: The unique identifier string to identify code signatures.
-    entitlements: Path to the file with entitlement data. Optional.
-    force_signing: If true, replaces any existing signature on the path given.
-    disable_timestamp: If true, disables the use of timestamp services.
-    full_path_to_sign: Path to the bundle or binary to code sign as a string.
+    See invoke_codesign.
+
+  Returns:
+    A tuple of the filtered stdout and stderr output of the codesign tool.
 
   Raises:
     subprocess.CalledProcessError: For any non-zero return codes reported from
-        invoking the codesign tool against the given inputs.
+        invoking the codesign tool against the given inputs. Its output and
+        stderr attributes hold the unfiltered output of the tool.
   """
   cmd = [codesign_path, "-v", "--sign", identity]
   if entitlements:
@@ -79,18 +86,112 @@ def invoke_codesign(*, codesign_path, identity, entitlements, force_signing,
 
   # Just like Xcode, ensure CODESIGN_ALLOCATE is set to point to the correct
   # version.
-  custom_env = {"CODESIGN_ALLOCATE": _find_codesign_allocate()}
-  _, stdout, stderr = execute.execute_and_filter_output(cmd,
-                                                        custom_env=custom_env,
-                                                        raise_on_failure=True)
-  if stdout:
-    filtered_stdout = _filter_codesign_output(stdout)
-    if filtered_stdout:
-      print(filtered_stdout)
-  if stderr:
-    filtered_stderr = _filter_codesign_output(stderr)
-    if filtered_stderr:
-      print(filtered_stderr)
+  custom_env = {"CODESIGN_ALLOCATE": toolchain.find_tool("codesign_allocate")}
+  # Failures are reported by the caller, so that the output of concurrent
+  # invocations isn't interleaved.
+  result, stdout, stderr = execute.execute_and_filter_output(
+      cmd, custom_env=custom_env)
+  if result != 0:
+    raise subprocess.CalledProcessError(
+        result, cmd, output=stdout, stderr=stderr)
+  return _filter_codesign_output(stdout), _filter_codesign_output(stderr)
+
+
+def _print_codesign_output(filtered_stdout, filtered_stderr):
+  if filtered_stdout:
+    print(filtered_stdout)
+  if filtered_stderr:
+    print(filtered_stderr)
+
+
+def _print_codesign_error(error):
+  # Matches what execute.execute_and_filter_output prints on failure.
+  print("ERROR:{stdout}\n\n{stderr}".format(stdout=error.output,
+                                             stderr=error.stderr))
+
+
+def invoke_codesign(*, codesign_path, identity, entitlements, force_signing,
+                    disable_timestamp, full_path_to_sign, extra):
+  """Invokes the codesign tool on the given path to sign.
+
+  Args:
+    codesign_path: Path to the codesign tool as a string.
+    identity: The unique identifier string to identify code signatures.
+    entitlements: Path to the file with entitlement data. Optional.
+    force_signing: If true, replaces any existing signature on the path given.
+    disable_timestamp: If true, disables the use of timestamp services.
+    full_path_to_sign: Path to the bundle or binary to code sign as a string.
+
+  Raises:
+    subprocess.CalledProcessError: For any non-zero return codes reported from
+        invoking the codesign tool against the given inputs.
+  """
+  try:
+    output = _codesign(
+        codesign_path=codesign_path,
+        identity=identity,
+        entitlements=entitlements,
+        force_signing=force_signing,
+        disable_timestamp=disable_timestamp,
+        full_path_to_sign=full_path_to_sign,
+        extra=extra,
+    )
+  except subprocess.CalledProcessError as e:
+    _print_codesign_error(e)
+    raise
+  _print_codesign_output(*output)
+
+
+def _are_independent(paths):
+  """Returns True if none of the paths is nested in another one."""
+  # Every pair is compared, as siblings such as "App.bundle" sort between
+  # "App" and "App/Frameworks".
+  paths = [os.path.normpath(p) for p in paths]
+  return not any(
+      b.startswith(a + os.sep) for a in paths for b in paths if a != b)
+
+
+def _sign_paths(paths_to_sign, **codesign_args):
+  """Signs the given paths, concurrently when they are independent.
+
+  Output is printed in the order of paths_to_sign, as if the paths had been
+  signed one after the other. Paths that are nested in one another (only
+  possible with several --target_to_sign) are signed one after the other, in
+  the order given.
+
+  Args:
+    paths_to_sign: The paths to sign.
+    **codesign_args: The arguments of invoke_codesign, other than
+      full_path_to_sign.
+
+  Raises:
+    subprocess.CalledProcessError: For the first path, in the order of
+        paths_to_sign, that failed to be signed. Paths after it that haven't
+        started to be signed yet are skipped.
+  """
+  if not paths_to_sign:
+    # Every path may already be signed, e.g. when all frameworks are
+    # pre-signed.
+    return
+  if _are_independent(paths_to_sign):
+    max_workers = min(_MAX_SIGNING_JOBS, len(paths_to_sign))
+  else:
+    max_workers = 1
+  with concurrent.futures.ThreadPoolExecutor(
+      max_workers=max_workers) as executor:
+    futures = [
+        executor.submit(_codesign, full_path_to_sign=path, **codesign_args)
+        for path in paths_to_sign
+    ]
+    for index, future in enumerate(futures):
+      try:
+        output = future.result()
+      except subprocess.CalledProcessError as e:
+        for pending in futures[index + 1:]:
+          pending.cancel()
+        _print_codesign_error(e)
+        raise
+      _print_codesign_output(*output)
 
 
 def plist_from_bytes(byte_content):
@@ -114,39 +215,10 @@ def _parse_mobileprovision_file(mobileprovision_file):
 
 def _certificate_fingerprint(identity):
   """Extracts a fingerprint given identity in a mobileprovision file."""
-  _, fingerprint, _ = execute.execute_and_filter_output([
-      "openssl",
-      "x509",
-      "-sha1",
-      "-inform",
-      "DER",
-      "-noout",
-      "-fingerprint",
-  ], inputstr=identity, raise_on_failure=True)
-  fingerprint = fingerprint.strip()
-  fingerprint = re.sub("sha1 Fingerprint=", "", fingerprint, flags=re.IGNORECASE)
-  fingerprint = fingerprint.replace(":", "")
-  return fingerprint
+  return x509.fingerprint(identity)
 
 def _certificate_common_name(cert):
-  _, subject, _ = execute.execute_and_filter_output([
-    "openssl",
-    "x509",
-    "-noout",
-    "-inform",
-    "DER",
-    "-subject"
-  ], inputstr=cert, raise_on_failure=True)
-  subject = subject.strip().split('/')
-  cert_cn = [f for f in subject if "CN=" in f]
-
-  if len(cert_cn) == 0:
-    return None
-
-  cert_cn = cert_cn[0]
-  cert_cn = cert_cn.replace("CN=", "")
-
-  return cert_cn
+  return x509.common_name(cert)
 
 def _get_identities_from_provisioning_profile(mpf):
   """Iterates through all the identities in a provisioning profile, lazily."""
@@ -257,6 +329,17 @@ def _find_smartcard_identities(identity=None):
   return ids
 
 def _find_codesign_identities(identity=None):
+  """Finds code signing identities on the current system.
+
+  The result is shared with other signing actions for a short time, see
+  identity_cache.
+  """
+  return identity_cache.cached_identities(
+      ["codesigningtool", identity, identity_cache.keychains_state()],
+      lambda: _find_codesign_identities_uncached(identity))
+
+
+def _find_codesign_identities_uncached(identity=None):
   """Finds code signing identities on the current system."""
   ids = []
   _, output, _ = execute.execute_and_filter_output([
@@ -331,6 +414,33 @@ def _all_paths_to_sign(targets_to_sign, directories_to_sign):
   return all_paths_to_sign
 
 
+def _verify_signature(codesign_path, signed_path):
+  """Returns True if the signature of signed_path is valid.
+
+  Successful verifications are remembered by the content of the signed path,
+  so unchanged pre-signed frameworks are only verified once across builds.
+  """
+  cache_dir = caching.trusted_cache_dir(os.environ.get(_VERIFY_CACHE_DIR_ENV))
+  entry = None
+  if cache_dir:
+    key = "%s\0%s" % (codesign_path, caching.tree_digest(signed_path))
+    entry = os.path.join(
+        cache_dir, hashlib.sha256(key.encode("utf-8")).hexdigest())
+    if os.path.exists(entry):
+      return True
+
+  result = subprocess.run(
+      [codesign_path, "--verify", signed_path],
+      capture_output=True,
+  )
+  if result.returncode != 0:
+    return False
+  if entry:
+    # Entries are empty, what matters is that they exist.
+    caching.write_atomically(entry, lambda f: None)
+  return True
+
+
 def _filter_paths_already_signed(all_paths_to_sign, signed_paths,
                                   codesign_path):
   if set(signed_paths) - set(all_paths_to_sign):
@@ -346,19 +456,19 @@ def _filter_paths_already_signed(all_paths_to_sign, signed_paths,
   # after it was signed, invalidating the signature. Such frameworks need to
   # be re-signed with the correct identity instead of being skipped.
   # See: https://github.com/bazelbuild/rules_apple/issues/1953
+  paths_to_verify = [p for p in signed_paths if p in all_paths_to_sign]
   verified_signed_paths = set()
-  for signed_path in signed_paths:
-    if signed_path not in all_paths_to_sign:
-      continue
-    result = subprocess.run(
-        [codesign_path, "--verify", signed_path],
-        capture_output=True,
-    )
-    if result.returncode == 0:
-      verified_signed_paths.add(signed_path)
-    else:
-      print("Re-signing %s (existing signature is invalid, likely modified "
-            "by a post-processor)" % signed_path)
+  if paths_to_verify:
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(_MAX_SIGNING_JOBS, len(paths_to_verify))) as executor:
+      verified = executor.map(
+          lambda p: _verify_signature(codesign_path, p), paths_to_verify)
+      for signed_path, is_valid in zip(paths_to_verify, verified):
+        if is_valid:
+          verified_signed_paths.add(signed_path)
+        else:
+          print("Re-signing %s (existing signature is invalid, likely "
+                "modified by a post-processor)" % signed_path)
 
   return [p for p in all_paths_to_sign if p not in verified_signed_paths]
 
@@ -455,16 +565,15 @@ def find_identity_and_sign_bundle_paths(args: argparse.Namespace) -> int:
                                                      signed_path,
                                                      args.codesign)
 
-  for path_to_sign in all_paths_to_sign:
-    invoke_codesign(
-        codesign_path=args.codesign,
-        identity=identity,
-        entitlements=args.entitlements,
-        force_signing=args.force,
-        disable_timestamp=args.disable_timestamp,
-        full_path_to_sign=path_to_sign,
-        extra=extra,
-    )
+  _sign_paths(
+      all_paths_to_sign,
+      codesign_path=args.codesign,
+      identity=identity,
+      entitlements=args.entitlements,
+      force_signing=args.force,
+      disable_timestamp=args.disable_timestamp,
+      extra=extra,
+  )
 
   return 0
 
@@ -0,0 +1,248 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for codesigningtool."""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from tools.codesigningtool import codesigningtool
+from tools.wrapper_common import execute
+from tools.wrapper_common import toolchain
+
+
+def _args(**kwargs):
+  values = {
+      "target_to_sign": None,
+      "directory_to_sign": None,
+      "mobileprovision": None,
+      "codesign": "/usr/bin/codesign",
+      "identity": "-",
+      "signed_path": None,
+      "entitlements": None,
+      "force": True,
+      "disable_timestamp": True,
+      "extra": [],
+  }
+  values.update(kwargs)
+  return argparse.Namespace(**values)
+
+
+class SignBundlePathsTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self._tmp_dir)
+    self._frameworks = os.path.join(self._tmp_dir, "Frameworks")
+    os.mkdir(self._frameworks)
+    for name in ("A.framework", "B.framework", "C.framework"):
+      os.mkdir(os.path.join(self._frameworks, name))
+
+    find_tool = mock.patch.object(
+        toolchain, "find_tool", return_value="/usr/bin/codesign_allocate")
+    find_tool.start()
+    self.addCleanup(find_tool.stop)
+
+  def _sign(self, execute_side_effect, **kwargs):
+    stdout = io.StringIO()
+    with mock.patch.object(
+        execute, "execute_and_filter_output",
+        side_effect=execute_side_effect) as execute_mock:
+      with contextlib.redirect_stdout(stdout):
+        result = codesigningtool.find_identity_and_sign_bundle_paths(
+            _args(**kwargs))
+    return result, execute_mock, stdout.getvalue()
+
+  def test_independent_paths_are_signed_concurrently(self):
+    barrier = threading.Barrier(3, timeout=10)
+
+    def codesign(cmd, custom_env):
+      del custom_env  # Unused.
+      # Deadlocks (and times out) unless all three run at the same time.
+      barrier.wait()
+      return 0, "", "warning for %s" % os.path.basename(cmd[-1])
+
+    with mock.patch.object(codesigningtool, "_MAX_SIGNING_JOBS", 3):
+      result, execute_mock, output = self._sign(
+          codesign, directory_to_sign=[self._frameworks])
+    self.assertEqual(0, result)
+    self.assertEqual(3, execute_mock.call_count)
+    # Output follows the order of the paths to sign.
+    self.assertEqual(
+        "".join("warning for %s\n" % x
+                for x in os.listdir(self._frameworks)),
+        output)
+
+  def test_output_is_reported_in_path_order(self):
+    targets = [os.path.join(self._frameworks, x)
+               for x in ("C.framework", "A.framework", "B.framework")]
+    release_first = threading.Event()
+
+    def codesign(cmd, custom_env):
+      del custom_env  # Unused.
+      if cmd[-1] == targets[0]:
+        # Finish the first path last.
+        release_first.wait(timeout=10)
+      elif cmd[-1] == targets[2]:
+        release_first.set()
+      return 0, "", "warning for %s" % os.path.basename(cmd[-1])
+
+    with mock.patch.object(codesigningtool, "_MAX_SIGNING_JOBS", 3):
+      result, _, output = self._sign(codesign, target_to_sign=targets)
+    self.assertEqual(0, result)
+    self.assertEqual(
+        "warning for C.framework\n"
+        "warning for A.framework\n"
+        "warning for B.framework\n", output)
+
+  def test_first_failure_in_path_order_is_raised(self):
+    targets = [os.path.join(self._frameworks, x)
+               for x in ("A.framework", "B.framework", "C.framework")]
+
+    def codesign(cmd, custom_env):
+      del custom_env  # Unused.
+      if cmd[-1] == targets[0]:
+        return 0, "", "warning for A"
+      return 1, "", "failed %s" % os.path.basename(cmd[-1])
+
+    with self.assertRaises(subprocess.CalledProcessError) as e:
+      self._sign(codesign, target_to_sign=targets)
+    self.assertEqual(targets[1], e.exception.cmd[-1])
+
+  def test_nested_paths_are_signed_in_order(self):
+    framework = os.path.join(self._frameworks, "A.framework")
+    # The sibling sorts between the framework and the path nested in it.
+    targets = [os.path.join(framework, "Versions"), framework + ".dSYM",
+               framework]
+    in_flight = []
+    lock = threading.Lock()
+
+    def codesign(cmd, custom_env):
+      del custom_env  # Unused.
+      with lock:
+        in_flight.append(cmd[-1])
+      # Gives concurrently signed paths a chance to overlap.
+      time.sleep(0.05)
+      with lock:
+        self.assertEqual([cmd[-1]], in_flight)
+        in_flight.remove(cmd[-1])
+      return 0, "", ""
+
+    with mock.patch.object(codesigningtool, "_MAX_SIGNING_JOBS", 3):
+      result, execute_mock, _ = self._sign(codesign, target_to_sign=targets)
+    self.assertEqual(0, result)
+    self.assertEqual(targets, [c.args[0][-1]
+                               for c in execute_mock.call_args_list])
+
+
+class FilterPathsAlreadySignedTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self._tmp_dir)
+    self._frameworks = []
+    for name in ("A.framework", "B.framework"):
+      framework = os.path.join(self._tmp_dir, name)
+      os.mkdir(framework)
+      with open(os.path.join(framework, "binary"), "wb") as f:
+        f.write(name.encode())
+      self._frameworks.append(framework)
+    self._unsigned = os.path.join(self._tmp_dir, "C.framework")
+
+    environ = mock.patch.dict(os.environ, {
+        codesigningtool._VERIFY_CACHE_DIR_ENV: os.path.join(
+            self._tmp_dir, "cache"),
+    })
+    environ.start()
+    self.addCleanup(environ.stop)
+    run = mock.patch.object(
+        subprocess, "run",
+        return_value=subprocess.CompletedProcess([], 0))
+    self._run = run.start()
+    self.addCleanup(run.stop)
+
+  def _filter(self):
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+      paths = codesigningtool._filter_paths_already_signed(
+          self._frameworks + [self._unsigned], self._frameworks,
+          "/usr/bin/codesign")
+    return paths, stdout.getvalue()
+
+  def test_valid_signatures_are_skipped(self):
+    self.assertEqual([self._unsigned], self._filter()[0])
+    self.assertEqual(2, self._run.call_count)
+
+  def test_invalid_signatures_are_signed_again(self):
+    self._run.side_effect = lambda cmd, **_: subprocess.CompletedProcess(
+        cmd, 1 if cmd[-1] == self._frameworks[1] else 0)
+    paths, output = self._filter()
+    self.assertEqual([self._frameworks[1], self._unsigned], paths)
+    self.assertIn("Re-signing %s" % self._frameworks[1], output)
+
+  def test_unchanged_signatures_are_verified_once(self):
+    self._filter()
+    self.assertEqual([self._unsigned], self._filter()[0])
+    self.assertEqual(2, self._run.call_count)
+
+  def test_modified_frameworks_are_verified_again(self):
+    self._filter()
+    with open(os.path.join(self._frameworks[0], "binary"), "ab") as f:
+      f.write(b"post-processed")
+    self._filter()
+    self.assertEqual(3, self._run.call_count)
+    self.assertEqual(
+        self._frameworks[0], self._run.call_args_list[-1].args[0][-1])
+
+  def test_nothing_is_signed_when_all_signatures_are_valid(self):
+    find_tool = mock.patch.object(
+        toolchain, "find_tool", return_value="/usr/bin/codesign_allocate")
+    find_tool.start()
+    self.addCleanup(find_tool.stop)
+    args = _args(target_to_sign=self._frameworks,
+                 signed_path=self._frameworks)
+    with mock.patch.object(
+        execute, "execute_and_filter_output") as execute_mock:
+      with contextlib.redirect_stdout(io.StringIO()):
+        result = codesigningtool.find_identity_and_sign_bundle_paths(args)
+    self.assertEqual(0, result)
+    execute_mock.assert_not_called()
+
+  def test_invalid_signatures_are_not_cached(self):
+    self._run.return_value = subprocess.CompletedProcess([], 1)
+    self._filter()
+    self._run.return_value = subprocess.CompletedProcess([], 0)
+    self.assertEqual([self._unsigned], self._filter()[0])
+    self.assertEqual(4, self._run.call_count)
+
+  def test_verifications_are_only_cached_when_asked_to(self):
+    with mock.patch.dict(os.environ):
+      del os.environ[codesigningtool._VERIFY_CACHE_DIR_ENV]
+      self._filter()
+      self._filter()
+    self.assertEqual(4, self._run.call_count)
+    self.assertFalse(os.path.exists(os.path.join(self._tmp_dir, "cache")))
+
+
+if __name__ == "__main__":
+  unittest.main()
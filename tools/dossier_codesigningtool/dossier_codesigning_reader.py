@@ -57,8 +57,11 @@ To use this script with a dossier directly within an extracted ipa's app bundle:
 """
 
 import argparse
+import base64
 import collections
 import concurrent.futures
+import contextlib
+import fcntl
 import glob
 import hashlib
 import io
@@ -67,10 +70,16 @@ import os
 import plistlib
 import re
 import shutil
+import stat
+import struct
 import subprocess
 import sys
 import tempfile
+import threading
+import time
 import traceback
+import zipfile
+import zlib
 
 _MACOS = sys.platform == "darwin"
 
@@ -194,24 +203,123 @@ class DossierDirectory(object):
       shutil.rmtree(self.path)
 
 
-SigningFuture = collections.namedtuple('SigningFuture', ['future', 'note'])
+class SigningTask(object):
+  """A codesign invocation in a SigningGraph.
 
+  Attributes:
+    index: The position of the task in its graph. Tasks that finish at the
+      same time are handled, and failures are reported, in this order.
+    note: Text describing the task, printed when it is scheduled and when it
+      fails.
+    function: The function to call.
+    args: Tuple of positional arguments for function.
+    kwargs: Dict of keyword arguments for function.
+    dependencies: The SigningTasks that must succeed before this one can run.
+    dependents: The SigningTasks that depend on this one; when it succeeds,
+      those whose dependencies have all succeeded become ready to run.
+  """
 
-def submit_future(note, executor, function, *args, **kwargs) -> SigningFuture:
-  """Runs a function and creates a SigningFuture with the given note.
+  def __init__(self, index, note, function, args, kwargs, dependencies):
+    self.index = index
+    self.note = note
+    self.function = function
+    self.args = args
+    self.kwargs = kwargs
+    self.dependencies = list(dependencies)
+    self.dependents = []
 
-  Args:
-    note: Text which is attached to this future for debugging
-    executor: concurrent.futures.Executor instance to use.
-    function: The function to call.
-    *args: Tuple of positional arguments for function.
-    **kwargs: Dict of keyword arguments for function.
 
-  Returns:
-    The SigningFuture object.
+class SigningGraph(object):
+  """Runs codesign invocations once everything nested in their path is signed.
+
+  The whole graph is built before anything runs, and tasks are only handed to
+  the thread pool once all of their dependencies have succeeded, so workers
+  never wait on other tasks and any concurrency limit can sign any bundle
+  tree.
   """
-  print('Submitting task to threadpool: %s' % note)
-  return SigningFuture(executor.submit(function, *args, **kwargs), note)
+
+  def __init__(self):
+    self._tasks = []
+
+  @property
+  def tasks(self):
+    """The SigningTasks of the graph, in the order they were added."""
+    return list(self._tasks)
+
+  def add(self, note, function, *args, dependencies=(), **kwargs):
+    """Adds a task to the graph.
+
+    Args:
+      note: Text which is attached to this task for debugging.
+      function: The function to call.
+      *args: Tuple of positional arguments for function.
+      dependencies: The SigningTasks that must succeed before this one runs.
+      **kwargs: Dict of keyword arguments for function.
+
+    Returns:
+      The SigningTask, to be used as a dependency of other tasks.
+    """
+    task = SigningTask(len(self._tasks), note, function, args, kwargs,
+                       dependencies)
+    for dependency in task.dependencies:
+      dependency.dependents.append(task)
+    self._tasks.append(task)
+    return task
+
+  def run(self, max_workers=None):
+    """Runs all tasks, leaves first.
+
+    Args:
+      max_workers: The maximum number of tasks to run at the same time. If
+        None, uses the default of concurrent.futures.ThreadPoolExecutor.
+
+    Raises:
+      The exception of the first task, in the order tasks were added, that
+      failed. Tasks that haven't started when a task fails are cancelled.
+    """
+    pending_dependencies = {
+        task: len(task.dependencies) for task in self._tasks}
+    ready = [task for task in self._tasks if not task.dependencies]
+    running = {}
+    failures = []
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers) as executor:
+      while ready or running:
+        for task in ready:
+          print('Submitting task to threadpool: %s' % task.note)
+          future = executor.submit(task.function, *task.args, **task.kwargs)
+          running[future] = task
+        ready = []
+
+        if failures:
+          # Stop scheduling, and let the tasks already running finish.
+          for future in list(running):
+            if future.cancel():
+              del running[future]
+          return_when = concurrent.futures.ALL_COMPLETED
+        else:
+          return_when = concurrent.futures.FIRST_COMPLETED
+        done, _ = concurrent.futures.wait(running, return_when=return_when)
+
+        for future in sorted(done, key=lambda f: running[f].index):
+          task = running.pop(future)
+          if future.exception():
+            failures.append((task, future.exception()))
+            continue
+          for dependent in task.dependents:
+            pending_dependencies[dependent] -= 1
+            if not pending_dependencies[dependent]:
+              ready.append(dependent)
+        if failures:
+          ready = []
+
+    if failures:
+      failures.sort(key=lambda failure: failure[0].index)
+      print('Codesign task(s) failed:\n' +
+            '\n\n'.join(f'\t{i}) {repr(task.note)}\n{repr(exception)}'
+                        for i, (task, exception) in enumerate(
+                            failures, start=1)))
+      raise failures[0][1]
 
 
 # Regex with benign codesign messages that can be safely ignored.
@@ -235,6 +343,34 @@ EMBEDDED_RELATIVE_PATH_KEY = 'embedded_relative_path'
 # Regex which matches the 40 char hash
 _SECURITY_FIND_IDENTITY_OUTPUT_REGEX = re.compile(r'(?P<hash>[A-F0-9]{40})')
 
+# Matches the base64 body of a PEM encoded certificate.
+_PEM_CERTIFICATE_REGEX = re.compile(
+    rb'-----BEGIN CERTIFICATE-----(.*?)-----END CERTIFICATE-----', re.DOTALL)
+
+# LINT.IfChange
+# Tags of the string types that can hold attribute values in a Name.
+_X509_STRING_DECODERS = {
+    0x0C: lambda x: x.decode('utf-8'),  # UTF8String
+    0x13: lambda x: x.decode('ascii'),  # PrintableString
+    0x14: lambda x: x.decode('latin-1'),  # TeletexString
+    0x16: lambda x: x.decode('ascii'),  # IA5String
+    0x1C: lambda x: x.decode('utf-32-be'),  # UniversalString
+    0x1E: lambda x: x.decode('utf-16-be'),  # BMPString
+}
+
+# DER encoded OIDs of subject attributes -> the short names OpenSSL uses.
+_X509_ATTRIBUTE_NAMES = {
+    bytes.fromhex('550403'): 'CN',
+    bytes.fromhex('550406'): 'C',
+    bytes.fromhex('550407'): 'L',
+    bytes.fromhex('550408'): 'ST',
+    bytes.fromhex('55040a'): 'O',
+    bytes.fromhex('55040b'): 'OU',
+    bytes.fromhex('0992268993f22c640101'): 'UID',
+    bytes.fromhex('2a864886f70d010901'): 'emailAddress',
+}
+# LINT.ThenChange(../wrapper_common/x509.py)
+
 # The filename for a manifest within a manifest
 MANIFEST_FILENAME = 'manifest.json'
 
@@ -251,6 +387,18 @@ IPA_ALLOWED_SUBDIRS = [
 VALID_INPUT_EXTENSIONS = frozenset(['.zip', '.app', '.ipa'])
 
 
+def _positive_int(value):
+  """Parses a command line argument that must be an integer of at least 1."""
+  try:
+    number = int(value)
+  except ValueError:
+    number = 0
+  if number < 1:
+    raise argparse.ArgumentTypeError(
+        'must be a positive integer, got: %s' % value)
+  return number
+
+
 def generate_arg_parser():
   """Generates an argument parser for this tool."""
 
@@ -294,6 +442,21 @@ keychain file specified. This is equivalent to the --keychain argument on
       help='''
 If specified, during signing, only search for the signing identity in `.cer`
 files in the directory specified.
+''')
+  sign_parser.add_argument(
+      '--jobs',
+      type=_positive_int,
+      help='''
+The maximum number of codesign invocations to run concurrently. Defaults to a
+value based on the number of CPUs.
+''')
+  sign_parser.add_argument(
+      '--signing_cache',
+      help='''
+If specified, a directory in which to remember the files signing produced, keyed
+by the content of the unsigned bundle and the identities, entitlements and
+provisioning profiles it was signed with. Signing the same bundle with the same
+dossier again restores those files instead of invoking codesign.
 ''')
   sign_parser.set_defaults(func=_sign_bundle)
 
@@ -340,22 +503,295 @@ def _generate_sha1(data):
   return hashlib.sha1(data).hexdigest().upper()
 
 
+def _der_elements(data, start, end):
+  """Returns the (tag, content start, content end) of DER elements in a range.
+
+  This is just enough of a DER reader to walk a certificate, so that the tool
+  stays standalone and doesn't have to spawn openssl for every certificate.
+  """
+  elements = []
+  offset = start
+  while offset < end:
+    if offset + 2 > end:
+      raise ValueError('Truncated DER element at offset %d' % offset)
+    tag, length = data[offset], data[offset + 1]
+    offset += 2
+    if length & 0x80:
+      num_octets = length & 0x7F
+      length = int.from_bytes(data[offset:offset + num_octets], 'big')
+      offset += num_octets
+    if offset + length > end:
+      raise ValueError('DER element at offset %d runs past its parent' % offset)
+    elements.append((tag, offset, offset + length))
+    offset += length
+  return elements
+
+
+def _certificate_subject(der_cert):
+  """Returns a DER certificate's subject, formatted like `openssl x509`."""
+  certificate = _der_elements(der_cert, 0, len(der_cert))[0]
+  tbs_certificate = _der_elements(der_cert, *certificate[1:])[0]
+  fields = _der_elements(der_cert, *tbs_certificate[1:])
+  # version (optional, tagged [0]), serialNumber, signature, issuer, validity,
+  # subject
+  name = fields[5 if fields[0][0] == 0xA0 else 4]
+
+  attributes = []
+  for rdn in _der_elements(der_cert, *name[1:]):
+    for attribute in _der_elements(der_cert, *rdn[1:]):
+      (_, oid_start, oid_end), (value_tag, value_start, value_end) = (
+          _der_elements(der_cert, *attribute[1:]))
+      oid = bytes(der_cert[oid_start:oid_end])
+      decode = _X509_STRING_DECODERS.get(value_tag)
+      if not decode:
+        raise ValueError('Unsupported string type 0x%02x in subject' %
+                         value_tag)
+      value = decode(bytes(der_cert[value_start:value_end]))
+      attributes.append('%s = %s' % (
+          _X509_ATTRIBUTE_NAMES.get(oid, oid.hex()), value))
+  return 'subject=' + ', '.join(attributes)
+
+
 def extract_identity_hash(cer_path):
+  """Returns the SHA1 and subject of a PEM or DER encoded `.cer` file."""
+  try:
+    with open(cer_path, 'rb') as f:
+      cert = f.read()
+    match = _PEM_CERTIFICATE_REGEX.search(cert)
+    der_cert = base64.b64decode(match.group(1)) if match else cert
+    return _generate_sha1(der_cert), _certificate_subject(der_cert)
+  except (OSError, ValueError, IndexError) as e:
+    raise OSError(f'Failed to extract certificate from {cer_path}: {e}')
+
+
+# LINT.IfChange
+def _trusted_cache_dir(cache_dir):
+  '''Returns a cache directory, creating it if needed, if it can be trusted.
+
+  Args:
+    cache_dir: The path of the directory, or None or an empty string if the
+      cache is disabled.
+
+  Returns:
+    cache_dir, or None if the cache is disabled or the directory can't be
+    created or could have been written to by other users.
+  '''
+  if not cache_dir:
+    return None
   try:
-    der_cert_cmd = ['openssl', 'x509', '-in', cer_path, '-outform', 'DER']
-    der_cert = subprocess.check_output(der_cert_cmd, stderr=subprocess.STDOUT)
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    stat = os.stat(cache_dir)
+  except OSError:
+    return None
+  if stat.st_uid != os.getuid() or stat.st_mode & 0o022:
+    return None
+  return cache_dir
 
-    sha1_hash = _generate_sha1(der_cert)
 
-    subject_cmd = ['openssl', 'x509', '-in', cer_path, '-noout', '-subject']
-    subject_output = subprocess.check_output(subject_cmd, stderr=subprocess.STDOUT).decode().strip()
+def _write_atomically(path, write, mode='w'):
+  '''Replaces a file with what a callable writes, atomically.
 
-    return sha1_hash, subject_output
-  except subprocess.CalledProcessError as e:
-    raise OSError(f'Failed to extract certificate from {cer_path}: {e.output.decode()}')
+  Args:
+    path: The path of the file to replace.
+    write: A callable that writes the new contents to the file object it is
+      given.
+    mode: The mode to open the temporary file with, 'w' or 'wb'.
+
+  Returns:
+    True if the file was replaced. Failures are ignored, as caches are only an
+    optimization.
+  '''
+  try:
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+  except OSError:
+    return False
+  try:
+    with os.fdopen(fd, mode) as f:
+      write(f)
+    os.replace(temp_path, path)
+    return True
+  except OSError:
+    try:
+      os.remove(temp_path)
+    except OSError:
+      pass
+    return False
+
+
+def _file_sha256(path):
+  '''Returns the SHA-256 hex digest of the contents of a file.'''
+  digest = hashlib.sha256()
+  with open(path, 'rb') as f:
+    for chunk in iter(lambda: f.read(_ZIP_CHUNK_SIZE), b''):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
+def _tree_digest(path, max_workers=None):
+  '''Returns a digest of the names, contents and modes of a file tree.
+
+  Args:
+    path: The path of a directory, file or symlink.
+    max_workers: The maximum number of files to hash at the same time. If None,
+      uses the default of concurrent.futures.ThreadPoolExecutor.
+
+  Returns:
+    A hex digest that changes when any file, directory or symlink in the tree
+    is added, removed or modified, or when a file's executable bit changes.
+  '''
+  entries = []
+  files = []
+
+  def _add(relative_path, full_path):
+    if os.path.islink(full_path):
+      entries.append([relative_path, 'l', os.readlink(full_path)])
+    elif os.path.isdir(full_path):
+      entries.append([relative_path, 'd'])
+    else:
+      executable = bool(os.stat(full_path).st_mode & 0o111)
+      entries.append([relative_path, 'x' if executable else 'f'])
+      files.append((entries[-1], full_path))
+
+  _add('.', path)
+  if os.path.isdir(path) and not os.path.islink(path):
+    for root, dirs, file_names in os.walk(path):
+      dirs.sort()
+      for name in sorted(dirs + file_names):
+        full_path = os.path.join(root, name)
+        _add(os.path.relpath(full_path, path), full_path)
+  with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+    for (entry, _), file_digest in zip(
+        files, executor.map(_file_sha256, [f for _, f in files])):
+      entry.append(file_digest)
+  data = json.dumps(entries, ensure_ascii=False)
+  return hashlib.sha256(data.encode('utf-8', 'surrogateescape')).hexdigest()
+# LINT.ThenChange(../wrapper_common/caching.py)
+
+
+# LINT.IfChange
+_IDENTITY_CACHE_DIR_ENV = 'CODESIGN_IDENTITY_CACHE_DIR'
+_IDENTITY_CACHE_TTL_SECONDS = 120
+
+# The keychains `security find-identity` searches when none is given.
+_DEFAULT_KEYCHAIN_PATTERNS = [
+    '~/Library/Keychains/*.keychain',
+    '~/Library/Keychains/*.keychain-db',
+    '/Library/Keychains/System.keychain',
+]
+
+
+def _identity_cache_dir():
+  '''Returns the cache directory, or None if the cache can't be used.'''
+  return _trusted_cache_dir(os.environ.get(_IDENTITY_CACHE_DIR_ENV))
+
+
+def _files_state(patterns):
+  '''Returns the paths, modification times and sizes of the matching files.
+
+  Args:
+    patterns: A list of glob patterns, which may start with `~`.
+
+  Returns:
+    A JSON serializable description of the files, suitable for cache keys.
+  '''
+  state = []
+  for pattern in patterns:
+    for path in sorted(glob.glob(os.path.expanduser(pattern))):
+      try:
+        stat = os.stat(path)
+      except OSError:
+        continue
+      state.append([path, stat.st_mtime_ns, stat.st_size])
+  return state
+
+
+def _keychains_state(keychain=None):
+  '''Returns the _files_state of a keychain, or of the default keychains.'''
+  return _files_state([keychain] if keychain else _DEFAULT_KEYCHAIN_PATTERNS)
+
+
+def _load_identities(path):
+  '''Returns the unexpired identities stored at path, or None.'''
+  try:
+    with open(path, 'r') as f:
+      entry = json.load(f)
+    age = time.time() - entry['time']
+    if 0 <= age <= _IDENTITY_CACHE_TTL_SECONDS:
+      return entry['identities']
+  except (OSError, ValueError, KeyError, TypeError):
+    pass
+  return None
+
+
+def _store_identities(path, identities):
+  '''Atomically stores the identities at path, ignoring failures.'''
+  _write_atomically(path, lambda f: json.dump(
+      {'time': time.time(), 'identities': identities}, f))
+
+
+def _cached_identities(key, find_identities):
+  '''Returns the identities for a query, sharing them across processes.
+
+  Args:
+    key: A JSON serializable description of the query, including the state of
+      the files the identities are read from.
+    find_identities: A callable that enumerates the identities when there is
+      no usable cache entry. It must return a JSON serializable value.
+
+  Returns:
+    The value returned by find_identities, possibly by another process.
+    Empty results are never cached, since they usually mean something (e.g.
+    a locked keychain) is about to be fixed.
+  '''
+  cache_dir = _identity_cache_dir()
+  if not cache_dir:
+    return find_identities()
+
+  digest = hashlib.sha256(
+      json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+  path = os.path.join(cache_dir, digest + '.json')
+  identities = _load_identities(path)
+  if identities is not None:
+    return identities
+
+  with open(path + '.lock', 'a') as lock:
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    try:
+      # Another process may have enumerated them while this one waited.
+      identities = _load_identities(path)
+      if identities is None:
+        identities = find_identities()
+        if identities:
+          _store_identities(path, identities)
+    finally:
+      fcntl.flock(lock, fcntl.LOCK_UN)
+  return identities
+# LINT.ThenChange(../wrapper_common/identity_cache.py)
 
 
 def _find_codesign_identities(signing_keychain=None, certificates_directory_path=None):
+  """Finds the code signing identities in a specified keychain.
+
+  The result is shared with other signing processes for a short time, see
+  _cached_identities.
+  """
+  if _MACOS:
+    key = ['security', signing_keychain, _keychains_state(signing_keychain)]
+  else:
+    if not certificates_directory_path:
+      raise OSError('--certificates is required when finding identities on non-macOS platforms.')
+    key = [
+        'certificates',
+        certificates_directory_path,
+        _files_state([os.path.join(certificates_directory_path, '*.cer')]),
+    ]
+  return _cached_identities(
+      key,
+      lambda: _find_codesign_identities_uncached(
+          signing_keychain, certificates_directory_path))
+
+
+def _find_codesign_identities_uncached(signing_keychain, certificates_directory_path):
   """Finds the code signing identities in a specified keychain."""
   ids = {}
   if _MACOS:
@@ -375,9 +811,6 @@ def _find_codesign_identities(signing_keychain=None, certificates_directory_path
       if m:
         ids[m.groupdict()['hash']] = (line, None)
   else:
-    if not certificates_directory_path:
-      raise OSError('--certificates is required when finding identities on non-macOS platforms.')
-
     cer_paths = glob.glob(os.path.join(certificates_directory_path, "*.cer"))
     if not cer_paths:
       raise OSError(f'No .cer files found in {certificates_directory_path}.')
@@ -419,10 +852,71 @@ def _get_identities_from_provisioning_profile(provisioning_profile):
     yield _generate_sha1(identity)
 
 
+# LINT.IfChange
+_TOOLCHAIN_CACHE_DIR_ENV = 'TOOLCHAIN_CACHE_DIR'
+
+_tool_paths = {}
+_tool_paths_lock = threading.Lock()
+
+
+def _toolchain_cache_dir():
+  '''Returns the descriptor directory, or None if it can't be used.'''
+  return _trusted_cache_dir(os.environ.get(_TOOLCHAIN_CACHE_DIR_ENV))
+
+
+def _load_descriptor(path):
+  '''Returns the tool paths stored at path, or an empty dict.'''
+  try:
+    with open(path, 'r') as f:
+      descriptor = json.load(f)
+    if isinstance(descriptor, dict):
+      return descriptor
+  except (OSError, ValueError):
+    pass
+  return {}
+
+
+def _store_descriptor(path, descriptor):
+  '''Atomically stores the tool paths at path, ignoring failures.'''
+  _write_atomically(
+      path, lambda f: json.dump(descriptor, f, sort_keys=True))
+
+
+def _descriptor_path(developer_dir):
+  '''Returns the path of the descriptor for an Xcode, or None.'''
+  if not developer_dir:
+    # Without DEVELOPER_DIR the result depends on `xcode-select`, which can
+    # change at any time.
+    return None
+  cache_dir = _toolchain_cache_dir()
+  if not cache_dir:
+    return None
+  digest = hashlib.sha256(developer_dir.encode('utf-8')).hexdigest()
+  return os.path.join(cache_dir, digest + '.json')
+# LINT.ThenChange(../wrapper_common/toolchain.py)
+
+
 def _find_codesign_allocate():
-  cmd = ['xcrun', '--find', 'codesign_allocate']
-  stdout = _execute_and_filter_output(cmd)
-  return stdout.strip()
+  """Returns the path of codesign_allocate, resolving it once per Xcode."""
+  developer_dir = os.environ.get('DEVELOPER_DIR')
+  key = (developer_dir, 'codesign_allocate')
+  with _tool_paths_lock:
+    path = _tool_paths.get(key)
+    if path:
+      return path
+
+    descriptor_path = _descriptor_path(developer_dir)
+    descriptor = _load_descriptor(descriptor_path) if descriptor_path else {}
+    path = descriptor.get('codesign_allocate')
+    if not isinstance(path, str) or not os.access(path, os.X_OK):
+      cmd = ['xcrun', '--find', 'codesign_allocate']
+      path = _execute_and_filter_output(cmd).strip()
+      if descriptor_path:
+        descriptor['codesign_allocate'] = path
+        _store_descriptor(descriptor_path, descriptor)
+
+    _tool_paths[key] = path
+    return path
 
 
 def _filter_codesign_output(codesign_output):
@@ -555,6 +1049,393 @@ def _generate_entitlements_for_signing(*, src, allowed_entitlements, dest):
     plistlib.dump(new_entitlements, f)
 
 
+# MS-DOS date and time of the entries of the archives created here, so that
+# they are deterministic: 1980-01-01 00:00, the earliest date zip supports.
+_ZIP_DOS_DATE = (1 << 5) | 1
+_ZIP_DOS_TIME = 0
+_ZIP_CHUNK_SIZE = 1024 * 1024
+# Compressed entries larger than this are spooled to disk until written.
+_ZIP_SPOOL_SIZE = 16 * 1024 * 1024
+_ZIP64_LIMIT = 0xFFFFFFFF
+_ZIP_UTF8_FLAG = 0x800
+
+
+class _ZipWriter(object):
+  """Writes zip archives from entries whose CRC and sizes are known upfront.
+
+  Unlike zipfile.ZipFile, the data of entries can be written already
+  compressed, which allows compressing entries in parallel and copying them
+  from other archives without recompressing them.
+  """
+
+  def __init__(self, fileobj):
+    self._fileobj = fileobj
+    self._central_directory = []
+    self._names = set()
+
+  def write(self, name, mode, compress_type, crc, compress_size, file_size,
+            data):
+    """Writes an entry.
+
+    Args:
+      name: The name of the entry, with `/` separators.
+      mode: The st_mode of the entry, including its file type.
+      compress_type: zipfile.ZIP_STORED or zipfile.ZIP_DEFLATED.
+      crc: The CRC-32 of the uncompressed data.
+      compress_size: The size of the data as stored in the archive.
+      file_size: The size of the uncompressed data.
+      data: The data as stored in the archive; bytes, or a binary file object
+        to read compress_size bytes from.
+
+    Raises:
+      OSError: If the archive already has an entry with that name.
+    """
+    if name in self._names:
+      raise OSError('Duplicate entry in zip archive: %s' % name)
+    self._names.add(name)
+    encoded_name = name.encode('utf-8')
+    flags = 0 if name.isascii() else _ZIP_UTF8_FLAG
+    offset = self._fileobj.tell()
+    if file_size >= _ZIP64_LIMIT or compress_size >= _ZIP64_LIMIT:
+      version = 45
+      extra = struct.pack('<HHQQ', 1, 16, file_size, compress_size)
+      header_sizes = (_ZIP64_LIMIT, _ZIP64_LIMIT)
+    else:
+      version = 45 if offset >= _ZIP64_LIMIT else 20
+      extra = b''
+      header_sizes = (compress_size, file_size)
+    self._fileobj.write(struct.pack(
+        '<IHHHHHIIIHH', 0x04034B50, version, flags, compress_type,
+        _ZIP_DOS_TIME, _ZIP_DOS_DATE, crc, *header_sizes, len(encoded_name),
+        len(extra)))
+    self._fileobj.write(encoded_name)
+    self._fileobj.write(extra)
+    if isinstance(data, bytes):
+      self._fileobj.write(data)
+    else:
+      remaining = compress_size
+      while remaining:
+        chunk = data.read(min(remaining, _ZIP_CHUNK_SIZE))
+        if not chunk:
+          raise OSError('Unexpected end of data for zip entry: %s' % name)
+        self._fileobj.write(chunk)
+        remaining -= len(chunk)
+    self._central_directory.append((
+        encoded_name, version, flags, mode, compress_type, crc, compress_size,
+        file_size, offset))
+
+  def close(self):
+    """Writes the central directory, completing the archive."""
+    start = self._fileobj.tell()
+    for (encoded_name, version, flags, mode, compress_type, crc, compress_size,
+         file_size, offset) in self._central_directory:
+      zip64_fields = []
+      if file_size >= _ZIP64_LIMIT:
+        zip64_fields.append(file_size)
+        file_size = _ZIP64_LIMIT
+      if compress_size >= _ZIP64_LIMIT:
+        zip64_fields.append(compress_size)
+        compress_size = _ZIP64_LIMIT
+      if offset >= _ZIP64_LIMIT:
+        zip64_fields.append(offset)
+        offset = _ZIP64_LIMIT
+      extra = b''
+      if zip64_fields:
+        version = 45
+        extra = struct.pack('<HH%dQ' % len(zip64_fields), 1,
+                            8 * len(zip64_fields), *zip64_fields)
+      # Unix permissions and file type, plus the MS-DOS directory flag.
+      external_attr = mode << 16 | (0x10 if stat.S_ISDIR(mode) else 0)
+      self._fileobj.write(struct.pack(
+          '<IHHHHHHIIIHHHHHII', 0x02014B50, 3 << 8 | version, version, flags,
+          compress_type, _ZIP_DOS_TIME, _ZIP_DOS_DATE, crc, compress_size,
+          file_size, len(encoded_name), len(extra), 0, 0, 0, external_attr,
+          offset))
+      self._fileobj.write(encoded_name)
+      self._fileobj.write(extra)
+    end = self._fileobj.tell()
+
+    count = len(self._central_directory)
+    size = end - start
+    if count >= 0xFFFF or size >= _ZIP64_LIMIT or start >= _ZIP64_LIMIT:
+      self._fileobj.write(struct.pack(
+          '<IQHHIIQQQQ', 0x06064B50, 44, 45, 45, 0, 0, count, count, size,
+          start))
+      self._fileobj.write(struct.pack('<IIQI', 0x07064B50, 0, end, 1))
+    self._fileobj.write(struct.pack(
+        '<IHHHHIIH', 0x06054B50, 0, 0, min(count, 0xFFFF),
+        min(count, 0xFFFF), min(size, _ZIP64_LIMIT), min(start, _ZIP64_LIMIT),
+        0))
+
+
+ExtractedZipSnapshot = collections.namedtuple(
+    'ExtractedZipSnapshot', ['archive_path', 'entries'])
+_ReusableZipEntry = collections.namedtuple(
+    '_ReusableZipEntry', ['info', 'state'])
+
+
+def _file_state(path):
+  """Returns what changes when a regular file is modified, or None."""
+  st = os.lstat(path)
+  if not stat.S_ISREG(st.st_mode):
+    return None
+  # ctime can't be set back, so it catches rewrites that restore the mtime.
+  return (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+
+
+def snapshot_extracted_zip(archive_path, destination_path, subdir=''):
+  """Records the state of the files extracted from a zip archive.
+
+  Passed to create_zip_archive after the files have been modified (e.g.
+  signed), it allows copying the entries of the files that haven't changed
+  from the original archive as is, instead of compressing them again.
+
+  Args:
+    archive_path: The path of the extracted zip archive.
+    destination_path: The directory the archive was extracted into.
+    subdir: The directory, relative to destination_path, that will be archived
+      again.
+
+  Returns:
+    An ExtractedZipSnapshot.
+
+  Raises:
+    OSError: If the archive is invalid.
+  """
+  prefix = subdir.strip('/') + '/' if subdir.strip('/') else ''
+  entries = {}
+  try:
+    with zipfile.ZipFile(archive_path) as archive:
+      for info in archive.infolist():
+        if (info.is_dir() or not info.filename.startswith(prefix) or
+            info.flag_bits & 0x1 or
+            info.compress_type not in (zipfile.ZIP_STORED,
+                                       zipfile.ZIP_DEFLATED)):
+          continue
+        try:
+          state = _file_state(
+              _zip_entry_path(destination_path, info.filename))
+        except OSError:
+          continue
+        if state:
+          entries[info.filename[len(prefix):]] = _ReusableZipEntry(
+              info, state)
+  except zipfile.BadZipFile as e:
+    raise OSError('Invalid zip archive %s: %s' % (archive_path, e)) from e
+  return ExtractedZipSnapshot(archive_path, entries)
+
+
+def _seek_to_zip_entry_data(archive_file, info):
+  """Positions an archive file at the stored data of an entry."""
+  archive_file.seek(info.header_offset)
+  header = archive_file.read(30)
+  if len(header) != 30 or header[:4] != b'PK\x03\x04':
+    raise OSError('Invalid local header for zip entry: %s' % info.filename)
+  name_length, extra_length = struct.unpack('<HH', header[26:30])
+  archive_file.seek(name_length + extra_length, io.SEEK_CUR)
+
+
+def _ordered_results(executor, function, items, window):
+  """Like executor.map, but with at most `window` items in flight."""
+  pending = collections.deque()
+  for item in items:
+    pending.append(executor.submit(function, item))
+    if len(pending) >= window:
+      yield pending.popleft().result()
+  while pending:
+    yield pending.popleft().result()
+
+
+def _zip_entries(source_path, junk_paths):
+  """Returns the (name, path) of the entries to archive a directory."""
+  entries = []
+  for root, dirs, files in os.walk(source_path):
+    dirs.sort()
+    relative_root = os.path.relpath(root, source_path)
+    prefix = ''
+    if relative_root != '.' and not junk_paths:
+      prefix = relative_root.replace(os.sep, '/') + '/'
+      entries.append((prefix, root))
+    # os.walk lists symlinks to directories with the directories but doesn't
+    # descend into them; they are archived as symlinks.
+    links = [d for d in dirs if os.path.islink(os.path.join(root, d))]
+    for name in sorted(files + links):
+      entries.append((prefix + name, os.path.join(root, name)))
+  return entries
+
+
+def _prepare_zip_entry(name, path, compress, reuse):
+  """Returns the mode, compression, CRC, sizes and data of an entry."""
+  mode = os.lstat(path).st_mode
+  reusable = reuse and reuse.entries.get(name)
+  if reusable and _file_state(path) == reusable.state:
+    # The data is copied from the original archive when the entry is written.
+    info = reusable.info
+    return (mode, info.compress_type, info.CRC, info.compress_size,
+            info.file_size, reusable)
+  if stat.S_ISDIR(mode):
+    return mode, zipfile.ZIP_STORED, 0, 0, 0, b''
+  if stat.S_ISLNK(mode):
+    target = os.readlink(path).encode('utf-8')
+    return (mode, zipfile.ZIP_STORED, zlib.crc32(target), len(target),
+            len(target), target)
+
+  crc = 0
+  file_size = 0
+  if not compress:
+    with open(path, 'rb') as f:
+      for chunk in iter(lambda: f.read(_ZIP_CHUNK_SIZE), b''):
+        crc = zlib.crc32(chunk, crc)
+        file_size += len(chunk)
+    # The data is copied from the file when the entry is written.
+    return mode, zipfile.ZIP_STORED, crc, file_size, file_size, None
+
+  compressor = zlib.compressobj(
+      zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+  compressed = tempfile.SpooledTemporaryFile(max_size=_ZIP_SPOOL_SIZE)
+  with open(path, 'rb') as f:
+    for chunk in iter(lambda: f.read(_ZIP_CHUNK_SIZE), b''):
+      crc = zlib.crc32(chunk, crc)
+      file_size += len(chunk)
+      compressed.write(compressor.compress(chunk))
+  compressed.write(compressor.flush())
+  compress_size = compressed.tell()
+  if compress_size >= file_size:
+    # Like zip, store what doesn't compress (e.g. tiny or encrypted files).
+    compressed.close()
+    return mode, zipfile.ZIP_STORED, crc, file_size, file_size, None
+  compressed.seek(0)
+  return (mode, zipfile.ZIP_DEFLATED, crc, compress_size, file_size,
+          compressed)
+
+
+def create_zip_archive(
+    source_path, output_path, *, compress=True, junk_paths=False,
+    max_workers=None, reuse=None):
+  """Archives the contents of a directory.
+
+  Symlinks are stored as symlinks and permissions are preserved. Entries are
+  sorted and have a fixed timestamp, so the same contents always produce the
+  same archive. Files are compressed in parallel.
+
+  Args:
+    source_path: The directory to archive; its contents are at the root of the
+      archive.
+    output_path: The path of the zip archive to create.
+    compress: If True, files are compressed with DEFLATE, otherwise they are
+      stored.
+    junk_paths: If True, only files are archived, at the root of the archive.
+    max_workers: The maximum number of files to compress at the same time.
+      Defaults to the number of CPUs.
+    reuse: If not None, the ExtractedZipSnapshot of the archive source_path
+      was extracted from. Files that haven't changed since are copied from
+      that archive without being compressed again, so the cost of archiving
+      is proportional to what changed.
+
+  Raises:
+    OSError: If the directory can't be read or the archive can't be written.
+  """
+  max_workers = max_workers or os.cpu_count() or 1
+  entries = _zip_entries(source_path, junk_paths)
+  with contextlib.ExitStack() as stack:
+    output = stack.enter_context(open(output_path, 'wb'))
+    original = None
+    if reuse:
+      original = stack.enter_context(open(reuse.archive_path, 'rb'))
+    executor = stack.enter_context(
+        concurrent.futures.ThreadPoolExecutor(max_workers))
+    writer = _ZipWriter(output)
+    prepared_entries = _ordered_results(
+        executor,
+        lambda entry: _prepare_zip_entry(entry[0], entry[1], compress, reuse),
+        entries, 2 * max_workers)
+    for (name, path), prepared in zip(entries, prepared_entries):
+      mode, compress_type, crc, compress_size, file_size, data = prepared
+      if isinstance(data, _ReusableZipEntry):
+        _seek_to_zip_entry_data(original, data.info)
+        writer.write(name, mode, compress_type, crc, compress_size,
+                     file_size, original)
+      elif data is None:
+        with open(path, 'rb') as f:
+          writer.write(name, mode, compress_type, crc, compress_size,
+                       file_size, f)
+      else:
+        writer.write(name, mode, compress_type, crc, compress_size, file_size,
+                     data)
+        if not isinstance(data, bytes):
+          data.close()
+    writer.close()
+
+
+def _zip_entry_path(destination_path, name):
+  """Returns where to extract an entry, refusing to write outside of it."""
+  parts = [part for part in name.split('/') if part]
+  if name.startswith('/') or '..' in parts or '\\' in name:
+    raise OSError('Refusing to extract unsafe zip entry: %s' % name)
+  return os.path.join(destination_path, *parts)
+
+
+def _extract_zip_file(archive, info, path):
+  """Extracts a regular file entry, with its permissions and timestamp."""
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with archive.open(info) as src, open(path, 'wb') as dst:
+    shutil.copyfileobj(src, dst, _ZIP_CHUNK_SIZE)
+  os.chmod(path, (info.external_attr >> 16) & 0o7777 or 0o644)
+  timestamp = time.mktime(info.date_time + (0, 0, -1))
+  os.utime(path, (timestamp, timestamp))
+
+
+def extract_zip_archive(archive_path, destination_path, max_workers=None):
+  """Extracts a zip archive, restoring symlinks and permissions.
+
+  Files are extracted in parallel.
+
+  Args:
+    archive_path: The path of the zip archive to extract.
+    destination_path: The directory to extract the archive into.
+    max_workers: The maximum number of files to extract at the same time.
+      Defaults to the number of CPUs.
+
+  Raises:
+    OSError: If the archive is invalid, has entries that would be extracted
+      outside of destination_path, or can't be extracted.
+  """
+  max_workers = max_workers or os.cpu_count() or 1
+  try:
+    with zipfile.ZipFile(archive_path) as archive:
+      directories = []
+      files = []
+      symlinks = []
+      for info in archive.infolist():
+        path = _zip_entry_path(destination_path, info.filename)
+        mode = info.external_attr >> 16
+        if info.is_dir():
+          directories.append((path, mode))
+        elif stat.S_ISLNK(mode):
+          symlinks.append((path, info))
+        else:
+          files.append((path, info))
+
+      for path, _ in directories:
+        os.makedirs(path, exist_ok=True)
+      # zipfile supports reading entries from several threads at once.
+      with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        list(executor.map(
+            lambda entry: _extract_zip_file(archive, entry[1], entry[0]),
+            files))
+      # Symlinks are created last so that no entry is written through them.
+      for path, info in symlinks:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.symlink(archive.read(info).decode('utf-8'), path)
+  except zipfile.BadZipFile as e:
+    raise OSError('Invalid zip archive %s: %s' % (archive_path, e)) from e
+
+  # Restored last, in case they don't allow writing.
+  for path, mode in reversed(directories):
+    if mode & 0o7777:
+      os.chmod(path, mode & 0o7777)
+
+
 def _extract_archive(*, app_bundle_subdir, working_dir, unsigned_archive_path):
   """Create a temp directory and extract unsigned IPA archive there.
 
@@ -571,14 +1452,7 @@ def _extract_archive(*, app_bundle_subdir, working_dir, unsigned_archive_path):
   Raises:
     OSError: when app bundle is not found in extracted archive.
   """
-  if sys.platform == "darwin":
-    subprocess.check_call(
-      ['ditto', '-x', '-k', unsigned_archive_path, working_dir],
-    )
-  else:
-    subprocess.check_call(
-      ['unzip', '-q' '-X', unsigned_archive_path, '-d', working_dir],
-    )
+  extract_zip_archive(unsigned_archive_path, working_dir)
 
   extracted_bundles = glob.glob(
       os.path.join(working_dir, app_bundle_subdir, 'Payload', '*.app'))
@@ -591,7 +1465,7 @@ def _extract_archive(*, app_bundle_subdir, working_dir, unsigned_archive_path):
   return extracted_bundles[0]
 
 
-def _package_ipa(*, app_bundle_subdir, working_dir, output_ipa):
+def _package_ipa(*, app_bundle_subdir, working_dir, output_ipa, reuse=None):
   """Package signed bundle into the target location.
 
   Args:
@@ -600,6 +1474,8 @@ def _package_ipa(*, app_bundle_subdir, working_dir, output_ipa):
     working_dir: String, the path to the folder which contains contents suitable
       for an unzipped IPA archive.
     output_ipa: String, a path to where the zipped IPA file should be placed.
+    reuse: If not None, the ExtractedZipSnapshot of the unsigned archive, whose
+      entries for files left untouched by signing are copied as is.
 
   Raises:
     OSError: If IPA directories are malformed
@@ -618,20 +1494,135 @@ def _package_ipa(*, app_bundle_subdir, working_dir, output_ipa):
     if entry.name not in IPA_ALLOWED_SUBDIRS:
       raise OSError(f'Disallowed IPA base directory detected: {entry.path}')
 
-  if _MACOS:
-    subprocess.check_call([
-      'ditto',
-      '-c',
-      '-k',
-      '--norsrc',
-      '--noextattr',
-      bundle_path,
-      output_ipa,
+  create_zip_archive(bundle_path, output_ipa, reuse=reuse)
+
+
+_SIGNING_CACHE_VERSION = 1
+_SIGNING_CACHE_FILES = 'files'
+_SIGNING_CACHE_INDEX = 'files.json'
+
+
+def _signing_cache_dir(cache_dir):
+  """Returns the signing cache directory, or None if it can't be used."""
+  # Restored binaries are shipped, so only trust a directory that nobody else
+  # could have written entries to.
+  trusted_cache_dir = _trusted_cache_dir(cache_dir)
+  if cache_dir and not trusted_cache_dir:
+    print('WARNING: Not using signing cache %s, as it can\'t be created or is '
+          'writable by other users.' % cache_dir)
+  return trusted_cache_dir
+
+
+def _signing_cache_key(graph, root_bundle_path, codesign_path, max_workers):
+  """Returns the cache key for signing a bundle with the tasks of a graph."""
+  try:
+    codesign_stat = os.stat(codesign_path)
+    codesign_state = [codesign_stat.st_size, codesign_stat.st_mtime_ns]
+  except OSError:
+    codesign_state = None
+  bundles = []
+  for task in graph.tasks:
+    if task.function is not _sign_bundle_root:
+      # Nested binaries are signed with the identity of their bundle.
+      continue
+    assets = {}
+    for name in ('entitlements_path', 'provisioning_profile_file_path'):
+      path = task.kwargs[name]
+      assets[name] = _file_sha256(path) if path else None
+    bundles.append([
+        os.path.relpath(task.kwargs['root_bundle_path'], root_bundle_path),
+        task.kwargs['codesign_identity'],
+        assets['entitlements_path'],
+        assets['provisioning_profile_file_path'],
     ])
-  else:
-    if os.path.exists(output_ipa):
-      os.remove(output_ipa)
-    subprocess.check_call(['zip', '-X', '-r', output_ipa, '.'], cwd=bundle_path)
+  key = [
+      _SIGNING_CACHE_VERSION,
+      codesign_path,
+      codesign_state,
+      _tree_digest(root_bundle_path, max_workers),
+      sorted(bundles),
+  ]
+  return hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()
+
+
+def _tree_state(path):
+  """Returns the _file_state of every regular file in a tree."""
+  state = {}
+  for root, _, file_names in os.walk(path):
+    for name in file_names:
+      full_path = os.path.join(root, name)
+      file_state = _file_state(full_path)
+      if file_state:
+        state[os.path.relpath(full_path, path)] = file_state
+  return state
+
+
+def _store_signed_files(entry_path, root_bundle_path, unsigned_state):
+  """Stores the files of a bundle that changed since it was unsigned.
+
+  Failures are reported as warnings, as the bundle itself is signed.
+  """
+  cache_dir = os.path.dirname(entry_path)
+  try:
+    temp_entry = tempfile.mkdtemp(dir=cache_dir, suffix='.tmp')
+  except OSError as e:
+    print('WARNING: Unable to store signed files in cache: %s' % e)
+    return
+  try:
+    index = []
+    for relative_path, file_state in sorted(
+        _tree_state(root_bundle_path).items()):
+      if unsigned_state.get(relative_path) == file_state:
+        continue
+      source = os.path.join(root_bundle_path, relative_path)
+      destination = os.path.join(temp_entry, _SIGNING_CACHE_FILES,
+                                 relative_path)
+      os.makedirs(os.path.dirname(destination), exist_ok=True)
+      shutil.copyfile(source, destination)
+      index.append([relative_path, stat.S_IMODE(os.stat(source).st_mode)])
+    with open(os.path.join(temp_entry, _SIGNING_CACHE_INDEX), 'w') as f:
+      json.dump(index, f)
+    # Entries are complete once they have their final name. Another process
+    # may have stored the same entry first, which is just as good.
+    os.rename(temp_entry, entry_path)
+  except OSError as e:
+    if not os.path.isdir(entry_path):
+      print('WARNING: Unable to store signed files in cache: %s' % e)
+  finally:
+    shutil.rmtree(temp_entry, ignore_errors=True)
+
+
+def _restore_signed_files(entry_path, root_bundle_path):
+  """Restores the signed files of a bundle from a cache entry.
+
+  Returns:
+    True if all files were restored, False if the bundle still needs to be
+    signed.
+  """
+  try:
+    with open(os.path.join(entry_path, _SIGNING_CACHE_INDEX), 'r') as f:
+      index = json.load(f)
+  except (OSError, ValueError):
+    return False
+  try:
+    for relative_path, mode in index:
+      source = os.path.join(entry_path, _SIGNING_CACHE_FILES, relative_path)
+      destination = _zip_entry_path(root_bundle_path, relative_path)
+      os.makedirs(os.path.dirname(destination), exist_ok=True)
+      fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(destination))
+      try:
+        with os.fdopen(fd, 'wb') as output, open(source, 'rb') as f:
+          shutil.copyfileobj(f, output, _ZIP_CHUNK_SIZE)
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, destination)
+      except BaseException:
+        os.remove(temp_path)
+        raise
+  except (OSError, ValueError, TypeError) as e:
+    # Whatever was restored is signed again.
+    print('WARNING: Unable to restore signed files from cache: %s' % e)
+    return False
+  return True
 
 
 def _sign_bundle_with_manifest(
@@ -643,7 +1634,8 @@ def _sign_bundle_with_manifest(
     signing_keychain,
     certificates_directory_path,
     override_codesign_identity=None,
-    executor=concurrent.futures.ThreadPoolExecutor()):
+    max_workers=None,
+    signing_cache_dir=None):
   """Signs a bundle with a dossier.
 
   Provided a bundle, dossier path, and the path to the codesign tool, will sign
@@ -663,12 +1655,80 @@ def _sign_bundle_with_manifest(
       the /usr/bin/codesign invocation via its --keychain argument.
     certificates_directory_path: If not None, this will only search for the
       signing identity in `.cer` files in the directory specified.
+    override_codesign_identity: If set, this will override the identity
+      specified in the manifest.
+    max_workers: The maximum number of concurrent codesign invocations. If
+      None, uses the default of concurrent.futures.ThreadPoolExecutor.
+    signing_cache_dir: If not None, a directory in which to remember the files
+      produced by signing. When the same bundle was already signed with the
+      same identities, entitlements and provisioning profiles, those files are
+      restored instead of invoking codesign.
+
+  Raises:
+    SystemExit: if unable to infer codesign identity when not provided.
+  """
+  with tempfile.TemporaryDirectory() as working_dir:
+    print('Working dir for temp signing artifacts created: %s' % working_dir)
+    graph = SigningGraph()
+    _add_bundle_signing_tasks(
+        graph, root_bundle_path, manifest, dossier_directory_path,
+        codesign_path, allowed_entitlements, signing_keychain,
+        certificates_directory_path, working_dir, override_codesign_identity)
+
+    cache_entry = None
+    unsigned_state = None
+    signing_cache_dir = _signing_cache_dir(signing_cache_dir)
+    if signing_cache_dir:
+      cache_entry = os.path.join(signing_cache_dir, _signing_cache_key(
+          graph, root_bundle_path, codesign_path, max_workers))
+      if _restore_signed_files(cache_entry, root_bundle_path):
+        print('Restored signed files of bundle at %s from: %s' % (
+            root_bundle_path, cache_entry))
+        return
+      unsigned_state = _tree_state(root_bundle_path)
+
+    graph.run(max_workers)
+    if cache_entry:
+      _store_signed_files(cache_entry, root_bundle_path, unsigned_state)
+
+
+def _add_bundle_signing_tasks(
+    graph,
+    root_bundle_path,
+    manifest,
+    dossier_directory_path,
+    codesign_path,
+    allowed_entitlements,
+    signing_keychain,
+    certificates_directory_path,
+    working_dir,
+    override_codesign_identity=None):
+  """Adds the tasks to sign a bundle and everything embedded in it.
+
+  Args:
+    graph: The SigningGraph to add the tasks to.
+    root_bundle_path: The absolute path to the bundle that will be signed.
+    manifest: The contents of the manifest in this dossier.
+    dossier_directory_path: Directory of dossier to be used for signing.
+    codesign_path: Path to the codesign tool as a string.
+    allowed_entitlements: A list of strings indicating keys that are valid for
+      entitlements. If not None, only the strings listed here will be
+      transferred to the generated entitlements. If None, the entitlements found
+      with the dossier will be used directly for code signing.
+    signing_keychain: If not None, this will first search for the signing
+      identity in the keychain file specified, forwarding the path directly to
+      the /usr/bin/codesign invocation via its --keychain argument.
+    certificates_directory_path: If not None, this will only search for the
+      signing identity in `.cer` files in the directory specified.
+    working_dir: Directory for temporary signing artifacts, which must exist
+      until the graph has run.
     override_codesign_identity: If set, this will override the identity
       specified in the manifest. This is primarily useful when signing an
       embedded bundle, as all bundles must use the same codesigning identity,
       and so lookup logic can be short circuited.
-    executor: concurrent.futures.Executor instance to use for concurrent
-      codesign invocations.
+
+  Returns:
+    The SigningTask that signs the bundle itself.
 
   Raises:
     SystemExit: if unable to infer codesign identity when not provided.
@@ -691,91 +1751,112 @@ def _sign_bundle_with_manifest(
         'Signing failed - codesigning identity not specified in manifest '
         'and unable to infer identity.')
 
-  with tempfile.TemporaryDirectory() as working_dir:
-    print('Working dir for temp signing artifacts created: %s' % working_dir)
-    entitlements_filename = manifest.get(ENTITLEMENTS_KEY)
-    entitlements_for_signing_path = None
-    if entitlements_filename:
-      entitlements_source_path = os.path.join(
-          dossier_directory_path, entitlements_filename
+  entitlements_filename = manifest.get(ENTITLEMENTS_KEY)
+  entitlements_for_signing_path = None
+  if entitlements_filename:
+    entitlements_source_path = os.path.join(
+        dossier_directory_path, entitlements_filename
+    )
+    entitlements_for_signing_path = entitlements_source_path
+    if allowed_entitlements:
+      _, entitlements_for_signing_path = tempfile.mkstemp(
+          dir=working_dir, suffix='.plist'
       )
-      entitlements_for_signing_path = entitlements_source_path
-      if allowed_entitlements:
-        _, entitlements_for_signing_path = tempfile.mkstemp(
-            dir=working_dir, suffix='.plist'
-        )
 
-        _generate_entitlements_for_signing(
-            src=entitlements_source_path,
-            allowed_entitlements=allowed_entitlements,
-            dest=entitlements_for_signing_path,
-        )
+      _generate_entitlements_for_signing(
+          src=entitlements_source_path,
+          allowed_entitlements=allowed_entitlements,
+          dest=entitlements_for_signing_path,
+      )
 
-    # submit each embedded manifest to sign concurrently
-    codesign_futures = _sign_embedded_bundles_with_manifest(
-        manifest, root_bundle_path, dossier_directory_path, codesign_path,
-        allowed_entitlements, signing_keychain, certificates_directory_path, codesign_identity, executor)
-    _wait_signing_futures(codesign_futures)
+  embedded_tasks = _add_embedded_signing_tasks(
+      graph, manifest, root_bundle_path, dossier_directory_path, codesign_path,
+      allowed_entitlements, signing_keychain, certificates_directory_path,
+      codesign_identity, working_dir)
 
-    if provisioning_profile_file_path:
-      _copy_embedded_provisioning_profile(
-          provisioning_profile_file_path, root_bundle_path)
+  return graph.add(
+      'Signing bundle at: %s' % root_bundle_path,
+      _sign_bundle_root,
+      dependencies=embedded_tasks,
+      codesign_path=codesign_path,
+      codesign_identity=codesign_identity,
+      entitlements_path=entitlements_for_signing_path,
+      provisioning_profile_file_path=provisioning_profile_file_path,
+      root_bundle_path=root_bundle_path,
+      signing_keychain=signing_keychain)
 
-    print('Signing bundle at: %s' % root_bundle_path)
-    _invoke_codesign(
-        codesign_path=codesign_path,
-        identity=codesign_identity,
-        entitlements_path=entitlements_for_signing_path,
-        full_path_to_sign=root_bundle_path,
-        signing_keychain=signing_keychain)
+
+def _sign_bundle_root(
+    *,
+    codesign_path,
+    codesign_identity,
+    entitlements_path,
+    provisioning_profile_file_path,
+    root_bundle_path,
+    signing_keychain):
+  """Embeds the provisioning profile of a bundle and signs it."""
+  if provisioning_profile_file_path:
+    _copy_embedded_provisioning_profile(
+        provisioning_profile_file_path, root_bundle_path)
+
+  print('Signing bundle at: %s' % root_bundle_path)
+  _invoke_codesign(
+      codesign_path=codesign_path,
+      identity=codesign_identity,
+      entitlements_path=entitlements_path,
+      full_path_to_sign=root_bundle_path,
+      signing_keychain=signing_keychain)
 
 
-def _sign_framework(
-    root_path, codesign_path, signing_keychain, codesign_identity, executor):
-  """Signs Framework and the Framework's dylibs and sub-Frameworks.
+def _add_framework_signing_tasks(
+    graph, root_path, codesign_path, signing_keychain, codesign_identity):
+  """Adds the tasks to sign a Framework and its dylibs and sub-Frameworks.
 
   Args:
+    graph: The SigningGraph to add the tasks to.
     root_path: The absolute path to the framework.
     codesign_path: Path to the codesign tool as a string.
     signing_keychain: If not None, this will only search for the signing
       identity in the keychain file specified, forwarding the path directly to
       the /usr/bin/codesign invocation via its --keychain argument.
     codesign_identity: The codesign identity to use for codesigning.
-    executor: Asynchronous jobs Executor from concurrent.futures.
-  """
 
-  path_to_search_for_dylibs = root_path
-  dylib_codesign_futures = []
-  for root, _, files in os.walk(path_to_search_for_dylibs):
+  Returns:
+    The SigningTask that signs the framework itself.
+  """
+  dylib_tasks = {}
+  for root, _, files in os.walk(root_path):
     for file_name in files:
       if not file_name.endswith('.dylib'):
         continue
       dylib_path = os.path.join(root, file_name)
-      dylib_codesign_futures.append(
-          submit_future('Signing dylib at: %s' % dylib_path, executor,
-                        _invoke_codesign, codesign_path, codesign_identity,
-                        None, dylib_path, signing_keychain)
-      )
-  _wait_signing_futures(dylib_codesign_futures)
+      dylib_tasks[dylib_path] = graph.add(
+          'Signing dylib at: %s' % dylib_path, _invoke_codesign,
+          codesign_path, codesign_identity, None, dylib_path,
+          signing_keychain)
 
   subframework_dir = os.path.join(root_path, 'Frameworks')
-  subframwork_codesign_futures = []
+  subframework_tasks = []
   if os.path.exists(subframework_dir):
     for subframework in os.listdir(subframework_dir):
       path = os.path.join(subframework_dir, subframework)
-      dylib_codesign_futures.append(
-          submit_future('Signing sub-framework at: %s' % path, executor,
-                        _invoke_codesign, codesign_path, codesign_identity,
-                        None, path, signing_keychain)
-      )
-  _wait_signing_futures(subframwork_codesign_futures)
-
-  print('Signing framework at: %s' % root_path)
-  _invoke_codesign(codesign_path, codesign_identity,
-                   None, root_path, signing_keychain)
-
-
-def _sign_embedded_bundles_with_manifest(
+      nested_dylib_tasks = [
+          task for dylib_path, task in dylib_tasks.items()
+          if dylib_path.startswith(path + os.sep)
+      ]
+      subframework_tasks.append(graph.add(
+          'Signing sub-framework at: %s' % path, _invoke_codesign,
+          codesign_path, codesign_identity, None, path, signing_keychain,
+          dependencies=nested_dylib_tasks))
+
+  return graph.add(
+      'Signing framework at: %s' % root_path, _invoke_codesign,
+      codesign_path, codesign_identity, None, root_path, signing_keychain,
+      dependencies=list(dylib_tasks.values()) + subframework_tasks)
+
+
+def _add_embedded_signing_tasks(
+    graph,
     manifest,
     root_bundle_path,
     dossier_directory_path,
@@ -784,10 +1865,11 @@ def _sign_embedded_bundles_with_manifest(
     signing_keychain,
     certificates_directory_path,
     codesign_identity,
-    executor):
-  """Signs embedded bundles/dylibs/frameworks concurrently and returns futures.
+    working_dir):
+  """Adds the tasks to sign embedded bundles/dylibs/frameworks of a bundle.
 
   Args:
+    graph: The SigningGraph to add the tasks to.
     manifest: The contents of the manifest in this dossier.
     root_bundle_path: The absolute path to the bundle that will be signed.
     dossier_directory_path: Directory of dossier to be used for signing.
@@ -802,15 +1884,16 @@ def _sign_embedded_bundles_with_manifest(
     certificates_directory_path: If not None, this will only search for the
       signing identity in `.cer` files in the directory specified.
     codesign_identity: The codesign identity to use for codesigning.
-    executor: Asynchronous jobs Executor from concurrent.futures.
+    working_dir: Directory for temporary signing artifacts.
 
   Returns:
-    List of asynchronous Future tasks submited to executor.
+    List of the SigningTasks that sign the top level embedded items, which
+    must complete before the bundle itself is signed.
 
   Raises:
     OSError: If Framework not formed properly
   """
-  codesign_futures = []
+  tasks = []
   framework_dir = os.path.join(root_bundle_path, 'Frameworks')
   for embedded_manifest in manifest.get(EMBEDDED_BUNDLE_MANIFESTS_KEY, []):
     if not embedded_manifest.get(PROVISIONING_PROFILE_KEY):
@@ -820,33 +1903,27 @@ def _sign_embedded_bundles_with_manifest(
       continue
     embedded_bundle_path = os.path.join(root_bundle_path,
                                         embedded_relative_path)
-    codesign_futures.append(
-        submit_future('embedded sign: %s' % embedded_bundle_path, executor,
-                      _sign_bundle_with_manifest,
-                      embedded_bundle_path, embedded_manifest,
-                      dossier_directory_path, codesign_path,
-                      allowed_entitlements, signing_keychain,
-                      certificates_directory_path,
-                      codesign_identity, executor))
+    tasks.append(_add_bundle_signing_tasks(
+        graph, embedded_bundle_path, embedded_manifest, dossier_directory_path,
+        codesign_path, allowed_entitlements, signing_keychain,
+        certificates_directory_path, working_dir, codesign_identity))
 
   if os.path.exists(framework_dir):
     for entry in os.listdir(framework_dir):
       entry_path = os.path.join(framework_dir, entry)
       if entry.endswith('.dylib'):
-        codesign_futures.append(
-            submit_future('Signing base dylib at: %s' % entry_path, executor,
-                          _invoke_codesign, codesign_path, codesign_identity,
-                          None, entry_path, signing_keychain)
-        )
+        tasks.append(graph.add(
+            'Signing base dylib at: %s' % entry_path, _invoke_codesign,
+            codesign_path, codesign_identity, None, entry_path,
+            signing_keychain))
       elif entry.endswith('.framework'):
-        codesign_futures.append(
-            submit_future('Signing framework at: %s' % entry_path, executor,
-                          _sign_framework, entry_path, codesign_path,
-                          signing_keychain, codesign_identity, executor))
+        tasks.append(_add_framework_signing_tasks(
+            graph, entry_path, codesign_path, signing_keychain,
+            codesign_identity))
       else:
         raise OSError('Error: Unexpected entry in Framework folder: %s' % entry)
 
-  return codesign_futures
+  return tasks
 
 
 def _copy_embedded_provisioning_profile(
@@ -871,33 +1948,6 @@ def _copy_embedded_provisioning_profile(
     shutil.copy(provisioning_profile_file_path, dest_provisioning_profile_path)
 
 
-def _wait_signing_futures(signing_futures):
-  """Waits for futures of signing tasks to complete or any to fail.
-
-  Args:
-    signing_futures: SigningFuture list to wait on for completition or failure.
-
-  Raises:
-    The exception from the codesign task
-  """
-  _, not_done_futures = concurrent.futures.wait(
-      [f.future for f in signing_futures],
-      return_when=concurrent.futures.FIRST_EXCEPTION)
-
-  crashed_signing_futures = [
-      f for f in signing_futures if f.future.done() and f.future.exception()
-  ]
-
-  for not_done_future in not_done_futures:
-    not_done_future.cancel()
-
-  if any(crashed_signing_futures):
-    print('Codesign task(s) failed:\n' +
-          '\n\n'.join(f'\t{i}) {repr(f.note)}\n{repr(f.future.exception())}'
-                      for i, f in enumerate(crashed_signing_futures, start=1)))
-    raise crashed_signing_futures[0].future.exception()
-
-
 def _extract_zipped_dossier(zipped_dossier_path):
   """Unpacks a zipped dossier.
 
@@ -909,15 +1959,14 @@ def _extract_zipped_dossier(zipped_dossier_path):
     responsible for deleting this directory when finished using it.
 
   Raises:
-    OSError: If unable to execute the unpacking command.
+    OSError: If unable to unpack the dossier.
   """
   dossier_path = tempfile.mkdtemp()
-  command = ('/usr/bin/unzip', '-q', zipped_dossier_path, '-d', dossier_path)
-  process = subprocess.Popen(
-      command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-  _, stderr = process.communicate()
-  if process.poll() != 0:
-    raise OSError('Fail to unzip dossier at path: %s' % stderr)
+  try:
+    extract_zip_archive(zipped_dossier_path, dossier_path)
+  except OSError as e:
+    shutil.rmtree(dossier_path)
+    raise OSError('Fail to unzip dossier at path: %s' % e) from e
   return dossier_path
 
 
@@ -973,7 +2022,9 @@ def _sign_archived_bundle(
     signing_keychain,
     certificates_directory_path,
     working_dir,
-    unsigned_archive_path):
+    unsigned_archive_path,
+    max_workers=None,
+    signing_cache_dir=None):
   """Signs the bundle and packages it as an IPA to output_artifact.
 
   Args:
@@ -992,21 +2043,30 @@ def _sign_archived_bundle(
       signing identity in `.cer` files in the directory specified.
     working_dir: String, the path to unzip the archive file into.
     unsigned_archive_path: String, the full path to a unsigned archive.
+    max_workers: The maximum number of concurrent codesign invocations.
+    signing_cache_dir: If not None, the directory of the signing cache.
   """
   extracted_bundle = _extract_archive(
       app_bundle_subdir=app_bundle_subdir,
       working_dir=working_dir,
       unsigned_archive_path=unsigned_archive_path,
   )
+  # Signing only rewrites binaries, signatures and profiles, everything else
+  # is copied from the unsigned archive when packaging.
+  snapshot = snapshot_extracted_zip(
+      unsigned_archive_path, working_dir, app_bundle_subdir)
   manifest = read_manifest_from_dossier(dossier_directory_path)
   _sign_bundle_with_manifest(extracted_bundle, manifest,
                              dossier_directory_path, codesign_path,
                              allowed_entitlements, signing_keychain,
-                             certificates_directory_path)
+                             certificates_directory_path,
+                             max_workers=max_workers,
+                             signing_cache_dir=signing_cache_dir)
   _package_ipa(
       app_bundle_subdir=app_bundle_subdir,
       working_dir=working_dir,
       output_ipa=output_ipa,
+      reuse=snapshot,
   )
   print('Output artifact is: %s' % output_ipa)
 
@@ -1032,6 +2092,8 @@ def _sign_bundle(parsed_args):
   signing_keychain = parsed_args.keychain
   certificates_directory_path = parsed_args.certificates
   output_artifact = parsed_args.output_artifact
+  max_workers = parsed_args.jobs
+  signing_cache_dir = parsed_args.signing_cache
 
   if not os.path.exists(input_fullpath):
     raise OSError('Specified input does not exist at path %s' % input_fullpath)
@@ -1069,6 +2131,8 @@ def _sign_bundle(parsed_args):
           signing_keychain=signing_keychain,
           working_dir=working_dir,
           unsigned_archive_path=input_fullpath,
+          max_workers=max_workers,
+          signing_cache_dir=signing_cache_dir,
       )
   else:
     with extract_zipped_dossier_if_required(
@@ -1087,7 +2151,9 @@ def _sign_bundle(parsed_args):
         _sign_bundle_with_manifest(input_fullpath, manifest,
                                    dossier_directory.path, codesign_path,
                                    allowed_entitlements, signing_keychain,
-                                   certificates_directory_path)
+                                   certificates_directory_path,
+                                   max_workers=max_workers,
+                                   signing_cache_dir=signing_cache_dir)
       elif input_path_suffix == '.ipa':
         _check_common_archived_bundle_args(
             output_artifact=output_artifact,
@@ -1105,6 +2171,8 @@ def _sign_bundle(parsed_args):
             signing_keychain=signing_keychain,
             working_dir=working_dir,
             unsigned_archive_path=input_fullpath,
+            max_workers=max_workers,
+            signing_cache_dir=signing_cache_dir,
         )
 
 
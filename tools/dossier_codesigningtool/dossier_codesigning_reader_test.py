@@ -14,17 +14,20 @@
 # limitations under the License.
 """Tests for dossier_codesigningtool_reader."""
 
-import concurrent.futures
+import base64
 import contextlib
 import io
 import os
 import shutil
 import subprocess
 import tempfile
+import threading
 import unittest
+import zipfile
 from unittest import mock
 
 from tools.dossier_codesigningtool import dossier_codesigning_reader
+from tools.wrapper_common import asn1_test_utils
 
 
 _FAKE_MANIFEST = {
@@ -74,18 +77,47 @@ _FAKE_SIMPLE_MANIFEST_NO_PROFILE = {
     'embedded_bundle_manifests': [],
 }
 
+# A self-signed certificate with the subject layout of an Apple development
+# certificate, the expected values come from `openssl x509`.
+_FAKE_CERTIFICATE_PEM = (
+    b'-----BEGIN CERTIFICATE-----\n'
+    b'MIICdzCCAh2gAwIBAgIUDShSLScaUVBfj7C9R0V+AZZBE3gwCgYIKoZIzj0EAwIw\n'
+    b'gZAxGjAYBgoJkiaJk/IsZAEBDApBQkNERTEyMzQ1MTcwNQYDVQQDDC5BcHBsZSBE\n'
+    b'ZXZlbG9wbWVudDogSmFuZSBBcHBsZXNlZWQgKEFCQ0RFMTIzNDUpMRMwEQYDVQQL\n'
+    b'DApURUFNSUQxMjM0MRcwFQYDVQQKDA5KYW5lIEFwcGxlc2VlZDELMAkGA1UEBhMC\n'
+    b'VVMwHhcNMjYxMDE5MTAxMDI5WhcNMzYxMDE2MTAxMDI5WjCBkDEaMBgGCgmSJomT\n'
+    b'8ixkAQEMCkFCQ0RFMTIzNDUxNzA1BgNVBAMMLkFwcGxlIERldmVsb3BtZW50OiBK\n'
+    b'YW5lIEFwcGxlc2VlZCAoQUJDREUxMjM0NSkxEzARBgNVBAsMClRFQU1JRDEyMzQx\n'
+    b'FzAVBgNVBAoMDkphbmUgQXBwbGVzZWVkMQswCQYDVQQGEwJVUzBZMBMGByqGSM49\n'
+    b'AgEGCCqGSM49AwEHA0IABGR06PamUpt7Nbkzwa5IIUXhf3z6t9qGmy9EoaYSPimN\n'
+    b'sj8nb4yDToHZqleBbODEqnTDuc4gc3f2smYimo1uRUSjUzBRMB0GA1UdDgQWBBSM\n'
+    b'ycnr0ukyrtJWha+0RY51jZ/bUzAfBgNVHSMEGDAWgBSMycnr0ukyrtJWha+0RY51\n'
+    b'jZ/bUzAPBgNVHRMBAf8EBTADAQH/MAoGCCqGSM49BAMCA0gAMEUCIFeoyo2kZ+SR\n'
+    b'UCciYwFyrk14ixs7gdxrSI+dDJ3wquriAiEA6hNm/nGSiw2HSXQsVLGq7G2oeqrh\n'
+    b'CFhlDUpLcGDm28c=\n'
+    b'-----END CERTIFICATE-----\n')
+_FAKE_CERTIFICATE_SHA1 = 'A5FF43823C315FAE9362E43E294529B6AD1FFA6A'
+_FAKE_CERTIFICATE_SUBJECT = (
+    'subject=UID = ABCDE12345, '
+    'CN = Apple Development: Jane Appleseed (ABCDE12345), '
+    'OU = TEAMID1234, O = Jane Appleseed, C = US')
+
 _IPA_WORKSPACE_PATH = 'test/starlark_tests/targets_under_test/ios/app.ipa'
 _IPA_W_WATCHOS_WORKSPACE_PATH = 'test/starlark_tests/targets_under_test/watchos/app_companion.ipa'
 _COMBINED_ZIP_W_WATCHOS_WORKSPACE_PATH = 'test/starlark_tests/targets_under_test/watchos/app_companion_dossier_with_bundle.zip'
 
 _ADDITIONAL_SIGNING_KEYCHAIN = '/tmp/Library/Keychains/ios-dev-signing.keychain'
 
+_der = asn1_test_utils.der
+
 
 class DossierCodesigningReaderTest(unittest.TestCase):
 
   @mock.patch.object(dossier_codesigning_reader, '_invoke_codesign')
   def test_sign_bundle_with_manifest_codesign_invocations(self, mock_codesign):
-    mock.patch('shutil.copy').start()
+    copy_patcher = mock.patch('shutil.copy')
+    copy_patcher.start()
+    self.addCleanup(copy_patcher.stop)
     dossier_codesigning_reader._sign_bundle_with_manifest(
         root_bundle_path='/tmp/fake.app/',
         manifest=_FAKE_MANIFEST,
@@ -151,7 +183,9 @@ class DossierCodesigningReaderTest(unittest.TestCase):
   def test_sign_adhoc_simple_bundle_with_manifest_codesign_invocations(
       self, mock_codesign
   ):
-    mock.patch('shutil.copy').start()
+    copy_patcher = mock.patch('shutil.copy')
+    copy_patcher.start()
+    self.addCleanup(copy_patcher.stop)
     dossier_codesigning_reader._sign_bundle_with_manifest(
         root_bundle_path='/tmp/fake.app/',
         manifest=_FAKE_SIMPLE_MANIFEST_NO_PROFILE,
@@ -177,7 +211,9 @@ class DossierCodesigningReaderTest(unittest.TestCase):
   def test_sign_bundle_with_allowed_entitlements(
       self, mock_codesign, mock_gen_entitlements
   ):
-    mock.patch('shutil.copy').start()
+    copy_patcher = mock.patch('shutil.copy')
+    copy_patcher.start()
+    self.addCleanup(copy_patcher.stop)
     mock_gen_entitlements.return_value = None
     dossier_codesigning_reader._sign_bundle_with_manifest(
         root_bundle_path='/tmp/fake.app/',
@@ -265,11 +301,11 @@ class DossierCodesigningReaderTest(unittest.TestCase):
           codesign_path='/usr/bin/fake_codesign',
           allowed_entitlements=None)
 
-  @mock.patch.object(dossier_codesigning_reader, '_sign_bundle_with_manifest')
-  def test_sign_embedded_bundles_with_manifest(self, mock_sign_bundle):
-    mock_sign_bundle.return_value = concurrent.futures.Future()
-    executor = concurrent.futures.ThreadPoolExecutor()
-    futures = dossier_codesigning_reader._sign_embedded_bundles_with_manifest(
+  @mock.patch.object(dossier_codesigning_reader, '_add_bundle_signing_tasks')
+  def test_add_embedded_signing_tasks(self, mock_add_bundle_tasks):
+    graph = dossier_codesigning_reader.SigningGraph()
+    tasks = dossier_codesigning_reader._add_embedded_signing_tasks(
+        graph=graph,
         manifest=_FAKE_MANIFEST,
         root_bundle_path='/tmp/fake.app/',
         dossier_directory_path='/tmp/dossier/',
@@ -278,69 +314,66 @@ class DossierCodesigningReaderTest(unittest.TestCase):
         signing_keychain=_ADDITIONAL_SIGNING_KEYCHAIN,
         certificates_directory_path='/tmp/certs/',
         codesign_identity='-',
-        executor=executor)
-    dossier_codesigning_reader._wait_signing_futures(futures)
-    self.assertEqual(len(futures), 4)
-    self.assertEqual(mock_sign_bundle.call_count, 4)
-    default_args = (
-        '/tmp/dossier/',
-        '/usr/bin/fake_codesign',
-        None,
-        _ADDITIONAL_SIGNING_KEYCHAIN,
-        '/tmp/certs/',
-        '-',
-        executor,
-    )
-    mock_sign_bundle.assert_has_calls([
-        mock.call(
+        working_dir='/tmp/working_dir/')
+    self.assertEqual(len(tasks), 4)
+    self.assertEqual(mock_add_bundle_tasks.call_count, 4)
+    self.assertEqual(
+        [c[0][1] for c in mock_add_bundle_tasks.call_args_list],
+        [
             '/tmp/fake.app/Extensions/AppIntentsExtension.appex',
-            {
-                'codesign_identity': '-',
-                'embedded_bundle_manifests': [],
-                'embedded_relative_path': (
-                    'Extensions/AppIntentsExtension.appex'
-                ),
-                'entitlements': 'fake.entitlements',
-                'provisioning_profile': 'fake.mobileprovision',
-            },
-            *default_args),
-        mock.call(
             '/tmp/fake.app/PlugIns/IntentsExtension.appex',
-            {
-                'codesign_identity': '-',
-                'embedded_bundle_manifests': [],
-                'embedded_relative_path': 'PlugIns/IntentsExtension.appex',
-                'entitlements': 'fake.entitlements',
-                'provisioning_profile': 'fake.mobileprovision'
-            },
-            *default_args),
-        mock.call(
             '/tmp/fake.app/PlugIns/IntentsUIExtension.appex',
-            {
-                'codesign_identity': '-',
-                'embedded_bundle_manifests': [],
-                'embedded_relative_path': 'PlugIns/IntentsUIExtension.appex',
-                'entitlements': 'fake.entitlements',
-                'provisioning_profile': 'fake.mobileprovision'
-            },
-            *default_args),
-        mock.call(
             '/tmp/fake.app/Watch/WatchApp.app',
-            {
-                'codesign_identity': '-',
-                'embedded_bundle_manifests': [{
-                    'codesign_identity': '-',
-                    'embedded_bundle_manifests': [],
-                    'embedded_relative_path': 'PlugIns/WatchExtension.appex',
-                    'entitlements': 'fake.entitlements',
-                    'provisioning_profile': 'fake.mobileprovision'
-                }],
-                'embedded_relative_path': 'Watch/WatchApp.app',
-                'entitlements': 'fake.entitlements',
-                'provisioning_profile': 'fake.mobileprovision'
-            },
-            *default_args),
-    ])
+        ])
+    for c in mock_add_bundle_tasks.call_args_list:
+      self.assertIs(c[0][0], graph)
+      self.assertEqual(c[0][3:], (
+          '/tmp/dossier/',
+          '/usr/bin/fake_codesign',
+          None,
+          _ADDITIONAL_SIGNING_KEYCHAIN,
+          '/tmp/certs/',
+          '/tmp/working_dir/',
+          '-',
+      ))
+
+  @mock.patch.object(dossier_codesigning_reader, '_invoke_codesign')
+  def test_sign_framework_leaves_first_with_one_worker(self, mock_codesign):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      framework = os.path.join(tmp_dir, 'fake.app', 'Frameworks', 'A.framework')
+      subframework = os.path.join(framework, 'Frameworks', 'B.framework')
+      os.makedirs(subframework)
+      for dylib in (os.path.join(framework, 'a.dylib'),
+                    os.path.join(subframework, 'b.dylib')):
+        with open(dylib, 'w'):
+          pass
+
+      with contextlib.redirect_stdout(io.StringIO()):
+        dossier_codesigning_reader._sign_bundle_with_manifest(
+            root_bundle_path=os.path.join(tmp_dir, 'fake.app'),
+            manifest=_FAKE_SIMPLE_MANIFEST_NO_PROFILE,
+            dossier_directory_path='/tmp/dossier/',
+            codesign_path='/usr/bin/fake_codesign',
+            signing_keychain=None,
+            certificates_directory_path=None,
+            override_codesign_identity='-',
+            allowed_entitlements=None,
+            max_workers=1)
+
+      signed_paths = [
+          c.kwargs.get('full_path_to_sign') or c.args[3]
+          for c in mock_codesign.call_args_list
+      ]
+      self.assertEqual(len(signed_paths), 5)
+      self.assertLess(
+          signed_paths.index(os.path.join(subframework, 'b.dylib')),
+          signed_paths.index(subframework))
+      self.assertLess(signed_paths.index(subframework),
+                      signed_paths.index(framework))
+      self.assertLess(
+          signed_paths.index(os.path.join(framework, 'a.dylib')),
+          signed_paths.index(framework))
+      self.assertEqual(signed_paths[-1], os.path.join(tmp_dir, 'fake.app'))
 
   @mock.patch('shutil.copy')
   @mock.patch('os.path.exists')
@@ -358,54 +391,47 @@ class DossierCodesigningReaderTest(unittest.TestCase):
     mock_copy.assert_called_with(
         '/tmp/fake.mobile', '/tmp/fake.app/Contents/embedded.mobile')
 
-  def test_wait_signing_futures_reraises_exception(self):
-    future_with_exception = concurrent.futures.Future()
-    future_with_exception.set_exception(RuntimeError)
-
-    future_with_no_exception = concurrent.futures.Future()
-    future_with_no_exception.set_result(None)
-    futures = [
-        dossier_codesigning_reader.SigningFuture(future_with_exception, 'n1'),
-        dossier_codesigning_reader.SigningFuture(future_with_no_exception, 'n2')
-    ]
+  def test_signing_graph_runs_dependencies_first(self):
+    order = []
+    graph = dossier_codesigning_reader.SigningGraph()
+    leaf = graph.add('leaf', order.append, 'leaf')
+    middle = graph.add('middle', order.append, 'middle', dependencies=[leaf])
+    graph.add('root', order.append, 'root', dependencies=[middle, leaf])
+    with contextlib.redirect_stdout(io.StringIO()):
+      graph.run(max_workers=1)
+    self.assertEqual(order, ['leaf', 'middle', 'root'])
+
+  def test_signing_graph_reraises_first_exception(self):
+    graph = dossier_codesigning_reader.SigningGraph()
+    order = []
+    failing = graph.add('n1', mock.Mock(side_effect=RuntimeError('n1')))
+    graph.add('n2', order.append, 'n2')
+    graph.add('n3', order.append, 'n3', dependencies=[failing])
 
     stdout = io.StringIO()
-    with self.assertRaises(RuntimeError), contextlib.redirect_stdout(stdout):
-      dossier_codesigning_reader._wait_signing_futures(futures)
-    self.assertNotRegex(stdout.getvalue(), 'Multiple codesign tasks failed:')
-
-  def test_wait_signing_futures_does_not_raises_exception(self):
-    futures = []
-    for _ in range(3):
-      future = concurrent.futures.Future()
-      future.set_result(None)
-      futures.append(dossier_codesigning_reader.SigningFuture(future, 'note'))
-    dossier_codesigning_reader._wait_signing_futures(futures)
-
-  @mock.patch('concurrent.futures.wait')
-  def test_wait_signing_futures_cancel_futures(self, mock_wait):
-    mock_future_done = mock.Mock()
-    mock_future_exception = mock.Mock()
-    mock_future_not_done = mock.Mock()
-
-    mock_future_exception.exception.return_value = EOFError()
-    mock_wait.return_value = (
-        [mock_future_exception, mock_future_done], [mock_future_not_done])
-
-    futures = [
-        dossier_codesigning_reader.SigningFuture(mock_future_exception, 'n1'),
-        dossier_codesigning_reader.SigningFuture(mock_future_done, 'n2'),
-        dossier_codesigning_reader.SigningFuture(mock_future_not_done, 'n3')
-    ]
+    with self.assertRaisesRegex(RuntimeError, 'n1'), \
+        contextlib.redirect_stdout(stdout):
+      graph.run(max_workers=1)
+    self.assertRegex(stdout.getvalue(), r'Codesign task\(s\) failed\:')
+    self.assertNotIn('n3', order)
+
+  def test_signing_graph_reports_failures_in_order(self):
+    # Both tasks are running when the first one fails.
+    barrier = threading.Barrier(2, timeout=10)
+
+    def fail(exception):
+      barrier.wait()
+      raise exception
+
+    graph = dossier_codesigning_reader.SigningGraph()
+    graph.add('n1', fail, EOFError())
+    graph.add('n2', fail, RuntimeError())
 
     stdout = io.StringIO()
     with self.assertRaises(EOFError), contextlib.redirect_stdout(stdout):
-      dossier_codesigning_reader._wait_signing_futures(futures)
-    self.assertRegex(stdout.getvalue(), r'Codesign task\(s\) failed\:')
-
-    mock_future_not_done.cancel.assert_called()
-    mock_future_exception.cancel.assert_not_called()
-    mock_future_done.cancel.assert_not_called()
+      graph.run(max_workers=2)
+    output = stdout.getvalue()
+    self.assertLess(output.index("1) 'n1'"), output.index("2) 'n2'"))
 
   @mock.patch.object(dossier_codesigning_reader, '_sign_bundle_with_manifest')
   @mock.patch.object(dossier_codesigning_reader, 'read_manifest_from_dossier')
@@ -453,10 +479,13 @@ class DossierCodesigningReaderTest(unittest.TestCase):
           None,
           _ADDITIONAL_SIGNING_KEYCHAIN,
           None,
+          max_workers=None,
+          signing_cache_dir=None,
       )
 
   @mock.patch.object(dossier_codesigning_reader, '_package_ipa')
   @mock.patch.object(dossier_codesigning_reader, '_sign_bundle_with_manifest')
+  @mock.patch.object(dossier_codesigning_reader, 'snapshot_extracted_zip')
   @mock.patch.object(dossier_codesigning_reader, '_extract_archive')
   @mock.patch.object(dossier_codesigning_reader, 'read_manifest_from_dossier')
   @mock.patch.object(dossier_codesigning_reader,
@@ -466,6 +495,7 @@ class DossierCodesigningReaderTest(unittest.TestCase):
       mock_extract_dossier,
       mock_read_manifest,
       mock_extract_archive,
+      mock_snapshot,
       mock_sign_bundle,
       mock_package):
     with tempfile.NamedTemporaryFile() as tmp_fake_codesign, \
@@ -503,11 +533,16 @@ class DossierCodesigningReaderTest(unittest.TestCase):
           None,
           _ADDITIONAL_SIGNING_KEYCHAIN,
           None,
+          max_workers=None,
+          signing_cache_dir=None,
       )
       mock_package.assert_called_once()
+      self.assertEqual(mock_snapshot.return_value,
+                       mock_package.call_args.kwargs['reuse'])
 
   @mock.patch.object(dossier_codesigning_reader, '_package_ipa')
   @mock.patch.object(dossier_codesigning_reader, '_sign_bundle_with_manifest')
+  @mock.patch.object(dossier_codesigning_reader, 'snapshot_extracted_zip')
   @mock.patch.object(dossier_codesigning_reader, '_extract_archive')
   @mock.patch.object(dossier_codesigning_reader, 'read_manifest_from_dossier')
   @mock.patch.object(tempfile, 'TemporaryDirectory')
@@ -516,6 +551,7 @@ class DossierCodesigningReaderTest(unittest.TestCase):
       mock_temp_dir,
       mock_read_manifest,
       mock_extract_archive,
+      mock_snapshot,
       mock_sign_bundle,
       mock_package):
     with tempfile.NamedTemporaryFile() as tmp_fake_codesign, \
@@ -552,9 +588,23 @@ class DossierCodesigningReaderTest(unittest.TestCase):
           None,
           _ADDITIONAL_SIGNING_KEYCHAIN,
           None,
+          max_workers=None,
+          signing_cache_dir=None,
       )
       mock_package.assert_called_once()
+      self.assertEqual(mock_snapshot.return_value,
+                       mock_package.call_args.kwargs['reuse'])
+
 
+  def test_jobs_must_be_positive(self):
+    parser = dossier_codesigning_reader.generate_arg_parser()
+    args = ['sign', '--codesign', '/usr/bin/codesign', 'app.ipa']
+    self.assertEqual(
+        4, parser.parse_args(args + ['--jobs', '4']).jobs)
+    for jobs in ('0', '-1', 'many'):
+      with self.assertRaises(SystemExit), \
+          contextlib.redirect_stderr(io.StringIO()):
+        parser.parse_args(args + ['--jobs', jobs])
 
   def _test_extract_and_package_flow(
       self, unsigned_archive_path, app_name, app_bundle_subdir, expected_folders
@@ -592,6 +642,53 @@ class DossierCodesigningReaderTest(unittest.TestCase):
       shutil.rmtree(working_dir)
 
 
+  def test_extract_identity_hash(self):
+    tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, tmp_dir)
+    pem_path = os.path.join(tmp_dir, 'pem.cer')
+    with open(pem_path, 'wb') as f:
+      f.write(_FAKE_CERTIFICATE_PEM)
+    der_path = os.path.join(tmp_dir, 'der.cer')
+    with open(der_path, 'wb') as f:
+      pem_body = b''.join(_FAKE_CERTIFICATE_PEM.splitlines()[1:-1])
+      f.write(base64.b64decode(pem_body))
+
+    for cer_path in (pem_path, der_path):
+      self.assertEqual(
+          (_FAKE_CERTIFICATE_SHA1, _FAKE_CERTIFICATE_SUBJECT),
+          dossier_codesigning_reader.extract_identity_hash(cer_path))
+
+    with open(der_path, 'wb') as f:
+      f.write(b'not a certificate')
+    with self.assertRaisesRegex(OSError, 'Failed to extract certificate'):
+      dossier_codesigning_reader.extract_identity_hash(der_path)
+
+  def test_extract_identity_hash_string_types(self):
+    cn = bytes.fromhex('550403')
+
+    def attribute(tag, value):
+      return _der(0x31, _der(0x30, _der(0x06, cn), _der(tag, value)))
+
+    empty = _der(0x30)
+    name = _der(
+        0x30,
+        attribute(0x14, 'Développeur'.encode('latin-1')),  # TeletexString
+        attribute(0x1C, 'Ünïversal'.encode('utf-32-be')),
+        attribute(0x1E, 'Bmp'.encode('utf-16-be')))
+    # A (signature-less) v1 certificate.
+    certificate = _der(
+        0x30, _der(0x30, _der(0x02, b'\x01'), empty, empty, empty, name),
+        empty, _der(0x03, b'\x00'))
+    tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, tmp_dir)
+    cer_path = os.path.join(tmp_dir, 'der.cer')
+    with open(cer_path, 'wb') as f:
+      f.write(certificate)
+
+    self.assertEqual(
+        'subject=CN = Développeur, CN = Ünïversal, CN = Bmp',
+        dossier_codesigning_reader.extract_identity_hash(cer_path)[1])
+
   def test_extract_and_package_flow1(self):
     self._test_extract_and_package_flow(
         _IPA_WORKSPACE_PATH, 'app.app', '', ['Payload'])
@@ -608,5 +705,220 @@ class DossierCodesigningReaderTest(unittest.TestCase):
         _COMBINED_ZIP_W_WATCHOS_WORKSPACE_PATH, 'app_companion.app',
         'bundle', ['Payload', 'WatchKitSupport2'])
 
+
+class SigningCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self._tmp_dir)
+    self._cache_dir = os.path.join(self._tmp_dir, 'cache')
+    self._dossier = os.path.join(self._tmp_dir, 'dossier')
+    os.mkdir(self._dossier)
+    with open(os.path.join(self._dossier, 'app.entitlements'), 'wb') as f:
+      f.write(b'entitlements')
+    self._manifest = {
+        'codesign_identity': '-',
+        'entitlements': 'app.entitlements',
+    }
+
+    invoke_codesign = mock.patch.object(
+        dossier_codesigning_reader, '_invoke_codesign',
+        side_effect=self._fake_codesign)
+    self._invoke_codesign = invoke_codesign.start()
+    self.addCleanup(invoke_codesign.stop)
+
+  def _fake_codesign(self, *args, **kwargs):
+    path = kwargs.get('full_path_to_sign') or args[3]
+    if os.path.isdir(path):
+      os.makedirs(os.path.join(path, '_CodeSignature'), exist_ok=True)
+      with open(os.path.join(path, '_CodeSignature', 'CodeResources'),
+                'w') as f:
+        f.write('resources')
+      path = os.path.join(path, os.path.splitext(os.path.basename(path))[0])
+    with open(path, 'ab') as f:
+      f.write(b' signed')
+
+  def _bundle(self, name, binary=b'binary'):
+    bundle = os.path.join(self._tmp_dir, name, 'app.app')
+    framework = os.path.join(bundle, 'Frameworks', 'A.framework')
+    os.makedirs(framework)
+    for path in (os.path.join(bundle, 'app'), os.path.join(framework, 'A')):
+      with open(path, 'wb') as f:
+        f.write(binary)
+      os.chmod(path, 0o755)
+    return bundle
+
+  def _sign(self, bundle):
+    with contextlib.redirect_stdout(io.StringIO()):
+      dossier_codesigning_reader._sign_bundle_with_manifest(
+          bundle, self._manifest, self._dossier, '/usr/bin/codesign', None,
+          None, None, signing_cache_dir=self._cache_dir)
+
+  def _contents(self, bundle):
+    contents = {}
+    for root, _, files in os.walk(bundle):
+      for name in files:
+        path = os.path.join(root, name)
+        with open(path, 'rb') as f:
+          contents[os.path.relpath(path, bundle)] = (
+              f.read(), os.stat(path).st_mode)
+    return contents
+
+  def test_unchanged_bundles_are_restored_from_cache(self):
+    first = self._bundle('first')
+    self._sign(first)
+    self.assertEqual(2, self._invoke_codesign.call_count)
+
+    second = self._bundle('second')
+    self._sign(second)
+    self.assertEqual(2, self._invoke_codesign.call_count)
+    self.assertEqual(self._contents(first), self._contents(second))
+    self.assertIn('_CodeSignature/CodeResources', self._contents(second))
+
+  def test_changed_bundles_are_signed_again(self):
+    self._sign(self._bundle('first'))
+    self._sign(self._bundle('second', binary=b'other binary'))
+    self.assertEqual(4, self._invoke_codesign.call_count)
+
+  def test_changed_entitlements_are_signed_again(self):
+    self._sign(self._bundle('first'))
+    with open(os.path.join(self._dossier, 'app.entitlements'), 'wb') as f:
+      f.write(b'other entitlements')
+    self._sign(self._bundle('second'))
+    self.assertEqual(4, self._invoke_codesign.call_count)
+
+  def test_shared_cache_directories_are_not_used(self):
+    os.makedirs(self._cache_dir)
+    os.chmod(self._cache_dir, 0o777)
+    self._sign(self._bundle('first'))
+    self._sign(self._bundle('second'))
+    self.assertEqual(4, self._invoke_codesign.call_count)
+    self.assertEqual([], os.listdir(self._cache_dir))
+
+
+class ZipArchiveTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self._tmp_dir)
+    self._source = os.path.join(self._tmp_dir, 'source')
+    framework = os.path.join(
+        self._source, 'Payload', 'app.app', 'Frameworks', 'A.framework')
+    os.makedirs(os.path.join(framework, 'Versions', 'A'))
+    with open(os.path.join(framework, 'Versions', 'A', 'A'), 'wb') as f:
+      f.write(b'binary' * 1000)
+    os.chmod(os.path.join(framework, 'Versions', 'A', 'A'), 0o755)
+    with open(os.path.join(self._source, 'Payload', 'app.app', 'Info.plist'),
+              'w') as f:
+      f.write('plist')
+    os.symlink('A', os.path.join(framework, 'Versions', 'Current'))
+    os.symlink('Versions/Current/A', os.path.join(framework, 'A'))
+
+  def _archive(self, name, **kwargs):
+    path = os.path.join(self._tmp_dir, name)
+    dossier_codesigning_reader.create_zip_archive(self._source, path, **kwargs)
+    return path
+
+  def test_round_trip_preserves_symlinks_and_permissions(self):
+    archive = self._archive('app.ipa')
+    with zipfile.ZipFile(archive) as z:
+      self.assertIsNone(z.testzip())
+      self.assertEqual(
+          zipfile.ZIP_DEFLATED,
+          z.getinfo('Payload/app.app/Frameworks/A.framework/Versions/A/A')
+          .compress_type)
+      # Files that don't compress are stored.
+      self.assertEqual(zipfile.ZIP_STORED,
+                       z.getinfo('Payload/app.app/Info.plist').compress_type)
+
+    destination = os.path.join(self._tmp_dir, 'extracted')
+    dossier_codesigning_reader.extract_zip_archive(archive, destination)
+    framework = os.path.join(
+        destination, 'Payload', 'app.app', 'Frameworks', 'A.framework')
+    self.assertEqual('A', os.readlink(
+        os.path.join(framework, 'Versions', 'Current')))
+    self.assertEqual('Versions/Current/A', os.readlink(
+        os.path.join(framework, 'A')))
+    self.assertEqual(0o755, os.stat(os.path.join(framework, 'A')).st_mode
+                     & 0o777)
+    with open(os.path.join(framework, 'A'), 'rb') as f:
+      self.assertEqual(b'binary' * 1000, f.read())
+    with open(os.path.join(destination, 'Payload', 'app.app', 'Info.plist'),
+              'r') as f:
+      self.assertEqual('plist', f.read())
+
+  def test_archives_are_deterministic(self):
+    first = self._archive('first.ipa')
+    os.utime(os.path.join(self._source, 'Payload', 'app.app', 'Info.plist'),
+             (0, 0))
+    second = self._archive('second.ipa', max_workers=1)
+    with open(first, 'rb') as f1, open(second, 'rb') as f2:
+      self.assertEqual(f1.read(), f2.read())
+
+  def test_junk_paths_stores_files_at_root(self):
+    dossier = os.path.join(self._tmp_dir, 'dossier')
+    os.makedirs(os.path.join(dossier, 'nested'))
+    for name in ('manifest.json', 'nested/app.mobileprovision'):
+      with open(os.path.join(dossier, name), 'w') as f:
+        f.write(name)
+    archive = os.path.join(self._tmp_dir, 'dossier.zip')
+    dossier_codesigning_reader.create_zip_archive(
+        dossier, archive, compress=False, junk_paths=True)
+    with zipfile.ZipFile(archive) as z:
+      self.assertEqual(['manifest.json', 'app.mobileprovision'],
+                       [i.filename for i in z.infolist()])
+      self.assertEqual(
+          {zipfile.ZIP_STORED}, {i.compress_type for i in z.infolist()})
+      self.assertEqual(b'nested/app.mobileprovision',
+                       z.read('app.mobileprovision'))
+
+  def test_unchanged_entries_are_copied_from_the_original_archive(self):
+    # Stored entries would be compressed if they were archived again.
+    original = os.path.join(self._tmp_dir, 'combined.zip')
+    with zipfile.ZipFile(original, 'w', zipfile.ZIP_STORED) as z:
+      z.writestr('bundle/Payload/app.app/app', b'unsigned' * 1000)
+      z.writestr('bundle/Payload/app.app/Assets.car', b'assets' * 1000)
+      z.writestr('dossier/manifest.json', '{}')
+    working_dir = os.path.join(self._tmp_dir, 'working_dir')
+    dossier_codesigning_reader.extract_zip_archive(original, working_dir)
+    snapshot = dossier_codesigning_reader.snapshot_extracted_zip(
+        original, working_dir, 'bundle')
+    self.assertEqual(
+        ['Payload/app.app/Assets.car', 'Payload/app.app/app'],
+        sorted(snapshot.entries))
+
+    app = os.path.join(working_dir, 'bundle', 'Payload', 'app.app')
+    with open(os.path.join(app, 'app'), 'wb') as f:
+      f.write(b'signed' * 1000)
+    with open(os.path.join(app, 'embedded.mobileprovision'), 'wb') as f:
+      f.write(b'profile' * 1000)
+    output = os.path.join(self._tmp_dir, 'app.ipa')
+    dossier_codesigning_reader.create_zip_archive(
+        os.path.join(working_dir, 'bundle'), output, reuse=snapshot)
+
+    with zipfile.ZipFile(output) as z:
+      self.assertIsNone(z.testzip())
+      self.assertEqual(
+          zipfile.ZIP_STORED,
+          z.getinfo('Payload/app.app/Assets.car').compress_type)
+      self.assertEqual(b'assets' * 1000, z.read('Payload/app.app/Assets.car'))
+      for name in ('app', 'embedded.mobileprovision'):
+        self.assertEqual(
+            zipfile.ZIP_DEFLATED,
+            z.getinfo('Payload/app.app/' + name).compress_type)
+      self.assertEqual(b'signed' * 1000, z.read('Payload/app.app/app'))
+
+  def test_extract_refuses_entries_outside_of_destination(self):
+    archive = os.path.join(self._tmp_dir, 'evil.zip')
+    with zipfile.ZipFile(archive, 'w') as z:
+      z.writestr('../evil', 'evil')
+    with self.assertRaisesRegex(OSError, 'unsafe zip entry'):
+      dossier_codesigning_reader.extract_zip_archive(
+          archive, os.path.join(self._tmp_dir, 'extracted'))
+    self.assertFalse(os.path.exists(os.path.join(self._tmp_dir, 'evil')))
+
+
 if __name__ == '__main__':
   unittest.main()
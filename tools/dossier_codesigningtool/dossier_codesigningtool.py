@@ -16,6 +16,8 @@ Provides functionality to generate codesigning dossiers from bundles.
 """
 
 import argparse
+import filecmp
+import hashlib
 import json
 import os
 import os.path
@@ -26,7 +28,6 @@ import subprocess
 import sys
 import tempfile
 from typing import Dict, List, Optional, Tuple, Union
-import uuid
 
 from tools.dossier_codesigningtool import dossier_codesigning_reader as dossier_reader
 
@@ -63,6 +64,11 @@ _EMBEDDED_BUNDLE_DIRECTORY_NAMES = [
 ]
 
 
+# Dossier assets are named by the SHA-256 digest of their contents, followed by
+# their extension, so identical entitlements and profiles are stored once.
+_ASSET_NAME_REGEX = re.compile(r'^[0-9a-f]{64}\.[^.]+$')
+
+
 def generate_arg_parser():
   """Generates an argument parser for this tool."""
   parser = argparse.ArgumentParser(
@@ -154,7 +160,6 @@ def generate_arg_parser():
 def _extract_codesign_data(
     bundle_path: str,
     output_directory: str,
-    unique_id: str,
     codesign_path: str) -> Tuple[Optional[str], Optional[str]]:
   """Extracts codesigning data from the provided bundle to the output directory.
 
@@ -165,7 +170,6 @@ def _extract_codesign_data(
     bundle_path: The absolute path to the bundle to extract entitlements from.
     output_directory: The absolute path to the output directory the entitlements
       should be placed in, it must already exist.
-    unique_id: Unique identifier to use for filename of extracted entitlements.
     codesign_path: Path to the codesign tool as a string.
 
   Returns:
@@ -200,19 +204,47 @@ def _extract_codesign_data(
   if not plist:
     return None, cert_authority
 
-  output_file_name = unique_id + '.entitlements'
+  output_data = output.encode('utf-8')
+  output_file_name = (
+      hashlib.sha256(output_data).hexdigest() + '.entitlements')
   output_file_path = os.path.join(output_directory, output_file_name)
-  output_file = open(output_file_path, 'w')
-  output_file.write(output)
-  output_file.close()
+  if not os.path.exists(output_file_path):
+    with open(output_file_path, 'wb') as output_file:
+      output_file.write(output_data)
 
   return output_file_name, cert_authority
 
 
+def _copy_dossier_asset(
+    original_path: str,
+    output_directory: str,
+    extension: str) -> str:
+  """Copies a file to an output directory, named by its contents.
+
+  Args:
+    original_path: The absolute path to the file to copy.
+    output_directory: The absolute path to the output directory the file should
+      be placed in, it must already exist.
+    extension: The extension of the copied file, including the leading dot.
+
+  Returns:
+    The filename relative to output_directory the file was copied to. If a file
+    with the same contents is already there, it isn't copied again.
+  """
+  digest = hashlib.sha256()
+  with open(original_path, 'rb') as f:
+    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+      digest.update(chunk)
+  dest_filename = digest.hexdigest() + extension
+  dest_path = os.path.join(output_directory, dest_filename)
+  if not os.path.exists(dest_path):
+    shutil.copy(original_path, dest_path)
+  return dest_filename
+
+
 def _copy_entitlements_file(
     original_entitlements_file_path: str,
-    output_directory: str,
-    unique_id: str) -> Optional[str]:
+    output_directory: str) -> Optional[str]:
   """Copies an entitlements file from an original path to an output directory.
 
   Args:
@@ -220,7 +252,6 @@ def _copy_entitlements_file(
       entitlements file.
     output_directory: The absolute path to the output directory the entitlements
       should be placed in, it must already exist.
-    unique_id: Unique identifier to use for filename of extracted entitlements.
 
   Returns:
     The filename relative to output_directory the entitlements were copied to,
@@ -228,19 +259,15 @@ def _copy_entitlements_file(
     `None`.
   """
   if os.path.exists(original_entitlements_file_path):
-    dest_entitlements_filename = unique_id + '.entitlements'
-    dest_entitlements_path = os.path.join(output_directory,
-                                          dest_entitlements_filename)
-    shutil.copy(original_entitlements_file_path, dest_entitlements_path)
-    return dest_entitlements_filename
+    return _copy_dossier_asset(original_entitlements_file_path,
+                               output_directory, '.entitlements')
   else:
     return None
 
 
 def _copy_provisioning_profile(
     original_provisioning_profile_path: str,
-    output_directory: str,
-    unique_id: str) -> str:
+    output_directory: str) -> str:
   """Copies a provisioning profile file from its path to an output directory.
 
   Args:
@@ -248,23 +275,18 @@ def _copy_provisioning_profile(
       provisioning profile file. File must exist.
     output_directory: The absolute path to the output directory the profile
       should be placed in, it must already exist.
-    unique_id: Unique identifier to use for filename of extracted entitlements.
 
   Returns:
     The filename relative to output_directory the profile was copied to.
   """
   _, profile_extension = os.path.splitext(original_provisioning_profile_path)
-  dest_provisioning_profile_filename = unique_id + profile_extension
-  dest_provision_profile_path = os.path.join(output_directory,
-                                             dest_provisioning_profile_filename)
-  shutil.copy(original_provisioning_profile_path, dest_provision_profile_path)
-  return dest_provisioning_profile_filename
+  return _copy_dossier_asset(original_provisioning_profile_path,
+                             output_directory, profile_extension)
 
 
 def _extract_provisioning_profile(
     bundle_path: str,
-    output_directory: str,
-    unique_id: str) -> Optional[str]:
+    output_directory: str) -> Optional[str]:
   """Extracts the profile for the provided bundle to a destination file name.
 
   Given a bundle_path will extract the profile file to the provided
@@ -275,7 +297,6 @@ def _extract_provisioning_profile(
     bundle_path: The absolute path to the bundle to extract profile from.
     output_directory: The absolute path to the output directory the profile
       should be placed in, it must already exist.
-    unique_id: Unique identifier to use for filename of extracted profile.
 
   Returns:
     The filename relative to output_directory the profile was placed in,
@@ -292,7 +313,7 @@ def _extract_provisioning_profile(
   else:
     return None
   return _copy_provisioning_profile(original_provisioning_profile_path,
-                                    output_directory, unique_id)
+                                    output_directory)
 
 
 def _generate_manifest(
@@ -403,14 +424,12 @@ def _manifest_with_dossier_for_bundle(
     The manifest contents with files they reference copied into
     dossier_directory.
   """
-  unique_id = str(uuid.uuid4())
   entitlements_file, codesign_identity = _extract_codesign_data(
-      bundle_path, dossier_directory, unique_id, codesign_path)
+      bundle_path, dossier_directory, codesign_path)
   if not codesign_identity:
     return None
   provisioning_profile = _extract_provisioning_profile(bundle_path,
-                                                       dossier_directory,
-                                                       unique_id)
+                                                       dossier_directory)
   embedded_manifests = []
   for embedded_bundle_directory in _EMBEDDED_BUNDLE_DIRECTORY_NAMES:
     embedded_manifests.extend(
@@ -467,23 +486,10 @@ def _zip_dossier(dossier_path: str, destination_path: str) -> None:
     destination_path: The file path to place the zipped dossier.
 
   Raises:
-    OSError: If unable to execute packaging command
+    OSError: If unable to write the zipped dossier.
   """
-  command = (
-      '/usr/bin/zip',
-      '--recurse-paths',
-      '--junk-paths',
-      '--quiet',
-      '--strip-extra',
-      '--compression-method', 'store',
-      destination_path,
-      dossier_path,
-  )
-  process = subprocess.Popen(
-      command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-  _, stderr = process.communicate()
-  if process.poll() != 0:
-    raise OSError('Fail to zip dossier: %s' % stderr)
+  dossier_reader.create_zip_archive(
+      dossier_path, destination_path, compress=False, junk_paths=True)
 
 
 def _merge_dossier_contents(
@@ -491,6 +497,9 @@ def _merge_dossier_contents(
     destination_dossier_path: str) -> None:
   """Merges all files except the actual manifest from one dossier to another.
 
+  Assets are named by their contents, so the destination ends up with the union
+  of both sets of assets: those it already has are not copied again.
+
   Args:
     source_dossier_path: The path to the source dossier.
     destination_dossier_path: The path to the destination dossier.
@@ -499,9 +508,14 @@ def _merge_dossier_contents(
   for filename in dossier_files:
     if filename == dossier_reader.MANIFEST_FILENAME:
       continue
-    shutil.copy(
-        os.path.join(source_dossier_path, filename),
-        os.path.join(destination_dossier_path, filename))
+    source_path = os.path.join(source_dossier_path, filename)
+    destination_path = os.path.join(destination_dossier_path, filename)
+    if os.path.exists(destination_path) and (
+        _ASSET_NAME_REGEX.match(filename) or
+        # Dossiers created before assets were named by their contents.
+        filecmp.cmp(source_path, destination_path, shallow=False)):
+      continue
+    shutil.copy(source_path, destination_path)
 
 
 def _create_dossier(parsed_args: argparse.Namespace):
@@ -524,20 +538,18 @@ def _create_dossier(parsed_args: argparse.Namespace):
     packaging_required = True
   if not os.path.exists(dossier_directory):
     os.makedirs(dossier_directory)
-  unique_id = str(uuid.uuid4())
 
   entitlements_filename = None
   entitlements_file = getattr(parsed_args, 'entitlements_file', None)
   if entitlements_file:
     entitlements_filename = _copy_entitlements_file(entitlements_file,
-                                                    dossier_directory,
-                                                    unique_id)
+                                                    dossier_directory)
 
   provisioning_profile_filename = None
   provisioning_profile = getattr(parsed_args, 'provisioning_profile', None)
   if provisioning_profile:
     provisioning_profile_filename = _copy_provisioning_profile(
-        parsed_args.provisioning_profile, dossier_directory, unique_id)
+        parsed_args.provisioning_profile, dossier_directory)
   if parsed_args.infer_identity and provisioning_profile_filename is None:
     raise SystemExit(
         'A provisioning profile must be provided to infer the signing identity')
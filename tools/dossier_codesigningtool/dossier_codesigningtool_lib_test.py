@@ -14,6 +14,7 @@
 """Tests for dossier_codesigningtool_lib."""
 
 import argparse
+import hashlib
 import json
 import os
 import tempfile
@@ -59,6 +60,9 @@ _FAKE_APP_XML_PLIST = """\
 </dict>
 </plist>"""
 
+# The name dossier assets with empty contents are stored under.
+_EMPTY_DIGEST = hashlib.sha256(b'').hexdigest()
+
 
 class DossierCodesigningtoolLibTest(unittest.TestCase):
 
@@ -68,8 +72,8 @@ class DossierCodesigningtoolLibTest(unittest.TestCase):
         tempfile.TemporaryDirectory() as tmp_output_dir_name,
         tempfile.NamedTemporaryFile(suffix='.mobileprovision') as tmp_pp_file):
       actual_filename = dossier_codesigningtool._copy_provisioning_profile(
-          tmp_pp_file.name, tmp_output_dir_name, 'my_unique_id')
-      self.assertEqual(actual_filename, 'my_unique_id.mobileprovision')
+          tmp_pp_file.name, tmp_output_dir_name)
+      self.assertEqual(actual_filename, _EMPTY_DIGEST + '.mobileprovision')
       mock_copy.assert_called_with(
           tmp_pp_file.name, os.path.join(tmp_output_dir_name, actual_filename))
 
@@ -79,8 +83,8 @@ class DossierCodesigningtoolLibTest(unittest.TestCase):
         tempfile.TemporaryDirectory() as tmp_output_dir_name,
         tempfile.NamedTemporaryFile() as tmp_entitlements_file):
       actual_filename = dossier_codesigningtool._copy_entitlements_file(
-          tmp_entitlements_file.name, tmp_output_dir_name, 'my_unique_id')
-      self.assertEqual(actual_filename, 'my_unique_id.entitlements')
+          tmp_entitlements_file.name, tmp_output_dir_name)
+      self.assertEqual(actual_filename, _EMPTY_DIGEST + '.entitlements')
       mock_copy.assert_called_with(
           tmp_entitlements_file.name,
           os.path.join(tmp_output_dir_name, actual_filename))
@@ -91,7 +95,6 @@ class DossierCodesigningtoolLibTest(unittest.TestCase):
           dossier_codesigningtool._copy_entitlements_file(
               os.path.join(tmp_output_dir_name, 'does_not_exist'),
               tmp_output_dir_name,
-              'my_unique_id',
           )
       )
 
@@ -137,6 +140,50 @@ class DossierCodesigningtoolLibTest(unittest.TestCase):
       self.assertNotIn(
           mock.call(tmp_manifest_file, mock.ANY), mock_copy.mock_calls)
 
+  @mock.patch('shutil.copy')
+  def test_merge_dossier_contents_skips_assets_already_present(
+      self, mock_copy):
+    with (
+        tempfile.TemporaryDirectory() as tmp_source_dir,
+        tempfile.TemporaryDirectory() as tmp_output_dir_name,
+    ):
+      shared_profile = _EMPTY_DIGEST + '.mobileprovision'
+      for directory in (tmp_source_dir, tmp_output_dir_name):
+        with open(os.path.join(directory, shared_profile), 'w') as fp:
+          fp.write('')
+      with open(os.path.join(tmp_source_dir, 'legacy.entitlements'),
+                'w') as fp:
+        fp.write('entitlements')
+      with open(os.path.join(tmp_output_dir_name, 'legacy.entitlements'),
+                'w') as fp:
+        fp.write('other entitlements')
+
+      dossier_codesigningtool._merge_dossier_contents(
+          tmp_source_dir, tmp_output_dir_name)
+      # Only assets whose names don't identify their contents are compared.
+      mock_copy.assert_called_once_with(
+          os.path.join(tmp_source_dir, 'legacy.entitlements'),
+          os.path.join(tmp_output_dir_name, 'legacy.entitlements'))
+
+  def test_copy_dossier_asset_stores_identical_files_once(self):
+    with (
+        tempfile.TemporaryDirectory() as tmp_output_dir_name,
+        tempfile.NamedTemporaryFile(suffix='.mobileprovision') as tmp_pp_file,
+        tempfile.NamedTemporaryFile(suffix='.mobileprovision') as tmp_pp_copy,
+    ):
+      for f in (tmp_pp_file, tmp_pp_copy):
+        f.write(b'profile')
+        f.flush()
+      filenames = {
+          dossier_codesigningtool._copy_provisioning_profile(
+              f.name, tmp_output_dir_name)
+          for f in (tmp_pp_file, tmp_pp_copy)
+      }
+      self.assertEqual(
+          {hashlib.sha256(b'profile').hexdigest() + '.mobileprovision'},
+          filenames)
+      self.assertEqual(list(filenames), os.listdir(tmp_output_dir_name))
+
   @mock.patch.object(dossier_codesigningtool, '_copy_provisioning_profile')
   def test_extract_provisioning_profile_with_common_bundle_structure(
       self, mock_copy_provisioning_profile):
@@ -150,9 +197,9 @@ class DossierCodesigningtoolLibTest(unittest.TestCase):
         fp.write('')
 
       dossier_codesigningtool._extract_provisioning_profile(
-          tmp_dir_path, '/path/to/output_directory', 'my_unique_id')
+          tmp_dir_path, '/path/to/output_directory')
       mock_copy_provisioning_profile.assert_called_with(
-          tmp_pp_file_path, '/path/to/output_directory', 'my_unique_id')
+          tmp_pp_file_path, '/path/to/output_directory')
 
   @mock.patch.object(dossier_codesigningtool, '_copy_provisioning_profile')
   def test_extract_provisioning_profile_with_macos_bundle_structure(
@@ -171,9 +218,9 @@ class DossierCodesigningtoolLibTest(unittest.TestCase):
         fp.write('')
 
       dossier_codesigningtool._extract_provisioning_profile(
-          tmp_dir_path, '/path/to/output_directory', 'my_unique_id')
+          tmp_dir_path, '/path/to/output_directory')
       mock_copy_provisioning_profile.assert_called_with(
-          embedded_pp_file_path, '/path/to/output_directory', 'my_unique_id')
+          embedded_pp_file_path, '/path/to/output_directory')
 
 
 class DossierCodesigningtoolGenerateTest(unittest.TestCase):
@@ -344,7 +391,6 @@ class DossierCodesigningtoolGenerateTest(unittest.TestCase):
           dossier_codesigningtool._extract_codesign_data(
               bundle_path,
               tmp_output_dir,
-              'my_unique_id',
               '/usr/bin/codesign',
           )
       )
@@ -352,7 +398,10 @@ class DossierCodesigningtoolGenerateTest(unittest.TestCase):
       expected_codesign_identity = (
           'Apple Development: Bazel Development (XXXXXXXXXX)')
       self.assertEqual(actual_codesign_identity, expected_codesign_identity)
-      self.assertEqual(actual_entitlements_file, 'my_unique_id.entitlements')
+      self.assertEqual(
+          actual_entitlements_file,
+          hashlib.sha256(_FAKE_APP_XML_PLIST.encode()).hexdigest() +
+          '.entitlements')
 
       # Assert written entitlements file matches output.
       actual_entitlements_file_path = os.path.join(
@@ -373,19 +422,19 @@ class DossierCodesigningtoolGenerateTest(unittest.TestCase):
           dossier_codesigningtool._extract_codesign_data(
               bundle_path,
               tmp_output_dir,
-              'my_unique_id',
               '/usr/bin/codesign',
           )
       )
       self.assertIsNone(actual_codesign_identity)
-      self.assertEqual(actual_entitlements_file, 'my_unique_id.entitlements')
+      self.assertEqual(
+          actual_entitlements_file,
+          hashlib.sha256(_FAKE_APP_XML_PLIST.encode()).hexdigest() +
+          '.entitlements')
 
 
 class DossierCodesigningtoolCreateTest(unittest.TestCase):
 
-  @mock.patch('uuid.uuid4')
-  def test_create_dossier_with_directory(self, mock_uuid):
-    mock_uuid.return_value = 'fake'
+  def test_create_dossier_with_directory(self):
     with (
         tempfile.TemporaryDirectory() as tmp_dossier_dir,
         tempfile.NamedTemporaryFile(suffix='.entitlements') as tmp_entitlements,
@@ -404,8 +453,8 @@ class DossierCodesigningtoolCreateTest(unittest.TestCase):
 
       expected_manifest_contents = {
           'codesign_identity': '-',
-          'entitlements': 'fake.entitlements',
-          'provisioning_profile': 'fake.mobileprovision',
+          'entitlements': _EMPTY_DIGEST + '.entitlements',
+          'provisioning_profile': _EMPTY_DIGEST + '.mobileprovision',
           'embedded_bundle_manifests': [],
       }
       manifest_json_path = os.path.join(tmp_dossier_dir, 'manifest.json')
@@ -413,9 +462,7 @@ class DossierCodesigningtoolCreateTest(unittest.TestCase):
       with open(manifest_json_path, 'r') as fp:
         self.assertDictEqual(json.load(fp), expected_manifest_contents)
 
-  @mock.patch('uuid.uuid4')
-  def test_create_dossier_with_zip(self, mock_uuid):
-    mock_uuid.return_value = 'fake'
+  def test_create_dossier_with_zip(self):
     with (
         tempfile.TemporaryDirectory() as tmp_dossier_dir,
         tempfile.NamedTemporaryFile(suffix='.entitlements') as tmp_entitlements,
@@ -437,12 +484,12 @@ class DossierCodesigningtoolCreateTest(unittest.TestCase):
       expected_manifest_contents = {
           'codesign_identity': '-',
           'embedded_bundle_manifests': [],
-          'entitlements': 'fake.entitlements',
-          'provisioning_profile': 'fake.mobileprovision',
+          'entitlements': _EMPTY_DIGEST + '.entitlements',
+          'provisioning_profile': _EMPTY_DIGEST + '.mobileprovision',
       }
       expected_zip_files = {
-          'fake.entitlements',
-          'fake.mobileprovision',
+          _EMPTY_DIGEST + '.entitlements',
+          _EMPTY_DIGEST + '.mobileprovision',
           'manifest.json',
       }
       self.assertTrue(os.path.exists(tmp_dossier_zip))
@@ -43,6 +43,8 @@ from tools.bitcode_strip import bitcode_strip
 from tools.codesigningtool import codesigningtool
 from tools.wrapper_common import execute
 from tools.wrapper_common import lipo
+from tools.wrapper_common import macho
+from tools.wrapper_common import macho_metadata
 
 
 def _is_versioned_file(filepath: str, version: Optional[str] = None) -> bool:
@@ -61,23 +63,30 @@ def _is_versioned_file(filepath: str, version: Optional[str] = None) -> bool:
   return ".framework/Versions/" in filepath
 
 
+def _read_binary_info(binary: str) -> Optional[macho.MachOInfo]:
+  """Returns the Mach-O metadata of a binary, parsed once per action.
+
+  Args:
+    binary: Path to the framework binary.
+  Returns:
+    The binary's macho.MachOInfo, or None if it can't be read as a Mach-O
+    binary.
+  """
+  try:
+    return macho_metadata.read(binary)
+  except (OSError, macho.MachOError):
+    return None
+
+
 def _get_install_path_for_binary(binary: str) -> str:
-  """Returns Mach-O binary install path through 'otool' invocation."""
-  _, stdout, _ = execute.execute_and_filter_output(
-      [
-          "otool",
-          "-D",  # display install path from dylib.
-          "-X",  # avoid printing dylib name.
-          binary
-      ],
-      raise_on_failure=True)
-  stripped_stdout = stdout.strip()
-  result = re.match(r"@rpath/.*", stripped_stdout)
-  if not result:
+  """Returns Mach-O binary install path from its LC_ID_DYLIB load command."""
+  binary_info = _read_binary_info(binary)
+  install_path = binary_info and binary_info.link_info.install_name
+  if not install_path or not install_path.startswith("@rpath/"):
     raise ValueError(
-        "Could not find framework binary install path with otool:\n"
+        "Could not find framework binary install path:\n"
         f"Framework binary: {binary}\n")
-  return stripped_stdout
+  return install_path
 
 
 def _get_framework_version_from_install_path(binary: str) -> str:
@@ -207,7 +216,11 @@ def _strip_or_copy_binary(
     strip_bitcode: Whether to strip bitcode from the final binary
     requested_archs: List of requested binary architectures to preserve.
   """
-  binary_archs, _ = lipo.find_archs_for_binaries([framework_binary])
+  binary_info = _read_binary_info(framework_binary)
+  if binary_info:
+    binary_archs = set(s.arch for s in binary_info.slices)
+  else:
+    binary_archs, _ = lipo.find_archs_for_binaries([framework_binary])
   if not binary_archs:
     raise ValueError(
         "Could not find binary architectures for binaries using lipo."
@@ -20,8 +20,23 @@ import unittest
 from unittest import mock
 
 from tools.imported_dynamic_framework_processor import imported_dynamic_framework_processor
-from tools.wrapper_common import execute
 from tools.wrapper_common import lipo
+from tools.wrapper_common import macho
+from tools.wrapper_common import macho_test_utils
+
+_ARM64 = macho_test_utils.ARM64
+_X86_64 = macho_test_utils.X86_64
+
+_fat = macho_test_utils.fat_macho
+
+
+def _dylib(arch, install_name=None):
+  """Returns a minimal dylib with an optional LC_ID_DYLIB."""
+  load_commands = []
+  if install_name:
+    load_commands.append(macho_test_utils.path_command(
+        macho_test_utils.LC_ID_DYLIB, install_name))
+  return macho_test_utils.thin_macho(arch, load_commands)
 
 
 class ImportedDynamicFrameworkProcessorTest(unittest.TestCase):
@@ -41,19 +56,53 @@ class ImportedDynamicFrameworkProcessorTest(unittest.TestCase):
       fp.write(content)
     return full_path
 
-  @mock.patch.object(execute, "execute_and_filter_output")
-  def test_get_install_path_for_binary(self, mock_execute):
+  def _scratch_binary(self, path, content):
+    full_path = os.path.join(self._scratch_dir, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "wb") as fp:
+      fp.write(content)
+    return full_path
+
+  def test_get_install_path_for_binary(self):
+    binary = self._scratch_binary(
+        "MyFramework.framework/MyFramework", _dylib(_ARM64))
     with self.assertRaisesRegex(
         ValueError, r"Could not find framework binary.*"):
-      mock_execute.return_value = (None, "no rpath", None)
-      imported_dynamic_framework_processor._get_install_path_for_binary(None)
+      imported_dynamic_framework_processor._get_install_path_for_binary(binary)
 
-    mock_execute.return_value = (
-        None, "@rpath/MyFramework.framework/MyFramework", None)
+    binary = self._scratch_binary(
+        "Other.framework/Other",
+        _fat([_dylib(_X86_64, "@rpath/MyFramework.framework/MyFramework"),
+              _dylib(_ARM64, "@rpath/MyFramework.framework/MyFramework")]))
     result = imported_dynamic_framework_processor._get_install_path_for_binary(
-        None)
+        binary)
     self.assertEqual(result, "@rpath/MyFramework.framework/MyFramework")
 
+  @mock.patch.object(lipo, "find_archs_for_binaries")
+  @mock.patch.object(macho, "read_info", wraps=macho.read_info)
+  @mock.patch.object(
+      imported_dynamic_framework_processor, "_strip_framework_binary")
+  def test_binary_headers_are_read_once(
+      self, mock_strip_framework_binary, mock_read_info, mock_lipo):
+    binary = self._scratch_binary(
+        "Foo.framework/Versions/A/Foo",
+        _fat([_dylib(_X86_64, "@rpath/Foo.framework/Versions/A/Foo"),
+              _dylib(_ARM64, "@rpath/Foo.framework/Versions/A/Foo")]))
+    self.assertEqual(
+        "A",
+        imported_dynamic_framework_processor
+        ._get_framework_version_from_install_path(binary))
+    imported_dynamic_framework_processor._strip_or_copy_binary(
+        framework_binary=binary,
+        output_path="/tmp/path/to/outputs",
+        strip_bitcode=False,
+        requested_archs=["arm64"])
+
+    mock_read_info.assert_called_once_with(binary)
+    mock_lipo.assert_not_called()
+    mock_strip_framework_binary.assert_called_with(
+        binary, "/tmp/path/to/outputs", set(["arm64"]))
+
   @mock.patch.object(
       imported_dynamic_framework_processor, "_get_install_path_for_binary")
   def test_get_version_from_install_path_fails(self, mock_install_path):
@@ -1,13 +1,37 @@
 import argparse
+import concurrent.futures
 import datetime
+import json
+import os
 import plistlib
 import shutil
 import subprocess
 import sys
-from typing import List, Optional, Tuple
+import tempfile
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from tools.wrapper_common import cms
 
 _USE_SECURITY = sys.platform == "darwin"
 
+# Upper bound on the number of profiles decoded concurrently.
+_MAX_DECODE_WORKERS = 8
+
+# Bump when the format of the index entries changes.
+_INDEX_VERSION = 1
+
+# Names the index file when --index_path isn't passed, e.g. with --action_env.
+_INDEX_PATH_ENV = "PROVISIONING_PROFILE_INDEX_PATH"
+
+
+class _ProfileInfo(NamedTuple):
+    name: str
+    uuid: str
+    creation_date: datetime.datetime
+    expiration_date: Optional[datetime.datetime]
+    team_id: str
+
+
 def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser()
     parser.add_argument("name", help="The name (or UUID) of the profile to find")
@@ -28,10 +52,25 @@ def _build_parser() -> argparse.ArgumentParser:
         default=None,
         type=str,
     )
+    parser.add_argument(
+        "--index_path",
+        help="Where to keep the index of decoded profiles between runs. "
+        "Defaults to the value of the %s environment variable; without "
+        "either, nothing is kept between runs" % _INDEX_PATH_ENV,
+        default=os.environ.get(_INDEX_PATH_ENV) or None,
+        type=str,
+    )
     return parser
 
 
-def _profile_contents(profile: str) -> Tuple[str, datetime.datetime, str]:
+def _decode_profile(profile: str) -> bytes:
+    # Profiles are CMS signed data with the plist as the content, read it in
+    # process first and only fall back to the system tools if that fails.
+    try:
+        return cms.extract_signed_data_content_from_file(profile)
+    except cms.CmsError:
+        pass
+
     if _USE_SECURITY:
         output = subprocess.check_output(
             ["security", "cms", "-D", "-i", profile],
@@ -49,27 +88,211 @@ def _profile_contents(profile: str) -> Tuple[str, datetime.datetime, str]:
         except subprocess.CalledProcessError as e:
             print(e.stderr, file=sys.stderr)
             raise e
-    plist = plistlib.loads(output)
-    return plist["Name"], plist["UUID"], plist["CreationDate"], plist["TeamIdentifier"][0]
+    return output
+
+
+def _profile_contents(profile: str) -> _ProfileInfo:
+    plist = plistlib.loads(_decode_profile(profile))
+    return _ProfileInfo(
+        name=plist["Name"],
+        uuid=plist["UUID"],
+        creation_date=plist["CreationDate"],
+        expiration_date=plist.get("ExpirationDate"),
+        team_id=plist["TeamIdentifier"][0],
+    )
+
+
+def _file_key(path: str) -> Optional[List[int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def _encode_date(date: Optional[datetime.datetime]) -> Optional[str]:
+    return date.isoformat() if date else None
+
+
+def _decode_date(date: Optional[str]) -> Optional[datetime.datetime]:
+    return datetime.datetime.fromisoformat(date) if date else None
+
+
+class _ProfileIndex:
+    """On-disk index of the fields the finder needs from each profile.
+
+    Entries are keyed by the real path of the profile and are only used while
+    the file's size, mtime and inode are unchanged, so edited or replaced
+    profiles are decoded again. The index is updated incrementally and written
+    atomically, concurrent finders at worst redo each other's work.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self._path = path
+        self._entries: Dict[str, dict] = {}
+        self._dirty = False
+        if not path:
+            return
+        try:
+            with open(path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(index, dict) and index.get("version") == _INDEX_VERSION:
+            self._entries = index.get("profiles", {})
+
+    def cached(self, profile: str) -> Optional[_ProfileInfo]:
+        path = os.path.realpath(profile)
+        entry = self._entries.get(path)
+        if not entry or entry["key"] != _file_key(path):
+            return None
+        return _ProfileInfo(
+            name=entry["name"],
+            uuid=entry["uuid"],
+            creation_date=_decode_date(entry["creation_date"]),
+            expiration_date=_decode_date(entry["expiration_date"]),
+            team_id=entry["team_id"],
+        )
+
+    def add(self, profile: str, info: _ProfileInfo) -> None:
+        path = os.path.realpath(profile)
+        key = _file_key(path)
+        if not key:
+            return
+        self._entries[path] = {
+            "key": key,
+            "name": info.name,
+            "uuid": info.uuid,
+            "creation_date": _encode_date(info.creation_date),
+            "expiration_date": _encode_date(info.expiration_date),
+            "team_id": info.team_id,
+        }
+        self._dirty = True
+
+    def lookup(self, profile: str) -> _ProfileInfo:
+        info = self.cached(profile)
+        if info is None:
+            info = _profile_contents(profile)
+            self.add(profile, info)
+        return info
+
+    def lookup_all(
+        self, profiles: List[str]
+    ) -> Iterator[Tuple[int, str, _ProfileInfo]]:
+        """Yields (position, profile, info) for the given profiles.
+
+        Profiles found in the index come first, the rest are decoded on a
+        bounded pool and yielded as they finish. Closing the generator early
+        cancels the decodes that haven't started yet.
+        """
+        misses = []
+        for position, profile in enumerate(profiles):
+            info = self.cached(profile)
+            if info is None:
+                misses.append((position, profile))
+            else:
+                yield position, profile, info
+        if not misses:
+            return
+
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(len(misses), _MAX_DECODE_WORKERS)
+        )
+        try:
+            futures = {
+                executor.submit(_profile_contents, profile): (position, profile)
+                for position, profile in misses
+            }
+            for future in concurrent.futures.as_completed(futures):
+                position, profile = futures[future]
+                info = future.result()
+                self.add(profile, info)
+                yield position, profile, info
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def save(self) -> None:
+        if not self._path or not self._dirty:
+            return
+        # Drop the entries for profiles that no longer exist.
+        entries = {
+            path: entry
+            for path, entry in self._entries.items()
+            if os.path.exists(path)
+        }
+        try:
+            index_dir = os.path.dirname(self._path)
+            os.makedirs(index_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=index_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": _INDEX_VERSION, "profiles": entries}, f)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            # The index is only an optimization.
+            print(f"warning: failed to write profile index: {e}", file=sys.stderr)
+
+
+def _profile_file_stem(profile: str) -> str:
+    return os.path.splitext(os.path.basename(profile))[0]
 
 
 def _find_newest_profile(
-    expected_specifier: str, team_id: Optional[str], profiles: List[str]
+    expected_specifier: str,
+    team_id: Optional[str],
+    profiles: List[str],
+    index: Optional[_ProfileIndex] = None,
 ) -> Optional[str]:
-    newest_path: Optional[str] = None
-    newest_date: Optional[datetime.datetime] = None
+    if index is None:
+        index = _ProfileIndex(None)
+
+    def is_uuid_match(info: _ProfileInfo) -> bool:
+        return info.uuid == expected_specifier and (
+            not team_id or team_id == info.team_id
+        )
+
+    # Installed profiles are named after their UUID, so when looking up by
+    # UUID the right file can usually be checked on its own. UUIDs are unique,
+    # so a match ends the search.
     for profile in profiles:
-        profile_name, profile_uuid, creation_date, actual_team_id = _profile_contents(profile)
-        if profile_name != expected_specifier and profile_uuid != expected_specifier:
-            continue
-        if team_id and team_id != actual_team_id:
-            continue
-        # TODO: Skip expired profiles
-        if not newest_date or creation_date > newest_date:
-            newest_path = profile
-            newest_date = creation_date
+        if _profile_file_stem(profile) == expected_specifier:
+            if is_uuid_match(index.lookup(profile)):
+                return profile
+
+    newest_path: Optional[str] = None
+    newest_key: Optional[Tuple[datetime.datetime, int]] = None
+    # The same UUID can be installed in several directories; the first one in
+    # the list wins. Profiles are seen out of order, so a match only ends the
+    # search once every profile before it has been seen.
+    uuid_match: Optional[str] = None
+    uuid_match_position = len(profiles)
+    seen = set()
+    first_unseen = 0
+    candidates = index.lookup_all(profiles)
+    try:
+        for position, profile, info in candidates:
+            seen.add(position)
+            while first_unseen in seen:
+                first_unseen += 1
+            if is_uuid_match(info):
+                if position < uuid_match_position:
+                    uuid_match = profile
+                    uuid_match_position = position
+            elif (
+                info.name == expected_specifier or info.uuid == expected_specifier
+            ) and (not team_id or team_id == info.team_id):
+                # TODO: Skip expired profiles
+                # Break ties on the creation date by the position in the list
+                # to keep the result stable.
+                key = (info.creation_date, -position)
+                if not newest_key or key > newest_key:
+                    newest_path = profile
+                    newest_key = key
+            if uuid_match and first_unseen >= uuid_match_position:
+                return uuid_match
+    finally:
+        candidates.close()
 
-    return newest_path
+    return uuid_match or newest_path
 
 
 def _find_profile(
@@ -78,10 +301,13 @@ def _find_profile(
     output: str,
     local_profiles: List[str],
     fallback_profiles: List[str],
+    index_path: Optional[str] = None,
 ) -> None:
+    index = _ProfileIndex(index_path)
     profile = _find_newest_profile(
-        name, team_id, local_profiles + fallback_profiles
+        name, team_id, local_profiles + fallback_profiles, index
     )
+    index.save()
     if not profile:
         sys.exit(
             f"\033[31merror:\033[39m no provisioning profile was found named '{name}'"
@@ -98,4 +324,5 @@ if __name__ == "__main__":
         args.output,
         args.local_profiles or [],
         args.fallback_profiles or [],
+        args.index_path,
     )
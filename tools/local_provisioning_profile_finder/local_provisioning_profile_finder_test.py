@@ -0,0 +1,143 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for local_provisioning_profile_finder."""
+
+import datetime
+import os
+import plistlib
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from tools.local_provisioning_profile_finder import (
+    local_provisioning_profile_finder as finder,
+)
+from tools.wrapper_common import asn1_test_utils
+
+
+class LocalProvisioningProfileFinderTest(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self._tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._tmp_dir)
+        self._index_path = os.path.join(self._tmp_dir, "cache", "index.json")
+
+    def _write_profile(self, filename, name, uuid, creation_day, team_id="TEAM"):
+        path = os.path.join(self._tmp_dir, filename)
+        plist = {
+            "Name": name,
+            "UUID": uuid,
+            "CreationDate": datetime.datetime(2026, 1, creation_day),
+            "ExpirationDate": datetime.datetime(2027, 1, creation_day),
+            "TeamIdentifier": [team_id],
+        }
+        with open(path, "wb") as f:
+            f.write(asn1_test_utils.signed_data_with_content(plistlib.dumps(plist)))
+        return path
+
+    def _find(self, specifier, profiles, team_id=None):
+        return finder._find_newest_profile(
+            specifier, team_id, profiles, finder._ProfileIndex(self._index_path)
+        )
+
+    def test_finds_newest_matching_profile(self):
+        old = self._write_profile("a.mobileprovision", "Dev", "UUID-A", 1)
+        new = self._write_profile("b.mobileprovision", "Dev", "UUID-B", 2)
+        other = self._write_profile("c.mobileprovision", "Other", "UUID-C", 3)
+        profiles = [old, new, other]
+        self.assertEqual(new, self._find("Dev", profiles))
+        self.assertEqual(old, self._find("UUID-A", profiles))
+        self.assertIsNone(self._find("Dev", profiles, team_id="OTHER"))
+
+    def test_index_skips_decoding_unchanged_profiles(self):
+        profiles = [
+            self._write_profile("a.mobileprovision", "Dev", "UUID-A", 1),
+            self._write_profile("b.mobileprovision", "Dev", "UUID-B", 2),
+        ]
+        index = finder._ProfileIndex(self._index_path)
+        finder._find_newest_profile("Dev", None, profiles, index)
+        index.save()
+
+        with mock.patch.object(
+            finder, "_profile_contents", wraps=finder._profile_contents
+        ) as profile_contents:
+            self.assertEqual(profiles[1], self._find("Dev", profiles))
+            profile_contents.assert_not_called()
+
+            # Replacing a profile invalidates just its entry.
+            self._write_profile("a.mobileprovision", "Dev", "UUID-A", 3)
+            self.assertEqual(profiles[0], self._find("Dev", profiles))
+            profile_contents.assert_called_once_with(profiles[0])
+
+    def test_uuid_named_profile_is_checked_first(self):
+        profiles = [
+            self._write_profile("%s.mobileprovision" % uuid, "Dev", uuid, day)
+            for day, uuid in enumerate(["UUID-A", "UUID-B", "UUID-C"], 1)
+        ]
+        with mock.patch.object(
+            finder, "_profile_contents", wraps=finder._profile_contents
+        ) as profile_contents:
+            self.assertEqual(profiles[1], self._find("UUID-B", profiles))
+            profile_contents.assert_called_once_with(profiles[1])
+
+    def test_ties_resolve_to_first_profile(self):
+        profiles = [
+            self._write_profile("%d.mobileprovision" % i, "Dev", "UUID-%d" % i, 1)
+            for i in range(20)
+        ]
+        for _ in range(5):
+            self.assertEqual(profiles[0], self._find("Dev", profiles))
+
+    def test_duplicate_uuid_resolves_to_first_profile(self):
+        profiles = [
+            self._write_profile("%s.mobileprovision" % x, "Dev", "UUID-A", 1)
+            for x in ("local", "fallback")
+        ]
+        profile_contents = finder._profile_contents
+
+        def slow_first(profile):
+            if profile == profiles[0]:
+                # Finish decoding the first profile last.
+                time.sleep(0.1)
+            return profile_contents(profile)
+
+        with mock.patch.object(finder, "_profile_contents", side_effect=slow_first):
+            self.assertEqual(profiles[0], self._find("UUID-A", profiles))
+
+    def test_index_is_opt_in(self):
+        with mock.patch.dict(os.environ, clear=True):
+            args = finder._build_parser().parse_args(["Dev", "out"])
+        self.assertIsNone(args.index_path)
+        with mock.patch.dict(os.environ, {finder._INDEX_PATH_ENV: self._index_path}):
+            args = finder._build_parser().parse_args(["Dev", "out"])
+        self.assertEqual(self._index_path, args.index_path)
+
+        profile = self._write_profile("a.mobileprovision", "Dev", "UUID-A", 1)
+        output = os.path.join(self._tmp_dir, "out.mobileprovision")
+        finder._find_profile("Dev", None, output, [profile], [])
+        self.assertTrue(os.path.exists(output))
+        self.assertFalse(os.path.exists(os.path.dirname(self._index_path)))
+
+    def test_unreadable_index_is_ignored(self):
+        os.makedirs(os.path.dirname(self._index_path))
+        with open(self._index_path, "w") as f:
+            f.write("not json")
+        profile = self._write_profile("a.mobileprovision", "Dev", "UUID-A", 1)
+        self.assertEqual(profile, self._find("Dev", [profile]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -36,6 +36,20 @@ the following keys:
       that will be kept.
   output: A string indicating the path to where the merged plist will be
       written, or a writable file-like object (for testing).
+  parse_cache_dir: If present, a string that denotes the path to a directory
+      used to cache parsed plists across invocations of the tool. Entries are
+      keyed by the digest of the raw plist bytes, so repeated reads of the
+      same file (child plists, profile metadata, etc.) skip both plutil and
+      XML parsing. The directory is created if needed.
+  parse_cache_max_bytes: If present (and parse_cache_dir is set), an integer
+      capping the total size of the cache directory; the least recently used
+      entries are evicted once it is exceeded.
+  profile_output: If present, a string that denotes the path to a JSON file
+      that will be written with the per-stage timings of the run (parsing of
+      each input, substitution, merging, task updates, validation and
+      writing) along with object and byte counts. If this key is not set but
+      the PLISTTOOL_PROFILE_DIR environment variable is, a file named after
+      the target is written into that directory instead.
   binary: If true, the output plist file will be written in binary format;
       otherwise, it will be written in XML format. This property is ignored if
       |output| is not a path.
@@ -143,13 +157,24 @@ satisfied, an error will be raised:
 # feed a stable input, the output might not be deterministic when run on
 # different machines and/or different macOS versions.
 
+import base64
+import concurrent.futures
+import contextlib
 import copy
 import datetime
+import hashlib
+import io
 import json
+import os
+import pickle
 import plistlib
 import re
+import struct
 import subprocess
 import sys
+import tempfile
+import time
+from xml.etree import ElementTree
 
 
 # Format strings for errors that are raised, exposed here to the tests
@@ -341,10 +366,32 @@ ENTITLEMENTS_VALUE_HAS_WILDCARD = (
 # All valid keys in the a control structure.
 _CONTROL_KEYS = frozenset([
     'binary', 'forced_plists', 'entitlements_options', 'info_plist_options',
-    'output', 'plists', 'raw_substitutions', 'target',
-    'variable_substitutions',
+    'output', 'parse_cache_dir', 'parse_cache_max_bytes', 'plists',
+    'profile_output', 'raw_substitutions', 'target', 'variable_substitutions',
 ])
 
+# Environment variable naming a directory to write profiles into when the
+# control doesn't have a profile_output.
+_PROFILE_DIR_ENV_VAR = 'PLISTTOOL_PROFILE_DIR'
+
+# Default size cap for the on-disk parse cache (see PlistParseCache).
+_DEFAULT_PARSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Upper bound on the number of child plists loaded concurrently when
+# validating them against their parent.
+_MAX_CHILD_PLIST_WORKERS = 8
+
+# Chunk size used when streaming plist files.
+_READ_CHUNK_SIZE = 1024 * 1024
+
+# Well-formed XML plists start with the XML declaration (no leading
+# whitespace), which is how they are told apart from the other formats.
+_XML_PLIST_HEADER = b'<?xml'
+
+# Suffix used for the entries in the on-disk parse cache. Bump the version if
+# the format of the cached objects ever changes.
+_PARSE_CACHE_ENTRY_SUFFIX = '.plistcache1'
+
 # All valid keys in the info_plist_options control structure.
 _INFO_PLIST_OPTIONS_KEYS = frozenset([
     'child_plists', 'child_plist_required_values', 'pkginfo', 'version_file',
@@ -547,6 +594,291 @@ def _load_json(string_or_file):
   return json.load(string_or_file)
 
 
+def _xml_element_to_value(elem):
+  """Converts a plist XML element (and its children) to the Python value.
+
+  Mirrors the conversions done by plistlib for the XML plist format.
+
+  Args:
+    elem: The ElementTree element for the value.
+  Returns:
+    The Python object for the element.
+  Raises:
+    ValueError: If the element isn't a known plist value type.
+  """
+  tag = elem.tag
+  # Empty elements have no text.
+  text = elem.text or ''
+  if tag == 'string':
+    return text
+  if tag == 'integer':
+    text = text.strip()
+    if text.startswith(('0x', '0X')):
+      return int(text, 16)
+    return int(text)
+  if tag == 'real':
+    return float(text)
+  if tag == 'true':
+    return True
+  if tag == 'false':
+    return False
+  if tag == 'date':
+    return datetime.datetime.strptime(text.strip(), '%Y-%m-%dT%H:%M:%SZ')
+  if tag == 'data':
+    return base64.b64decode(text.encode('ascii'))
+  if tag == 'array':
+    return [_xml_element_to_value(x) for x in elem]
+  if tag == 'dict':
+    result = {}
+    children = list(elem)
+    for key_elem, value_elem in zip(children[::2], children[1::2]):
+      result[key_elem.text or ''] = _xml_element_to_value(value_elem)
+    return result
+  raise ValueError('Unknown plist element: %s' % tag)
+
+
+def _xml_plist_top_level_values(plist_contents, keys):
+  """Streams an XML plist, extracting only some of its top-level values.
+
+  The document is read with an incremental parser; values for keys that are
+  not requested are discarded as they are parsed, and parsing stops as soon as
+  all of the requested keys have been seen.
+
+  Args:
+    plist_contents: The raw bytes of the XML plist.
+    keys: The set of top-level keys to extract.
+  Returns:
+    A dictionary with the requested keys that were found, or None if the root
+    of the plist is not a dictionary.
+  """
+  result = {}
+  remaining = set(keys)
+  depth = 0
+  pending_key = None
+  for event, elem in ElementTree.iterparse(
+      io.BytesIO(plist_contents), events=('start', 'end')):
+    if event == 'start':
+      depth += 1
+      if depth == 2 and elem.tag != 'dict':
+        return None
+      continue
+
+    depth -= 1
+    if depth != 2:
+      # Only direct children of the root dictionary are interesting; nested
+      # elements are handled when their top-level value finishes.
+      continue
+    if elem.tag == 'key':
+      pending_key = elem.text or ''
+    else:
+      if pending_key in remaining:
+        result[pending_key] = _xml_element_to_value(elem)
+        remaining.discard(pending_key)
+        if not remaining:
+          break
+      pending_key = None
+    elem.clear()
+  return result
+
+
+class _BinaryPlistReader(object):
+  """Reads individual objects out of a binary (bplist00) plist on demand.
+
+  Uses the offset table of the binary format to jump directly to the objects
+  that are needed instead of decoding the whole object graph.
+  """
+
+  def __init__(self, data):
+    """Initializes the reader.
+
+    Args:
+      data: The raw bytes of the binary plist.
+    Raises:
+      ValueError: If the data isn't a valid binary plist.
+    """
+    if len(data) < 40 or not data.startswith(b'bplist00'):
+      raise ValueError('Not a binary plist.')
+    self._data = data
+    (offset_size, self._ref_size, num_objects, self.top_object,
+     offset_table_offset) = struct.unpack('>6xBBQQQ', data[-32:])
+    self._offsets = [
+        self._read_sized_int(offset_table_offset + i * offset_size, offset_size)
+        for i in range(num_objects)
+    ]
+
+  def _read_sized_int(self, offset, size):
+    return int.from_bytes(self._data[offset:offset + size], 'big')
+
+  def _read_refs(self, offset, count):
+    size = self._ref_size
+    return [self._read_sized_int(offset + i * size, size) for i in range(count)]
+
+  def _read_length(self, offset, marker_info):
+    """Returns (length, offset of the object's payload)."""
+    if marker_info != 0xF:
+      return marker_info, offset + 1
+    int_size = 1 << (self._data[offset + 1] & 0xF)
+    return (self._read_sized_int(offset + 2, int_size),
+            offset + 2 + int_size)
+
+  def dict_refs(self, ref):
+    """Returns the key/value object refs of a dictionary, or None."""
+    offset = self._offsets[ref]
+    marker = self._data[offset]
+    if marker >> 4 != 0xD:
+      return None
+    count, offset = self._read_length(offset, marker & 0xF)
+    keys = self._read_refs(offset, count)
+    values = self._read_refs(offset + count * self._ref_size, count)
+    return list(zip(keys, values))
+
+  def read_object(self, ref):
+    """Decodes the object with the given ref (recursively)."""
+    offset = self._offsets[ref]
+    marker = self._data[offset]
+    kind, info = marker >> 4, marker & 0xF
+    if marker == 0x08:
+      return False
+    if marker == 0x09:
+      return True
+    if marker == 0x00:
+      return None
+    if kind == 0x1:
+      size = 1 << info
+      return int.from_bytes(
+          self._data[offset + 1:offset + 1 + size], 'big', signed=size >= 8)
+    if kind == 0x2:
+      fmt = '>f' if info == 2 else '>d'
+      return struct.unpack_from(fmt, self._data, offset + 1)[0]
+    if marker == 0x33:
+      seconds = struct.unpack_from('>d', self._data, offset + 1)[0]
+      return (datetime.datetime(2001, 1, 1) +
+              datetime.timedelta(seconds=seconds))
+    if kind == 0x4:
+      length, start = self._read_length(offset, info)
+      return self._data[start:start + length]
+    if kind == 0x5:
+      length, start = self._read_length(offset, info)
+      return self._data[start:start + length].decode('ascii')
+    if kind == 0x6:
+      length, start = self._read_length(offset, info)
+      return self._data[start:start + length * 2].decode('utf-16be')
+    if kind == 0x8:
+      return plistlib.UID(self._read_sized_int(offset + 1, info + 1))
+    if kind == 0xA:
+      length, start = self._read_length(offset, info)
+      return [self.read_object(r) for r in self._read_refs(start, length)]
+    if kind == 0xD:
+      return {
+          self.read_object(k): self.read_object(v)
+          for k, v in self.dict_refs(ref)
+      }
+    raise ValueError('Unknown binary plist marker: 0x%02x' % marker)
+
+
+def _binary_plist_top_level_values(plist_contents, keys):
+  """Extracts only some of the top-level values of a binary plist.
+
+  Args:
+    plist_contents: The raw bytes of the binary plist.
+    keys: The set of top-level keys to extract.
+  Returns:
+    A dictionary with the requested keys that were found, or None if the root
+    of the plist is not a dictionary.
+  """
+  reader = _BinaryPlistReader(plist_contents)
+  refs = reader.dict_refs(reader.top_object)
+  if refs is None:
+    return None
+  result = {}
+  for key_ref, value_ref in refs:
+    key = reader.read_object(key_ref)
+    if key in keys:
+      result[key] = reader.read_object(value_ref)
+  return result
+
+
+def _count_objects(value):
+  """Returns the number of plist objects in value (recursively)."""
+  count = 1
+  if isinstance(value, dict):
+    for v in value.values():
+      count += 1 + _count_objects(v)  # The key and the value.
+  elif isinstance(value, list):
+    for v in value:
+      count += _count_objects(v)
+  return count
+
+
+def _input_name(p):
+  """Returns the name to use in profiles for an input to the tool."""
+  if isinstance(p, str):
+    return p
+  if isinstance(p, dict):
+    return '<dict>'
+  return '<input>'
+
+
+class _Profiler(object):
+  """Collects per-stage timings for a run of PlistTool."""
+
+  def __init__(self, target):
+    self._target = target
+    self._stages = []
+    self._start = time.perf_counter()
+
+  @contextlib.contextmanager
+  def stage(self, name, **details):
+    """Times the body of the with statement as the given stage.
+
+    Args:
+      name: The name of the stage.
+      **details: Extra values to record for the stage.
+    Yields:
+      The dictionary for the stage, more details can be added to it.
+    """
+    record = {'stage': name}
+    record.update(details)
+    start = time.perf_counter()
+    try:
+      yield record
+    finally:
+      record['seconds'] = time.perf_counter() - start
+      self._stages.append(record)
+
+  def write(self, path):
+    """Writes the collected profile as JSON to the given path."""
+    profile = {
+        'target': self._target,
+        'total_seconds': time.perf_counter() - self._start,
+        'stages': self._stages,
+    }
+    with open(path, 'w') as f:
+      json.dump(profile, f, indent=2, sort_keys=True)
+
+
+class _NullProfiler(object):
+  """Stand in for _Profiler when profiling isn't enabled."""
+
+  @contextlib.contextmanager
+  def stage(self, name, **details):
+    del name, details  # Unused.
+    yield {}
+
+
+def _profile_output_path(control, target):
+  """Returns the path to write the profile to, or None to not profile."""
+  output = control.get('profile_output')
+  if output:
+    return output
+  profile_dir = os.environ.get(_PROFILE_DIR_ENV_VAR)
+  if profile_dir:
+    os.makedirs(profile_dir, exist_ok=True)
+    name = re.sub(r'[^A-Za-z0-9_.-]', '_', target).strip('_')
+    return os.path.join(profile_dir, '%s-%d.json' % (name, os.getpid()))
+  return None
+
+
 class PlistToolError(ValueError):
   # pylint: disable=g-bad-exception-name
   """Raised for all errors.
@@ -718,6 +1050,111 @@ class SubstitutionEngine(object):
     _helper(key_name, value)
 
 
+def _file_digest(plist_file):
+  """Returns the PlistParseCache key for the rest of a file-like object.
+
+  The file is read in chunks and then rewound to where it started.
+
+  Args:
+    plist_file: The seekable file-like object containing the plist data.
+  Returns:
+    The digest of the remaining contents.
+  """
+  start = plist_file.tell()
+  hasher = hashlib.sha256()
+  for chunk in iter(lambda: plist_file.read(_READ_CHUNK_SIZE), b''):
+    hasher.update(chunk)
+  plist_file.seek(start)
+  return hasher.hexdigest()
+
+
+class PlistParseCache(object):
+  """On-disk cache of parsed plist objects.
+
+  Entries are keyed by the SHA-256 digest of the raw plist bytes and hold the
+  pickled object graph, so a hit skips both plutil and XML parsing. Writes are
+  atomic (write to a temporary file and rename), which makes the cache safe to
+  share between concurrent invocations of the tool. Once the total size of the
+  entries goes over the cap, the least recently used ones are evicted.
+  """
+
+  def __init__(self, cache_dir, max_bytes=None):
+    """Initializes the cache.
+
+    Args:
+      cache_dir: The directory to hold the cache entries, created if needed.
+      max_bytes: The maximum total size of the cache entries, or None for the
+          default.
+    """
+    self._cache_dir = cache_dir
+    self._max_bytes = (
+        _DEFAULT_PARSE_CACHE_MAX_BYTES if max_bytes is None else max_bytes)
+    os.makedirs(cache_dir, exist_ok=True)
+
+  @staticmethod
+  def digest(contents):
+    """Returns the cache key for the given raw plist bytes."""
+    return hashlib.sha256(contents).hexdigest()
+
+  def _entry_path(self, digest):
+    return os.path.join(self._cache_dir, digest + _PARSE_CACHE_ENTRY_SUFFIX)
+
+  def get(self, digest):
+    """Returns the cached object for the digest, or None on a miss."""
+    path = self._entry_path(digest)
+    try:
+      with open(path, 'rb') as f:
+        value = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+      # Missing, evicted by another process, or truncated; treat as a miss.
+      return None
+    try:
+      # Record the use so eviction is least-recently-used.
+      os.utime(path)
+    except OSError:
+      pass
+    return value
+
+  def put(self, digest, value):
+    """Stores the object for the digest and evicts entries if over the cap."""
+    fd, tmp_path = tempfile.mkstemp(dir=self._cache_dir, suffix='.tmp')
+    try:
+      with os.fdopen(fd, 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+      os.replace(tmp_path, self._entry_path(digest))
+    except OSError:
+      # The cache is only an optimization; never fail the action over it.
+      if os.path.exists(tmp_path):
+        os.unlink(tmp_path)
+      return
+    self._evict()
+
+  def _evict(self):
+    """Removes the least recently used entries until under the size cap."""
+    entries = []
+    total = 0
+    for name in os.listdir(self._cache_dir):
+      if not name.endswith(_PARSE_CACHE_ENTRY_SUFFIX):
+        continue
+      path = os.path.join(self._cache_dir, name)
+      try:
+        st = os.stat(path)
+      except OSError:
+        continue
+      entries.append((st.st_mtime, st.st_size, path))
+      total += st.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+      if total <= self._max_bytes:
+        break
+      try:
+        os.unlink(path)
+      except OSError:
+        pass
+      total -= size
+
+
 class PlistIO(object):
   """Helpers for read/writing plists.
 
@@ -725,6 +1162,10 @@ class PlistIO(object):
   callers having to know.
   """
 
+  # The PlistParseCache to use when reading plists, if any. Set by PlistTool
+  # for the duration of a run.
+  parse_cache = None
+
   @classmethod
   def get_dict(cls, p, target):
     """Returns a plist dictionary based on the given object.
@@ -749,6 +1190,56 @@ class PlistIO(object):
 
     return cls._read_plist(p, '<input>', target)
 
+  @classmethod
+  def get_partial_dict(cls, p, target, keys):
+    """Returns a plist dictionary with only the requested top-level keys.
+
+    This supports the same inputs as get_dict(), but for XML and binary plists
+    only the values for the given keys are decoded (XML is streamed and
+    parsing stops once all of the keys are found; binary plists use the offset
+    table to jump to the values). Other formats fall back to a full read.
+
+    Args:
+      p: The object to interpret as a plist.
+      target: The name of the target for which the plist is being built.
+      keys: The top-level keys that are needed.
+    Returns:
+      A dictionary containing (at least) the requested keys that are in the
+      plist.
+    """
+    if isinstance(p, dict):
+      return p
+
+    if isinstance(p, str):
+      with open(p, 'rb') as plist_file:
+        plist_contents = plist_file.read()
+      name = p
+    else:
+      plist_contents = p.read()
+      name = '<input>'
+
+    parse_cache = cls.parse_cache
+    if parse_cache:
+      result = parse_cache.get(PlistParseCache.digest(plist_contents))
+      if result is not None:
+        return result
+
+    keys = frozenset(keys)
+    result = None
+    try:
+      if plist_contents.startswith(b'bplist00'):
+        result = _binary_plist_top_level_values(plist_contents, keys)
+      elif plist_contents.startswith(_XML_PLIST_HEADER):
+        result = _xml_plist_top_level_values(plist_contents, keys)
+    except (ValueError, IndexError, TypeError, AttributeError, struct.error,
+            ElementTree.ParseError):
+      # Let the full parser deal with (and report) anything unexpected.
+      result = None
+    if result is not None:
+      return result
+
+    return cls._read_plist(io.BytesIO(plist_contents), name, target)
+
   @classmethod
   def _read_plist(cls, plist_file, name, target):
     """Reads a plist file and returns its contents as a dictionary.
@@ -767,14 +1258,64 @@ class PlistIO(object):
     Raises:
       PlistToolError: if plutil return code is non-zero.
     """
-    plist_contents = plist_file.read()
+    parse_cache = cls.parse_cache
+    if parse_cache:
+      digest = _file_digest(plist_file)
+      result = parse_cache.get(digest)
+      if result is not None:
+        return result
+      result = cls._parse_plist_file(plist_file, name, target)
+      parse_cache.put(digest, result)
+      return result
+
+    return cls._parse_plist_file(plist_file, name, target)
+
+  @classmethod
+  def _parse_plist_file(cls, plist_file, name, target):
+    """Parses a plist from a file-like object.
 
+    XML plists are fed to plistlib's expat based reader straight from the file
+    in chunks, so the objects are built from the token stream without first
+    holding the whole document in memory. Other formats are read in full and
+    handed to _parse_plist_contents().
+
+    Args:
+      plist_file: The file-like object containing the plist data.
+      name: Name to report the file-like object as if it fails xml conversion.
+      target: The name of the target for which the plist is being built.
+    Returns:
+      The contents of the plist.
+
+    Raises:
+      PlistToolError: if plutil return code is non-zero.
+    """
+    start = plist_file.tell()
+    header = plist_file.read(len(_XML_PLIST_HEADER))
+    plist_file.seek(start)
+    if header == _XML_PLIST_HEADER:
+      return plistlib.load(plist_file, fmt=plistlib.FMT_XML)
+    return cls._parse_plist_contents(plist_file.read(), name, target)
+
+  @classmethod
+  def _parse_plist_contents(cls, plist_contents, name, target):
+    """Parses raw plist bytes, converting them to XML first if needed.
+
+    Args:
+      plist_contents: The raw bytes of the plist.
+      name: Name to report the plist as if it fails xml conversion.
+      target: The name of the target for which the plist is being built.
+    Returns:
+      The contents of the plist.
+
+    Raises:
+      PlistToolError: if plutil return code is non-zero.
+    """
     # Binary plists are easy to identify because they start with 'bplist'. For
     # plain text plists, it may be possible to have leading whitespace, but
     # well-formed XML should *not* have any whitespace before the XML
     # declaration, so we can check that the plist is not XML and let plutil
     # handle them the same way.
-    if not plist_contents.startswith(b'<?xml'):
+    if not plist_contents.startswith(_XML_PLIST_HEADER):
       plutil_process = subprocess.Popen(
           ['plutil', '-convert', 'xml1', '-o', '-', '--', '-'],
           stdout=subprocess.PIPE,
@@ -980,8 +1521,26 @@ class InfoPlistTask(PlistToolTask):
     version = plist.get('CFBundleVersion')
     short_version = plist.get('CFBundleShortVersionString')
 
-    for label, p in child_plists.items():
-      child_plist = PlistIO.get_dict(p, target)
+    def load_child(label, p):
+      keys = {'CFBundleIdentifier', 'CFBundleVersion',
+              'CFBundleShortVersionString'}
+      for pair in child_required_values.get(label, []):
+        if isinstance(pair, list) and len(pair) == 2 and pair[0]:
+          keys.add(pair[0][0])
+      return PlistIO.get_partial_dict(p, target, keys)
+
+    # Load the children concurrently, but validate them in order so the
+    # reported errors are deterministic.
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(len(child_plists), _MAX_CHILD_PLIST_WORKERS)
+    ) as executor:
+      futures = [
+          (label, executor.submit(load_child, label, p))
+          for label, p in child_plists.items()
+      ]
+
+    for label, future in futures:
+      child_plist = future.result()
 
       child_id = child_plist['CFBundleIdentifier']
       if not child_id.startswith(prefix):
@@ -1078,6 +1637,45 @@ class InfoPlistTask(PlistToolTask):
       return b'????'
 
 
+class _AllowedIdIndex(object):
+  """Index over a profile's allowed identifiers for fast matching.
+
+  Exact values go in a set, and the values ending in a wildcard are stored as
+  a set of prefixes (along with the distinct prefix lengths), so checking an
+  identifier costs a hash probe per distinct prefix length instead of a
+  comparison against every allowed value. Matching is the same as
+  EntitlementsTask._does_id_match() with only `allowed_supports_wildcards`.
+  """
+
+  def __init__(self, allowed_list, supports_wildcards):
+    """Builds the index.
+
+    Args:
+      allowed_list: The allowed identifiers which can end in a wildcard.
+      supports_wildcards: True/False for if wildcards should be supported in
+          the `allowed_list` values.
+    """
+    self._exact = set()
+    self._prefixes = set()
+    for allowed in allowed_list:
+      if supports_wildcards and allowed.endswith('*'):
+        self._prefixes.add(allowed[:-1])
+      else:
+        self._exact.add(allowed)
+    self._prefix_lengths = sorted({len(x) for x in self._prefixes})
+
+  def matches(self, entitlement_id):
+    """Returns True/False if the identifier is covered by the index."""
+    if entitlement_id in self._exact:
+      return True
+    for length in self._prefix_lengths:
+      if length > len(entitlement_id):
+        break
+      if entitlement_id[:length] in self._prefixes:
+        return True
+    return False
+
+
 class EntitlementsTask(PlistToolTask):
   """Entitlements specific task when processing."""
 
@@ -1087,6 +1685,7 @@ class EntitlementsTask(PlistToolTask):
     self._extra_var_subs = {}
     self._unknown_var_msg_addtions = {}
     self._profile_metadata = {}
+    self._allowed_id_indexes = {}
     self._validation_mode = self.options.get('validation_mode', 'error')
 
     assert self._validation_mode in ('error', 'warn', 'skip')
@@ -1388,28 +1987,23 @@ class EntitlementsTask(PlistToolTask):
 
     return False
 
-  def _does_id_match_list(self,
-                          entitlement_id,
-                          allowed_list,
-                          allowed_supports_wildcards=False):
-    """Check is an id matches the given allowed id list (include wildcards).
+  def _allowed_id_index(self, key_name, allowed_list, supports_wildcards):
+    """Returns the (cached) _AllowedIdIndex for a profile entitlement.
 
     Args:
-      entitlement_id: The identifier to check.
+      key_name: The entitlement key the allowed values came from.
       allowed_list: The allowed identifiers which can end in a wildcard.
-      allowed_supports_wildcards: True/False for if wildcards should
-          be supported in the `allowed_list` values.
+      supports_wildcards: True/False for if wildcards should be supported in
+          the `allowed_list` values.
     Returns:
-      True/False if the identifier is covered.
+      The _AllowedIdIndex for the values.
     """
-    for allowed in allowed_list:
-      if self._does_id_match(
-          entitlement_id,
-          allowed,
-          allowed_supports_wildcards=allowed_supports_wildcards):
-        return True
-
-    return False
+    cache_key = (key_name, supports_wildcards)
+    index = self._allowed_id_indexes.get(cache_key)
+    if index is None:
+      index = _AllowedIdIndex(allowed_list, supports_wildcards)
+      self._allowed_id_indexes[cache_key] = index
+    return index
 
   def _check_entitlements_array(self,
                                 entitlements,
@@ -1446,13 +2040,14 @@ class EntitlementsTask(PlistToolTask):
           ENTITLEMENTS_HAS_GROUP_PROFILE_DOES_NOT % (target, key_name))
       return
 
+    allowed_index = self._allowed_id_index(
+        key_name, profile_grps, supports_wildcards)
     for src_grp in src_grps:
       if '*' in src_grp and not allow_wildcards_in_entitlements:
         self._report(
             ENTITLEMENTS_VALUE_HAS_WILDCARD % (target, key_name, src_grp))
 
-      if not self._does_id_match_list(
-          src_grp, profile_grps, allowed_supports_wildcards=supports_wildcards):
+      if not allowed_index.matches(src_grp):
         self._report(
             ENTITLEMENTS_HAS_GROUP_ENTRY_PROFILE_DOES_NOT % (
                 target, key_name, src_grp, '", "'.join(profile_grps)))
@@ -1512,54 +2107,84 @@ class PlistTool(object):
     # Check for unknown keys in the control structure.
     validate_keys(list(self._control.keys()), _CONTROL_KEYS)
 
-    tasks = []
-    var_subs = self._control.get('variable_substitutions', {})
-    raw_subs = self._control.get('raw_substitutions', {})
-    unknown_var_msg_additions = {}
+    profile_output = _profile_output_path(self._control, target)
+    profiler = _Profiler(target) if profile_output else _NullProfiler()
 
-    task_types = (
-        EntitlementsTask,
-        InfoPlistTask,
-    )
-    for task_type in task_types:
-      options_name = task_type.control_structure_options_name()
-      options = self._control.get(options_name)
-      if options is not None:
-        validate_keys(list(options.keys()), task_type.options_keys(),
-                      options_name=options_name)
-        task = task_type(target, options)
-        var_subs.update(task.extra_variable_substitutions())
-        raw_subs.update(task.extra_raw_substitutions())
-        unknown_var_msg_additions.update(
-            task.unknown_variable_message_additions())
-        tasks.append(task)
-
-    subs_engine = SubstitutionEngine(target, var_subs, raw_subs)
-    out_plist = {}
-    for p in self._control.get('plists', []):
-      plist = PlistIO.get_dict(p, target)
-      self._merge_dictionaries(plist, out_plist, target, subs_engine)
-
-    forced_plists = self._control.get('forced_plists', [])
-    for p in forced_plists:
-      plist = PlistIO.get_dict(p, target)
-      self._merge_dictionaries(plist, out_plist, target, subs_engine,
-                               override_collisions=True)
-
-    for t in tasks:
-      t.update_plist(out_plist, subs_engine)
-
-    SubstitutionEngine.validate_no_variable_references(
-        target, '', out_plist, msg_additions=unknown_var_msg_additions)
-
-    if tasks:
-      saved_copy = copy.deepcopy(out_plist)
-      for t in tasks:
-        t.validate_plist(out_plist)
-      # Sanity check it wasn't mutated during a validate.
-      assert saved_copy == out_plist
+    parse_cache_dir = self._control.get('parse_cache_dir')
+    if parse_cache_dir:
+      PlistIO.parse_cache = PlistParseCache(
+          parse_cache_dir, self._control.get('parse_cache_max_bytes'))
+    try:
+      tasks = []
+      var_subs = self._control.get('variable_substitutions', {})
+      raw_subs = self._control.get('raw_substitutions', {})
+      unknown_var_msg_additions = {}
+
+      task_types = (
+          EntitlementsTask,
+          InfoPlistTask,
+      )
+      for task_type in task_types:
+        options_name = task_type.control_structure_options_name()
+        options = self._control.get(options_name)
+        if options is not None:
+          validate_keys(list(options.keys()), task_type.options_keys(),
+                        options_name=options_name)
+          with profiler.stage('task_init', task=task_type.__name__):
+            task = task_type(target, options)
+          var_subs.update(task.extra_variable_substitutions())
+          raw_subs.update(task.extra_raw_substitutions())
+          unknown_var_msg_additions.update(
+              task.unknown_variable_message_additions())
+          tasks.append(task)
+
+      subs_engine = SubstitutionEngine(target, var_subs, raw_subs)
+      out_plist = {}
+      inputs = [(p, False) for p in self._control.get('plists', [])]
+      inputs.extend((p, True) for p in self._control.get('forced_plists', []))
+      for p, override_collisions in inputs:
+        name = _input_name(p)
+        with profiler.stage('parse', input=name) as record:
+          plist = PlistIO.get_dict(p, target)
+        if profile_output:
+          if isinstance(p, str):
+            record['bytes'] = os.path.getsize(p)
+          record['objects'] = _count_objects(plist)
+
+        with profiler.stage('substitution', input=name):
+          plist = subs_engine.apply_substitutions(plist)
+        with profiler.stage('merge', input=name):
+          self._merge_substituted_dictionaries(
+              plist, out_plist, target,
+              override_collisions=override_collisions)
 
-    PlistIO.write(out_plist, output, binary=self._control.get('binary'))
+      for t in tasks:
+        with profiler.stage('task_update', task=type(t).__name__):
+          t.update_plist(out_plist, subs_engine)
+
+      with profiler.stage('validation') as record:
+        SubstitutionEngine.validate_no_variable_references(
+            target, '', out_plist, msg_additions=unknown_var_msg_additions)
+
+        if tasks:
+          saved_copy = copy.deepcopy(out_plist)
+          for t in tasks:
+            t.validate_plist(out_plist)
+          # Sanity check it wasn't mutated during a validate.
+          assert saved_copy == out_plist
+        if profile_output:
+          record['objects'] = _count_objects(out_plist)
+
+      binary = self._control.get('binary')
+      with profiler.stage('write', binary=bool(binary)) as record:
+        PlistIO.write(out_plist, output, binary=binary)
+      if profile_output and isinstance(output, str):
+        record['bytes'] = os.path.getsize(output)
+    finally:
+      PlistIO.parse_cache = None
+
+    if profile_output:
+      profiler.write(profile_output)
 
   @staticmethod
   def _merge_dictionaries(src, dest, target, subs_engine,
@@ -1580,8 +2205,31 @@ class PlistTool(object):
       PlistToolError: If the two dictionaries had different values for the
           same key.
     """
+    PlistTool._merge_substituted_dictionaries(
+        subs_engine.apply_substitutions(src), dest, target,
+        override_collisions=override_collisions)
+
+  @staticmethod
+  def _merge_substituted_dictionaries(src, dest, target,
+                                      override_collisions=False):
+    """Merge the top-level keys from src into dest.
+
+    Same as _merge_dictionaries(), but the substitutions have already been
+    applied to the values of src.
+
+    Args:
+      src: The dictionary whose values will be merged into dest.
+      dest: The dictionary into which the values will be merged.
+      target: The name of the target for which the plist is being built.
+      override_collisions: If True, collisions will be resolved by replacing
+          the previous value with the new value. If False, an error will be
+          raised if old and new values do not match.
+    Raises:
+      PlistToolError: If the two dictionaries had different values for the
+          same key.
+    """
     for key in src:
-      src_value = subs_engine.apply_substitutions(src[key])
+      src_value = src[key]
 
       if key in dest:
         dest_value = dest[key]
@@ -0,0 +1,220 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for PlistTool.
+
+Two sets of benchmarks are run over synthetic XML plists:
+
+  * Reading: very large UIAppFonts lists and URL scheme tables (like the
+    generated Info.plists of big apps) are read with PlistIO and, for
+    comparison, by reading the whole file and calling plistlib.loads. The wall
+    time and peak Python memory (as seen by tracemalloc) are reported.
+  * Processing: a corpus of plists with deep nesting, thousands of keys and
+    heavy use of substitutions is run through PlistTool with profiling on, and
+    the time spent in each stage is reported, so regressions in
+    SubstitutionEngine or _merge_dictionaries show up.
+
+Only XML plists are used, so this runs on Linux without plutil:
+
+  bazel run //tools/plisttool:plisttool_benchmark -- --scale=4
+"""
+
+import argparse
+import collections
+import json
+import os
+import plistlib
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from tools.plisttool import plisttool
+
+_TARGET = '//tools/plisttool:benchmark'
+
+
+def _large_font_list(scale):
+  return {
+      'CFBundleIdentifier': 'com.example.fonts',
+      'UIAppFonts': [
+          'Fonts/Family%d/Font-%d.ttf' % (i % 97, i)
+          for i in range(100000 * scale)
+      ],
+  }
+
+
+def _large_url_types(scale):
+  return {
+      'CFBundleIdentifier': 'com.example.urls',
+      'CFBundleURLTypes': [{
+          'CFBundleTypeRole': 'Editor',
+          'CFBundleURLName': 'com.example.url.%d' % i,
+          'CFBundleURLSchemes': ['scheme%d' % i, 'alt-scheme%d' % i],
+      } for i in range(25000 * scale)],
+  }
+
+
+# Name -> function(scale) returning the plist to write.
+_LARGE_PLISTS = {
+    'large_font_list': _large_font_list,
+    'large_url_types': _large_url_types,
+}
+
+
+def _deeply_nested(scale):
+  leaf = {'Name': '${PRODUCT_NAME}', 'Values': list(range(10))}
+  for depth in range(200 * scale):
+    leaf = {
+        'Level%d' % depth: leaf,
+        'Id': '$(PRODUCT_BUNDLE_IDENTIFIER).%d' % depth,
+    }
+  return {'Nested': leaf}
+
+
+def _many_keys(scale):
+  return {
+      'Key%05d' % i: ['value%d' % i, i, {'Flag': bool(i % 2)}]
+      for i in range(5000 * scale)
+  }
+
+
+def _heavy_substitution(scale):
+  return {
+      'Sub%05d' % i: {
+          'Id': '${PRODUCT_BUNDLE_IDENTIFIER}.item%d' % i,
+          'RFC': '$(PRODUCT_NAME:rfc1034identifier)-%d' % i,
+          'Strings': ['${VAR%d}' % (j % 50) for j in range(10)],
+      } for i in range(2000 * scale)
+  }
+
+
+# Name -> function(scale) returning a plist for the processing benchmarks.
+_CORPUS = {
+    'deeply_nested': _deeply_nested,
+    'many_keys': _many_keys,
+    'heavy_substitution': _heavy_substitution,
+}
+
+_VARIABLE_SUBSTITUTIONS = dict(
+    [('PRODUCT_NAME', 'My App'),
+     ('PRODUCT_BUNDLE_IDENTIFIER', 'com.example.myapp')] +
+    [('VAR%d' % i, 'value-%d' % i) for i in range(50)])
+
+
+def _read_whole_and_loads(path):
+  with open(path, 'rb') as f:
+    return plistlib.loads(f.read())
+
+
+def _plistio_get_dict(path):
+  return plisttool.PlistIO.get_dict(path, _TARGET)
+
+
+# Name -> function(path) returning the parsed plist.
+_READERS = {
+    'read+plistlib.loads': _read_whole_and_loads,
+    'PlistIO.get_dict': _plistio_get_dict,
+}
+
+
+def _measure(fn, *args):
+  """Returns (result, seconds, peak bytes) for calling fn(*args)."""
+  tracemalloc.start()
+  start = time.perf_counter()
+  result = fn(*args)
+  elapsed = time.perf_counter() - start
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return result, elapsed, peak
+
+
+def run_read_benchmarks(work_dir, scale, out=sys.stdout):
+  """Runs the large plist reading benchmarks.
+
+  Args:
+    work_dir: Directory to write the generated plists into.
+    scale: Multiplier for the size of the generated plists.
+    out: Where to write the report.
+  """
+  for name, make_plist in sorted(_LARGE_PLISTS.items()):
+    expected = make_plist(scale)
+    path = os.path.join(work_dir, name + '.plist')
+    with open(path, 'wb') as f:
+      plistlib.dump(expected, f)
+    out.write('%s (%.1f MB)\n' % (name, os.path.getsize(path) / 1e6))
+    del expected
+
+    for reader_name, reader in _READERS.items():
+      result, elapsed, peak = _measure(reader, path)
+      out.write('  %-22s %8.3fs %10.1f MB peak\n' % (
+          reader_name, elapsed, peak / 1e6))
+      del result
+
+
+def run_processing_benchmarks(work_dir, scale, iterations, out=sys.stdout):
+  """Runs the corpus through PlistTool, reporting the time per stage.
+
+  Args:
+    work_dir: Directory to write the generated plists and profiles into.
+    scale: Multiplier for the size of the generated plists.
+    iterations: How many times to process each plist.
+    out: Where to write the report.
+  """
+  for name, make_plist in sorted(_CORPUS.items()):
+    path = os.path.join(work_dir, name + '.plist')
+    with open(path, 'wb') as f:
+      plistlib.dump(make_plist(scale), f)
+    out.write('%s (%.1f MB)\n' % (name, os.path.getsize(path) / 1e6))
+
+    profile_path = os.path.join(work_dir, name + '.profile.json')
+    totals = collections.OrderedDict()
+    for _ in range(iterations):
+      plisttool.PlistTool({
+          'plists': [path],
+          'output': os.path.join(work_dir, name + '.out.plist'),
+          'target': _TARGET,
+          'variable_substitutions': dict(_VARIABLE_SUBSTITUTIONS),
+          'profile_output': profile_path,
+      }).run()
+      with open(profile_path) as f:
+        for stage in json.load(f)['stages']:
+          totals.setdefault(stage['stage'], 0.0)
+          totals[stage['stage']] += stage['seconds']
+
+    for stage, seconds in totals.items():
+      out.write('  %-22s %8.3fs\n' % (stage, seconds / iterations))
+
+
+def main(argv):
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument(
+      '--scale', type=int, default=1,
+      help='Multiplier for the size of the generated plists.')
+  parser.add_argument(
+      '--iterations', type=int, default=3,
+      help='How many times to process each plist of the corpus.')
+  args = parser.parse_args(argv)
+
+  work_dir = tempfile.mkdtemp()
+  try:
+    run_read_benchmarks(work_dir, args.scale)
+    run_processing_benchmarks(work_dir, args.scale, args.iterations)
+  finally:
+    shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -19,9 +19,12 @@ import datetime
 import io
 import json
 import os
+import plistlib
 import re
+import shutil
 import tempfile
 import unittest
+from unittest import mock
 
 from tools.plisttool import plisttool
 
@@ -377,6 +380,230 @@ class PlistToolGetWithKeyPath(unittest.TestCase):
     self.assertIsNone(plisttool.get_with_key_path(d, ['int', 99]))
 
 
+class PlistParseCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._cache_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self._cache_dir)
+
+  def _cache_entries(self):
+    return sorted(
+        x for x in os.listdir(self._cache_dir) if x.endswith('.plistcache1'))
+
+  def test_round_trip(self):
+    cache = plisttool.PlistParseCache(self._cache_dir)
+    value = {'Foo': ['abc', 1, True], 'Date': datetime.datetime(2020, 1, 2)}
+    digest = plisttool.PlistParseCache.digest(b'contents')
+    self.assertIsNone(cache.get(digest))
+    cache.put(digest, value)
+    self.assertEqual(value, cache.get(digest))
+
+  def test_corrupt_entry_is_a_miss(self):
+    cache = plisttool.PlistParseCache(self._cache_dir)
+    digest = plisttool.PlistParseCache.digest(b'contents')
+    cache.put(digest, {'Foo': 'abc'})
+    with open(os.path.join(self._cache_dir, self._cache_entries()[0]),
+              'wb') as f:
+      f.write(b'garbage')
+    self.assertIsNone(cache.get(digest))
+
+  def test_eviction_keeps_most_recent(self):
+    cache = plisttool.PlistParseCache(self._cache_dir, max_bytes=1)
+    cache.put('a', {'Foo': 'abc'})
+    cache.put('b', {'Bar': 'def'})
+    # The cap is smaller than any entry, so everything ends up evicted.
+    self.assertEqual([], self._cache_entries())
+
+    cache = plisttool.PlistParseCache(self._cache_dir, max_bytes=1024)
+    cache.put('a', {'Foo': 'abc'})
+    os.utime(os.path.join(self._cache_dir, 'a.plistcache1'), (1, 1))
+    cache.put('b', {'Bar': 'def'})
+    self.assertEqual(['a.plistcache1', 'b.plistcache1'], self._cache_entries())
+    entry_size = os.path.getsize(
+        os.path.join(self._cache_dir, 'b.plistcache1'))
+    cache = plisttool.PlistParseCache(
+        self._cache_dir, max_bytes=entry_size * 2)
+    cache.put('c', {'Baz': 'ghi'})
+    self.assertEqual(['b.plistcache1', 'c.plistcache1'], self._cache_entries())
+
+  def test_plisttool_uses_cache(self):
+    plist_fp = tempfile.NamedTemporaryFile(delete=False)
+    self.addCleanup(lambda: os.unlink(plist_fp.name))
+    with plist_fp:
+      plist = _xml_plist('<key>Foo</key><string>abc</string>')
+      plist_fp.write(plist.getvalue())
+
+    control = {
+        'plists': [plist_fp.name],
+        'parse_cache_dir': self._cache_dir,
+    }
+    self.assertEqual({'Foo': 'abc'}, _plisttool_result(control))
+    self.assertEqual(1, len(self._cache_entries()))
+    self.assertIsNone(plisttool.PlistIO.parse_cache)
+
+    # Replace the cached object to prove the second run is served from it.
+    cache = plisttool.PlistParseCache(self._cache_dir)
+    digest = self._cache_entries()[0][:-len('.plistcache1')]
+    cache.put(digest, {'Foo': 'cached'})
+    self.assertEqual({'Foo': 'cached'}, _plisttool_result(control))
+
+
+class PlistIOPartialDictTest(unittest.TestCase):
+
+  _PLIST = {
+      'CFBundleIdentifier': 'foo.bar',
+      'Ignored': {'Deep': ['x', 1, 2.5, True]},
+      'NSExtension': {
+          'NSExtensionPointIdentifier': 'com.apple.widget-extension',
+          'Attributes': [1, -2, 1 << 40, 0.5, False, b'\x00\x01'],
+      },
+      'Date': datetime.datetime(2020, 2, 3, 4, 5, 6),
+      'Unicode': u'caf\u00e9',
+  }
+
+  def _assert_partial(self, plist_bytes):
+    keys = ['CFBundleIdentifier', 'NSExtension', 'Date', 'Unicode', 'Missing']
+    result = plisttool.PlistIO.get_partial_dict(
+        io.BytesIO(plist_bytes), _testing_target, keys)
+    self.assertEqual(
+        {k: v for k, v in self._PLIST.items() if k in keys}, result)
+
+  def test_xml(self):
+    self._assert_partial(plistlib.dumps(self._PLIST))
+
+  def test_binary(self):
+    self._assert_partial(
+        plistlib.dumps(self._PLIST, fmt=plistlib.FMT_BINARY))
+
+  def test_xml_stops_after_requested_keys(self):
+    # Everything after the requested key is malformed, so this only works if
+    # parsing stops as soon as the key is found.
+    plist_bytes = (
+        b'<?xml version="1.0" encoding="UTF-8"?>\n'
+        b'<plist version="1.0"><dict>'
+        b'<key>CFBundleIdentifier</key><string>foo.bar</string>'
+        b'<key>Broken</key><integer>not a number</integer>')
+    result = plisttool.PlistIO.get_partial_dict(
+        io.BytesIO(plist_bytes), _testing_target, ['CFBundleIdentifier'])
+    self.assertEqual({'CFBundleIdentifier': 'foo.bar'}, result)
+
+  def test_empty_elements(self):
+    plist_bytes = (
+        b'<?xml version="1.0" encoding="UTF-8"?>\n'
+        b'<plist version="1.0"><dict>'
+        b'<key>String</key><string/>'
+        b'<key>Data</key><data/>'
+        b'<key>Integer</key><integer/>'
+        b'</dict></plist>')
+    result = plisttool.PlistIO.get_partial_dict(
+        io.BytesIO(plist_bytes), _testing_target, ['String', 'Data'])
+    self.assertEqual({'String': '', 'Data': b''}, result)
+
+    # An empty integer isn't valid, so the full parser gets to report it.
+    with mock.patch.object(
+        plisttool.PlistIO, '_read_plist',
+        return_value={'Integer': 0}) as read_plist:
+      result = plisttool.PlistIO.get_partial_dict(
+          io.BytesIO(plist_bytes), _testing_target, ['Integer'])
+    self.assertEqual({'Integer': 0}, result)
+    read_plist.assert_called_once()
+
+  def test_dict_is_returned_verbatim(self):
+    plist = {'CFBundleIdentifier': 'foo.bar', 'Other': 1}
+    self.assertIs(
+        plist,
+        plisttool.PlistIO.get_partial_dict(
+            plist, _testing_target, ['CFBundleIdentifier']))
+
+
+class AllowedIdIndexTest(unittest.TestCase):
+
+  def test_matches_like_does_id_match(self):
+    allowed = ['ABC.foo.bar', 'ABC.baz.*', 'ABC.*', 'applinks:*.example.com',
+               'webcredentials:*', 'XYZ.exact']
+    ids = ['ABC.foo.bar', 'ABC.foo', 'ABC.baz.qux', 'ABC.baz', 'XYZ.exact',
+           'XYZ.exact.more', 'XYZ', 'webcredentials:example.com',
+           'applinks:*.example.com', 'applinks:www.example.com', '', '*']
+    task = plisttool.EntitlementsTask(_testing_target, {})
+    for supports_wildcards in (False, True):
+      index = plisttool._AllowedIdIndex(allowed, supports_wildcards)
+      for entitlement_id in ids:
+        with self.subTest(id=entitlement_id, wildcards=supports_wildcards):
+          expected = any(
+              task._does_id_match(
+                  entitlement_id, x,
+                  allowed_supports_wildcards=supports_wildcards)
+              for x in allowed)
+          self.assertEqual(expected, index.matches(entitlement_id))
+
+
+class PlistToolProfileTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self._tmp_dir)
+
+  def _write_plist(self, name, content):
+    path = os.path.join(self._tmp_dir, name)
+    with open(path, 'wb') as f:
+      f.write(_xml_plist(content).getvalue())
+    return path
+
+  def test_profile_output(self):
+    plist1 = self._write_plist(
+        'a.plist', '<key>Foo</key><array><string>${BAR}</string></array>')
+    profile_path = os.path.join(self._tmp_dir, 'profile.json')
+    output = os.path.join(self._tmp_dir, 'out.plist')
+    plisttool.PlistTool({
+        'plists': [plist1],
+        'forced_plists': [{'Baz': 'qux'}],
+        'variable_substitutions': {'BAR': 'bar'},
+        'info_plist_options': {},
+        'output': output,
+        'target': _testing_target,
+        'profile_output': profile_path,
+    }).run()
+
+    with open(profile_path) as f:
+      profile = json.load(f)
+    self.assertEqual(_testing_target, profile['target'])
+    stages = [(x['stage'], x.get('input')) for x in profile['stages']]
+    self.assertEqual([
+        ('task_init', None),
+        ('parse', plist1),
+        ('substitution', plist1),
+        ('merge', plist1),
+        ('parse', '<dict>'),
+        ('substitution', '<dict>'),
+        ('merge', '<dict>'),
+        ('task_update', None),
+        ('validation', None),
+        ('write', None),
+    ], stages)
+    parse = profile['stages'][1]
+    self.assertEqual(os.path.getsize(plist1), parse['bytes'])
+    # The root dict, the key, the array and the string.
+    self.assertEqual(4, parse['objects'])
+    self.assertEqual(os.path.getsize(output), profile['stages'][-1]['bytes'])
+    for stage in profile['stages']:
+      self.assertGreaterEqual(stage['seconds'], 0)
+
+  def test_profile_dir_from_environment(self):
+    profile_dir = os.path.join(self._tmp_dir, 'profiles')
+    with mock.patch.dict(os.environ, {'PLISTTOOL_PROFILE_DIR': profile_dir}):
+      _plisttool_result({'plists': [{'Foo': 'abc'}]})
+    self.assertEqual(1, len(os.listdir(profile_dir)))
+
+  def test_no_profile_by_default(self):
+    with mock.patch.dict(os.environ):
+      os.environ.pop('PLISTTOOL_PROFILE_DIR', None)
+      self.assertIsNone(plisttool._profile_output_path({}, _testing_target))
+      _plisttool_result({'plists': [{'Foo': 'abc'}]})
+    self.assertEqual([], os.listdir(self._tmp_dir))
+
+
 class PlistToolTest(unittest.TestCase):
 
   def _assert_plisttool_result(self, control, expected):
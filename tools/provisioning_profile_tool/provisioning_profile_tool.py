@@ -31,14 +31,26 @@ dictionary with the following keys:
   provisioning_profile: Required. The path to the provisioning profile to
       load from.
   target: Required. The target name, used for warning/error messages.
+  outputs: If present, a list of dictionaries for writing the outputs of
+      several targets that use the same provisioning profile from a single
+      decode of it. Each dictionary may have the "entitlements",
+      "profile_metadata" and "target" keys, with the same meaning as above
+      (the top level "target" is used if it isn't given).
+  cache_dir: If present, a string that denotes the path to a directory used
+      to cache the data extracted from profiles across invocations of the
+      tool. Entries are keyed by the digest of the profile's contents.
 """
 
+import hashlib
 import json
+import os
 import platform
 import plistlib
 import subprocess
 import sys
+import tempfile
 
+from tools.wrapper_common import cms
 
 UNKNOWN_CONTROL_KEYS_MSG = (
     'Target "%s" used a control structure with unknown key(s): %s'
@@ -51,9 +63,31 @@ EXTRACT_FROM_PROFILE_FAILED = (
 
 # All valid keys in the a control structure.
 _CONTROL_KEYS = frozenset([
-    'entitlements', 'profile_metadata', 'provisioning_profile', 'target',
+    'cache_dir', 'entitlements', 'outputs', 'profile_metadata',
+    'provisioning_profile', 'target',
 ])
 
+# All valid keys in the dictionaries of the "outputs" control key.
+_OUTPUT_KEYS = frozenset([
+    'entitlements', 'profile_metadata', 'target',
+])
+
+# The keys of the profile's plist likely to be useful. We use an explicit list
+# to ensure nothing extra get pulled that won't be useful and could be large.
+# Depending on the company, the ProvisionedDevices can be pretty long, so there
+# is no reason to drag that along for parsing.
+# Known to be skipping: 'DeveloperCertificates', 'ProvisionedDevices',
+#    'ProvisionsAllDevices'.
+_METADATA_KEYS = (
+    'AppIDName', 'ApplicationIdentifierPrefix', 'CreationDate', 'Platform',
+    'Entitlements', 'ExpirationDate', 'Name', 'TeamIdentifier', 'TeamName',
+    'TimeToLive', 'UUID', 'Version',
+)
+
+# Suffix used for the entries in the cache_dir. Bump the version if the data
+# stored in them changes.
+_CACHE_ENTRY_SUFFIX = '.metadata1.plist'
+
 
 class ProvisioningProfileToolError(RuntimeError):
   """Raised for all errors.
@@ -98,15 +132,62 @@ class ProvisioningProfileTool(object):
     if not profile_path:
       raise ProvisioningProfileToolError('Missing provisioning profile path')
 
-    extracted = self._extract_from_profile(target, profile_path)
+    outputs = [self._control]
+    for output in self._control.get('outputs', []):
+      unknown_keys = set(output.keys()) - _OUTPUT_KEYS
+      if unknown_keys:
+        raise ProvisioningProfileToolError(UNKNOWN_CONTROL_KEYS_MSG % (
+            output.get('target', target), ', '.join(sorted(unknown_keys))))
+      outputs.append(output)
+
+    metadata = self._extract_metadata(
+        target, profile_path, self._control.get('cache_dir'))
 
-    profile_metadata_path = self._control.get('profile_metadata')
-    if profile_metadata_path:
-      self._write_metadata(profile_metadata_path, extracted)
+    for output in outputs:
+      profile_metadata_path = output.get('profile_metadata')
+      if profile_metadata_path:
+        self._write_metadata(profile_metadata_path, metadata)
 
-    entitlements_path = self._control.get('entitlements')
-    if entitlements_path:
-      self._write_default_entitlements(entitlements_path, extracted)
+      entitlements_path = output.get('entitlements')
+      if entitlements_path:
+        self._write_default_entitlements(entitlements_path, metadata)
+
+  @classmethod
+  def _extract_metadata(self, target, profile_path, cache_dir=None):
+    """Extracts the metadata subset of the plist from the profile.
+
+    Args:
+      target: The target being built, used for error reporting.
+      profile_path: Path to the provisioning profile.
+      cache_dir: Optional directory with the results of previous extractions.
+    Returns:
+      The metadata as a dictionary.
+    """
+    if not cache_dir:
+      return self._metadata_subset(
+          self._extract_from_profile(target, profile_path))
+
+    with open(profile_path, 'rb') as f:
+      digest = hashlib.sha256(f.read()).hexdigest()
+    cache_path = os.path.join(cache_dir, digest + _CACHE_ENTRY_SUFFIX)
+    try:
+      with open(cache_path, 'rb') as f:
+        return plistlib.load(f)
+    except (OSError, plistlib.InvalidFileException):
+      pass
+
+    metadata = self._metadata_subset(
+        self._extract_from_profile(target, profile_path))
+    try:
+      os.makedirs(cache_dir, exist_ok=True)
+      fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+      with os.fdopen(fd, 'wb') as f:
+        plistlib.dump(metadata, f, fmt=plistlib.FMT_BINARY)
+      os.replace(tmp_path, cache_path)
+    except OSError as e:
+      # The cache is only an optimization.
+      sys.stderr.write('WARNING: Failed to cache profile metadata: %s\n' % e)
+    return metadata
 
   @classmethod
   def _extract_from_profile(self, target, profile_path):
@@ -121,6 +202,15 @@ class ProvisioningProfileTool(object):
     as_str = self._extract_raw_plist(target, profile_path)
     return plistlib.loads(as_str)
 
+  @classmethod
+  def _metadata_subset(self, provisioning_profile):
+    """Returns the subset of the profile's plist written as metadata.
+
+    Args:
+      provisioning_profile: The provisioning profile.
+    """
+    return {k: provisioning_profile[k] for k in _METADATA_KEYS}
+
   @classmethod
   def _write_default_entitlements(self, output_path, provisioning_profile):
     """Write out the default entitlements from the provisioning profile.
@@ -142,20 +232,9 @@ class ProvisioningProfileTool(object):
 
     Args:
       output_path: Where to write the data.
-      provisioning_profile: The provisioning profile.
+      provisioning_profile: The provisioning profile (or its metadata subset).
     """
-    # The keys likely to be useful. We use an explicit list to ensure nothing
-    # extra get pulled that won't be useful and could be large. Depending
-    # on the company, the ProvisionedDevices can be pretty long, so there
-    # is no reason to drag that along for parsing.
-    # Known to be skipping: 'DeveloperCertificates', 'ProvisionedDevices',
-    #    'ProvisionsAllDevices'.
-    keys = (
-        'AppIDName', 'ApplicationIdentifierPrefix', 'CreationDate', 'Platform',
-        'Entitlements', 'ExpirationDate', 'Name', 'TeamIdentifier', 'TeamName',
-        'TimeToLive', 'UUID', 'Version',
-    )
-    output_data = {k: provisioning_profile[k] for k in keys}
+    output_data = self._metadata_subset(provisioning_profile)
     if hasattr(plistlib, 'dump'):
       with open(output_path, 'wb') as fp:
         plistlib.dump(output_data, fp)
@@ -177,8 +256,17 @@ class ProvisioningProfileTool(object):
       # Back door for testing.
       return content
 
-    # There are two possible ways to try and extract the plist from a
-    # provisioning profile: security tool or openssl -
+    # Profiles are CMS signed data with the plist as the content; reading it
+    # in process avoids spawning tools and also works off of macOS. The
+    # signature isn't verified, which matches the tools below.
+    try:
+      return cms.extract_signed_data_content(content)
+    except cms.CmsError:
+      pass
+
+    # If that fails, fall back to the system tools. There are two possible
+    # ways to try and extract the plist from a provisioning profile: security
+    # tool or openssl -
     #   El Capitan: only openssl works.
     #   Sierra: both work.
     #   High Sierra: only security tool works (as of the .1 update, Apple
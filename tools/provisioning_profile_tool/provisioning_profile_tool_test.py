@@ -0,0 +1,141 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for provisioning_profile_tool."""
+
+import datetime
+import os
+import plistlib
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from tools.provisioning_profile_tool import provisioning_profile_tool
+from tools.wrapper_common import asn1_test_utils
+from tools.wrapper_common import cms
+
+
+def _profile(uuid, entitlements):
+  """Returns the plist of a provisioning profile."""
+  return {
+      'AppIDName': 'App',
+      'ApplicationIdentifierPrefix': ['TEAMID'],
+      'CreationDate': datetime.datetime(2026, 1, 1),
+      'DeveloperCertificates': [b'certificate'],
+      'Entitlements': entitlements,
+      'ExpirationDate': datetime.datetime(2027, 1, 1),
+      'Name': 'Profile',
+      'Platform': ['iOS'],
+      'ProvisionedDevices': ['device'],
+      'TeamIdentifier': ['TEAMID'],
+      'TeamName': 'Team',
+      'TimeToLive': 365,
+      'UUID': uuid,
+      'Version': 1,
+  }
+
+
+class ProvisioningProfileToolTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self._tmp_dir)
+    self._profile_path = os.path.join(self._tmp_dir, 'profile.mobileprovision')
+    self._cache_dir = os.path.join(self._tmp_dir, 'cache')
+    self._entitlements = {'application-identifier': 'TEAMID.com.example.app'}
+    self._write_profile('uuid1', self._entitlements)
+
+    extract = mock.patch.object(
+        cms, 'extract_signed_data_content',
+        wraps=cms.extract_signed_data_content)
+    self._extract = extract.start()
+    self.addCleanup(extract.stop)
+
+  def _write_profile(self, uuid, entitlements):
+    with open(self._profile_path, 'wb') as f:
+      f.write(asn1_test_utils.signed_data_with_content(
+          plistlib.dumps(_profile(uuid, entitlements))))
+
+  def _path(self, name):
+    return os.path.join(self._tmp_dir, name)
+
+  def _read(self, name):
+    with open(self._path(name), 'rb') as f:
+      return plistlib.load(f)
+
+  def _run(self, **control):
+    control.setdefault('target', '//app:app')
+    control.setdefault('provisioning_profile', self._profile_path)
+    provisioning_profile_tool.ProvisioningProfileTool(control).run()
+
+  def test_outputs_of_several_targets(self):
+    self._run(
+        entitlements=self._path('app.entitlements'),
+        profile_metadata=self._path('app.metadata'),
+        outputs=[
+            {
+                'entitlements': self._path('ext.entitlements'),
+                'profile_metadata': self._path('ext.metadata'),
+                'target': '//app:ext',
+            },
+            {
+                'entitlements': self._path('widget.entitlements'),
+            },
+        ])
+    self.assertEqual(1, self._extract.call_count)
+    for name in ('app', 'ext', 'widget'):
+      self.assertEqual(self._entitlements,
+                       self._read(name + '.entitlements'))
+    for name in ('app', 'ext'):
+      metadata = self._read(name + '.metadata')
+      self.assertEqual('uuid1', metadata['UUID'])
+      self.assertNotIn('ProvisionedDevices', metadata)
+      self.assertNotIn('DeveloperCertificates', metadata)
+    self.assertFalse(os.path.exists(self._path('widget.metadata')))
+
+  def test_unknown_output_keys(self):
+    with self.assertRaisesRegex(
+        provisioning_profile_tool.ProvisioningProfileToolError,
+        '"//app:ext" .* unknown key\\(s\\): bogus'):
+      self._run(outputs=[{'bogus': 'value', 'target': '//app:ext'}])
+
+  def test_cache_hit(self):
+    self._run(cache_dir=self._cache_dir,
+              profile_metadata=self._path('first.metadata'))
+    self._run(cache_dir=self._cache_dir,
+              profile_metadata=self._path('second.metadata'),
+              entitlements=self._path('second.entitlements'))
+    self.assertEqual(1, self._extract.call_count)
+    self.assertEqual(1, len(os.listdir(self._cache_dir)))
+    self.assertEqual(self._read('first.metadata'),
+                     self._read('second.metadata'))
+    self.assertEqual(self._entitlements, self._read('second.entitlements'))
+
+  def test_cache_is_invalidated_when_the_profile_changes(self):
+    self._run(cache_dir=self._cache_dir,
+              entitlements=self._path('first.entitlements'))
+    entitlements = {'application-identifier': 'TEAMID.com.example.other'}
+    self._write_profile('uuid2', entitlements)
+    self._run(cache_dir=self._cache_dir,
+              entitlements=self._path('second.entitlements'),
+              profile_metadata=self._path('second.metadata'))
+    self.assertEqual(2, self._extract.call_count)
+    self.assertEqual(2, len(os.listdir(self._cache_dir)))
+    self.assertEqual(entitlements, self._read('second.entitlements'))
+    self.assertEqual('uuid2', self._read('second.metadata')['UUID'])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -16,7 +16,6 @@
 import argparse
 import glob
 import os
-import re
 import shutil
 import sys
 import tempfile
@@ -24,21 +23,7 @@ import tempfile
 from tools.bitcode_strip import bitcode_strip
 from tools.wrapper_common import execute
 from tools.wrapper_common import lipo
-
-_OTOOL_MINIMUM_OS_VERSION_RE = re.compile(
-    r"""
-(
-    cmd\ LC_VERSION_MIN_(?P<lc_version_min_platform>[^\n]+)\n
-    .*?
-    version\ (?P<lc_version_min_version>\d+\.\d+)
-  |
-    cmd\ LC_BUILD_VERSION
-    .*?
-    platform\ (?P<lc_build_version_platform>[^\n]+)\n
-    .*?
-    minos\ (?P<lc_build_version_minos>\d+\.\d+)
-)
-""", re.VERBOSE | re.MULTILINE | re.DOTALL)
+from tools.wrapper_common import macho_metadata
 
 # Minimum OS versions after which the Swift runtime is packaged with the OS. If
 # the deployment target of a binary is greater than or equal to the versions
@@ -65,30 +50,13 @@ def _deployment_target_requires_bundled_swift_runtime(platform, version):
 def _binary_requires_bundled_swift_runtime(binary):
   """Returns true if the deployment target of the given binary requires a bundled copy of the Swift runtime."""
 
-  cmd = ["otool", "-lV", "-arch", "all", binary]
-  _, stdout, stderr = execute.execute_and_filter_output(
-      cmd, raise_on_failure=True)
-  if stderr:
-    print(stderr)
-
-  # Loop to ensure we process all architectures within the binary. Different
-  # architectures may have different deployment targets.
-  while True:
-    match = _OTOOL_MINIMUM_OS_VERSION_RE.search(stdout)
-    if not match:
-      return False
-
-    groups = match.groupdict()
-    # Only one of each alternative of platform and version can be set.
-    platform = groups["lc_version_min_platform"] or groups[
-        "lc_build_version_platform"]
-    version = groups["lc_version_min_version"] or groups[
-        "lc_build_version_minos"]
-
-    if _deployment_target_requires_bundled_swift_runtime(platform, version):
-      return True
-
-    stdout = stdout[match.endpos:]
+  # Check every slice, different architectures may have different deployment
+  # targets. These are read from the load commands rather than running
+  # `otool -l`, whose output can be huge.
+  return any(
+      _deployment_target_requires_bundled_swift_runtime(
+          min_os.platform, min_os.version)
+      for min_os in macho_metadata.min_os_versions(binary))
 
 
 def _copy_swift_stdlibs(binaries_to_scan, sdk_platform, destination_path):
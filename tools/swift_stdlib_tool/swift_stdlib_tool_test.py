@@ -0,0 +1,84 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for swift_stdlib_tool."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from tools.swift_stdlib_tool import swift_stdlib_tool
+from tools.wrapper_common import macho_test_utils
+
+_ARM64 = macho_test_utils.ARM64
+_X86_64 = macho_test_utils.X86_64
+_LC_VERSION_MIN_IPHONEOS = macho_test_utils.LC_VERSION_MIN_IPHONEOS
+_PLATFORM_MACOS = macho_test_utils.PLATFORM_MACOS
+_PLATFORM_IOS = macho_test_utils.PLATFORM_IOS
+
+_macho = macho_test_utils.thin_macho
+_fat = macho_test_utils.fat_macho
+
+
+def _build_version(platform, *version):
+  return macho_test_utils.build_version_command(
+      platform, macho_test_utils.version(*version))
+
+
+def _version_min(cmd, *version):
+  return macho_test_utils.version_min_command(
+      cmd, macho_test_utils.version(*version))
+
+
+class BinaryRequiresBundledSwiftRuntimeTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self._tmp_dir)
+
+  def _requires_runtime(self, data):
+    path = os.path.join(self._tmp_dir, "binary")
+    with open(path, "wb") as f:
+      f.write(data)
+    return swift_stdlib_tool._binary_requires_bundled_swift_runtime(path)
+
+  def test_build_version(self):
+    self.assertTrue(self._requires_runtime(
+        _macho(_ARM64, [_build_version(_PLATFORM_IOS, 12, 1)])))
+    self.assertFalse(self._requires_runtime(
+        _macho(_ARM64, [_build_version(_PLATFORM_IOS, 12, 2)])))
+
+  def test_patch_version(self):
+    self.assertTrue(self._requires_runtime(
+        _macho(_X86_64, [_build_version(_PLATFORM_MACOS, 10, 14, 3)])))
+    self.assertFalse(self._requires_runtime(
+        _macho(_X86_64, [_build_version(_PLATFORM_MACOS, 10, 14, 4)])))
+
+  def test_any_slice_requires_runtime(self):
+    self.assertTrue(self._requires_runtime(_fat([
+        _macho(_X86_64, [_build_version(_PLATFORM_IOS, 13, 0)]),
+        _macho(_ARM64, [_version_min(_LC_VERSION_MIN_IPHONEOS, 11, 0)]),
+    ])))
+    self.assertFalse(self._requires_runtime(_fat([
+        _macho(_X86_64, [_build_version(_PLATFORM_IOS, 13, 0)]),
+        _macho(_ARM64, [_version_min(_LC_VERSION_MIN_IPHONEOS, 13, 0)]),
+    ])))
+
+  def test_no_deployment_target(self):
+    self.assertFalse(self._requires_runtime(_macho(_ARM64)))
+
+
+if __name__ == "__main__":
+  unittest.main()
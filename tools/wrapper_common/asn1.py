@@ -0,0 +1,155 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Minimal ASN.1 BER/DER reader.
+
+Only what is needed to walk the structures found in provisioning profiles and
+certificates is supported: identifier octets (including high tag numbers),
+definite and indefinite lengths, constructed OCTET STRINGs and OBJECT
+IDENTIFIERs. Elements are described by offsets into the original buffer, so
+nothing is copied until a value is actually needed.
+"""
+
+import collections
+
+# Universal tags (with the constructed bit where the encoding requires it).
+TAG_INTEGER = 0x02
+TAG_OCTET_STRING = 0x04
+TAG_OCTET_STRING_CONSTRUCTED = 0x24
+TAG_OID = 0x06
+TAG_SEQUENCE = 0x30
+TAG_SET = 0x31
+
+_CONSTRUCTED_BIT = 0x20
+
+# An element in the buffer.
+#   tag: The first identifier octet (class, constructed bit and tag number).
+#   start: Offset of the identifier octets.
+#   content_start: Offset of the contents octets.
+#   content_end: Offset just past the contents octets (before the end of
+#       contents octets for indefinite lengths).
+#   end: Offset just past the whole element.
+Element = collections.namedtuple(
+    "Element", ["tag", "start", "content_start", "content_end", "end"])
+
+
+class Asn1Error(ValueError):
+  """Raised when the data isn't valid BER."""
+
+
+def _read_byte(data, offset):
+  if offset >= len(data):
+    raise Asn1Error("Truncated data at offset %d" % offset)
+  return data[offset]
+
+
+def parse_element(data, offset=0):
+  """Parses the element starting at the given offset.
+
+  Args:
+    data: The bytes (or memoryview) holding the encoded data.
+    offset: The offset of the element's identifier octets.
+
+  Returns:
+    The Element.
+
+  Raises:
+    Asn1Error: If the data is truncated or malformed.
+  """
+  start = offset
+  tag = _read_byte(data, offset)
+  offset += 1
+  if tag & 0x1F == 0x1F:
+    # High tag number form, skip the base-128 tag number octets.
+    while _read_byte(data, offset) & 0x80:
+      offset += 1
+    offset += 1
+
+  length_byte = _read_byte(data, offset)
+  offset += 1
+  if length_byte == 0x80:
+    # Indefinite length, the contents run until the end of contents octets.
+    if not tag & _CONSTRUCTED_BIT:
+      raise Asn1Error("Indefinite length on a primitive element")
+    content_start = offset
+    while data[offset:offset + 2] != b"\x00\x00":
+      offset = parse_element(data, offset).end
+    return Element(tag, start, content_start, offset, offset + 2)
+
+  if length_byte & 0x80:
+    num_octets = length_byte & 0x7F
+    if offset + num_octets > len(data):
+      raise Asn1Error("Truncated length at offset %d" % offset)
+    length = int.from_bytes(data[offset:offset + num_octets], "big")
+    offset += num_octets
+  else:
+    length = length_byte
+
+  if offset + length > len(data):
+    raise Asn1Error("Element at offset %d runs past the end of the data" %
+                    start)
+  return Element(tag, start, offset, offset + length, offset + length)
+
+
+def children(data, element):
+  """Returns the list of Elements contained in a constructed element."""
+  if not element.tag & _CONSTRUCTED_BIT:
+    raise Asn1Error("Element at offset %d is not constructed" % element.start)
+  result = []
+  offset = element.content_start
+  while offset < element.content_end:
+    child = parse_element(data, offset)
+    result.append(child)
+    offset = child.end
+  return result
+
+
+def content(data, element):
+  """Returns the contents octets of a primitive element."""
+  return bytes(data[element.content_start:element.content_end])
+
+
+def octet_string(data, element):
+  """Returns the value of an OCTET STRING (primitive or constructed)."""
+  if element.tag == TAG_OCTET_STRING:
+    return content(data, element)
+  if element.tag == TAG_OCTET_STRING_CONSTRUCTED:
+    return b"".join(octet_string(data, x) for x in children(data, element))
+  raise Asn1Error("Expected an OCTET STRING at offset %d, found tag 0x%02x" %
+                  (element.start, element.tag))
+
+
+def oid(data, element):
+  """Returns an OBJECT IDENTIFIER in dotted form (e.g. "1.2.840.113549")."""
+  if element.tag != TAG_OID:
+    raise Asn1Error("Expected an OBJECT IDENTIFIER at offset %d" %
+                    element.start)
+  arcs = []
+  value = 0
+  for byte in content(data, element):
+    value = (value << 7) | (byte & 0x7F)
+    if not byte & 0x80:
+      arcs.append(value)
+      value = 0
+  if not arcs:
+    raise Asn1Error("Empty OBJECT IDENTIFIER at offset %d" % element.start)
+  first = min(arcs[0] // 40, 2)
+  return ".".join(str(x) for x in [first, arcs[0] - first * 40] + arcs[1:])
+
+
+def expect(element, tag):
+  """Raises Asn1Error if the element doesn't have the given tag."""
+  if element.tag != tag:
+    raise Asn1Error("Expected tag 0x%02x at offset %d, found 0x%02x" %
+                    (tag, element.start, element.tag))
@@ -0,0 +1,60 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Builders of DER/BER encoded data for the tests of ASN.1 readers."""
+
+# DER encodings of the OIDs for signedData and data.
+OID_SIGNED_DATA = bytes.fromhex("06092a864886f70d010702")
+OID_DATA = bytes.fromhex("06092a864886f70d010701")
+
+
+def der(tag, *contents):
+  """Returns a definite length encoding of the element."""
+  body = b"".join(contents)
+  if len(body) < 0x80:
+    length = bytes([len(body)])
+  else:
+    num_bytes = (len(body).bit_length() + 7) // 8
+    length = bytes([0x80 | num_bytes]) + len(body).to_bytes(num_bytes, "big")
+  return bytes([tag]) + length + body
+
+
+def ber(tag, *contents):
+  """Returns an indefinite length encoding of the element."""
+  return bytes([tag, 0x80]) + b"".join(contents) + b"\x00\x00"
+
+
+def signed_data(econtent, encode=der, content_type=OID_SIGNED_DATA):
+  """Builds a (signature-less) CMS SignedData ContentInfo.
+
+  Args:
+    econtent: The encoded `[0] eContent` element of the EncapsulatedContentInfo.
+    encode: der or ber, to encode the constructed elements with.
+    content_type: The encoded OID of the ContentInfo's content type.
+
+  Returns:
+    The encoded ContentInfo.
+  """
+  encap_content_info = encode(0x30, OID_DATA, econtent)
+  signed = encode(
+      0x30,
+      der(0x02, b"\x01"),  # version
+      der(0x31),  # digestAlgorithms
+      encap_content_info,
+      der(0x31))  # signerInfos
+  return encode(0x30, content_type, encode(0xA0, signed))
+
+
+def signed_data_with_content(content):
+  """Wraps content in a (signature-less) DER encoded CMS SignedData."""
+  return signed_data(der(0xA0, der(0x04, content)))
@@ -0,0 +1,136 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Helpers for the on-disk caches the signing tools share across actions.
+
+Every such cache is opt-in: it is only used when the environment variable or
+flag naming its directory is set (e.g. with `--action_env`), so by default
+actions have no effects outside of their declared outputs.
+
+Entries of these caches name tools that are executed or vouch for signatures,
+so a cache directory is only used if it is owned by the current user and
+nobody else can write to it, and entries are written atomically so that
+concurrent actions never see partial ones.
+"""
+
+import concurrent.futures
+import hashlib
+import json
+import os
+import tempfile
+
+# LINT.IfChange
+_READ_CHUNK_SIZE = 1024 * 1024
+
+
+def trusted_cache_dir(cache_dir):
+  """Returns a cache directory, creating it if needed, if it can be trusted.
+
+  Args:
+    cache_dir: The path of the directory, or None or an empty string if the
+      cache is disabled.
+
+  Returns:
+    cache_dir, or None if the cache is disabled or the directory can't be
+    created or could have been written to by other users.
+  """
+  if not cache_dir:
+    return None
+  try:
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    stat = os.stat(cache_dir)
+  except OSError:
+    return None
+  if stat.st_uid != os.getuid() or stat.st_mode & 0o022:
+    return None
+  return cache_dir
+
+
+def write_atomically(path, write, mode="w"):
+  """Replaces a file with what a callable writes, atomically.
+
+  Args:
+    path: The path of the file to replace.
+    write: A callable that writes the new contents to the file object it is
+      given.
+    mode: The mode to open the temporary file with, "w" or "wb".
+
+  Returns:
+    True if the file was replaced. Failures are ignored, as caches are only an
+    optimization.
+  """
+  try:
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+  except OSError:
+    return False
+  try:
+    with os.fdopen(fd, mode) as f:
+      write(f)
+    os.replace(temp_path, path)
+    return True
+  except OSError:
+    try:
+      os.remove(temp_path)
+    except OSError:
+      pass
+    return False
+
+
+def _file_sha256(path):
+  """Returns the SHA-256 hex digest of the contents of a file."""
+  digest = hashlib.sha256()
+  with open(path, "rb") as f:
+    for chunk in iter(lambda: f.read(_READ_CHUNK_SIZE), b""):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
+def tree_digest(path, max_workers=None):
+  """Returns a digest of the names, contents and modes of a file tree.
+
+  Args:
+    path: The path of a directory, file or symlink.
+    max_workers: The maximum number of files to hash at the same time. If None,
+      uses the default of concurrent.futures.ThreadPoolExecutor.
+
+  Returns:
+    A hex digest that changes when any file, directory or symlink in the tree
+    is added, removed or modified, or when a file's executable bit changes.
+  """
+  entries = []
+  files = []
+
+  def _add(relative_path, full_path):
+    if os.path.islink(full_path):
+      entries.append([relative_path, "l", os.readlink(full_path)])
+    elif os.path.isdir(full_path):
+      entries.append([relative_path, "d"])
+    else:
+      executable = bool(os.stat(full_path).st_mode & 0o111)
+      entries.append([relative_path, "x" if executable else "f"])
+      files.append((entries[-1], full_path))
+
+  _add(".", path)
+  if os.path.isdir(path) and not os.path.islink(path):
+    for root, dirs, file_names in os.walk(path):
+      dirs.sort()
+      for name in sorted(dirs + file_names):
+        full_path = os.path.join(root, name)
+        _add(os.path.relpath(full_path, path), full_path)
+  with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+    for (entry, _), file_digest in zip(
+        files, executor.map(_file_sha256, [f for _, f in files])):
+      entry.append(file_digest)
+  data = json.dumps(entries, ensure_ascii=False)
+  return hashlib.sha256(data.encode("utf-8", "surrogateescape")).hexdigest()
+# LINT.ThenChange(../dossier_codesigningtool/dossier_codesigning_reader.py)
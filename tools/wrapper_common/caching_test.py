@@ -0,0 +1,123 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for wrapper_common.caching."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from tools.wrapper_common import caching
+
+
+class TrustedCacheDirTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self._tmp_dir)
+    self._cache_dir = os.path.join(self._tmp_dir, "cache")
+
+  def test_disabled_without_directory(self):
+    self.assertIsNone(caching.trusted_cache_dir(None))
+    self.assertIsNone(caching.trusted_cache_dir(""))
+
+  def test_directory_is_created_private(self):
+    self.assertEqual(self._cache_dir,
+                     caching.trusted_cache_dir(self._cache_dir))
+    self.assertEqual(0o700, os.stat(self._cache_dir).st_mode & 0o777)
+
+  def test_shared_directories_are_not_trusted(self):
+    os.makedirs(self._cache_dir)
+    os.chmod(self._cache_dir, 0o777)
+    self.assertIsNone(caching.trusted_cache_dir(self._cache_dir))
+
+
+class WriteAtomicallyTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self._tmp_dir)
+    self._path = os.path.join(self._tmp_dir, "entry")
+
+  def test_replaces_file(self):
+    with open(self._path, "w") as f:
+      f.write("old")
+    self.assertTrue(caching.write_atomically(
+        self._path, lambda f: f.write(b"new"), mode="wb"))
+    with open(self._path, "r") as f:
+      self.assertEqual("new", f.read())
+
+  def test_failures_leave_nothing_behind(self):
+
+    def write(f):
+      f.write("partial")
+      raise OSError("disk full")
+
+    self.assertFalse(caching.write_atomically(self._path, write))
+    self.assertEqual([], os.listdir(self._tmp_dir))
+
+  def test_missing_directory_is_ignored(self):
+    self.assertFalse(caching.write_atomically(
+        os.path.join(self._tmp_dir, "missing", "entry"), lambda f: None))
+
+
+class TreeDigestTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self._tmp_dir)
+    self._tree = os.path.join(self._tmp_dir, "A.framework")
+    os.makedirs(os.path.join(self._tree, "Headers"))
+    self._binary = os.path.join(self._tree, "A")
+    with open(self._binary, "w") as f:
+      f.write("binary")
+    with open(os.path.join(self._tree, "Headers", "A.h"), "w") as f:
+      f.write("header")
+
+  def test_is_stable(self):
+    self.assertEqual(caching.tree_digest(self._tree),
+                     caching.tree_digest(self._tree, max_workers=1))
+
+  def test_changes_with_contents(self):
+    digest = caching.tree_digest(self._tree)
+    with open(self._binary, "w") as f:
+      f.write("modified")
+    self.assertNotEqual(digest, caching.tree_digest(self._tree))
+
+  def test_changes_with_executable_bit(self):
+    digest = caching.tree_digest(self._tree)
+    os.chmod(self._binary, 0o755)
+    self.assertNotEqual(digest, caching.tree_digest(self._tree))
+
+  def test_changes_with_symlink_targets(self):
+    link = os.path.join(self._tree, "Current")
+    os.symlink("Headers", link)
+    digest = caching.tree_digest(self._tree)
+    os.remove(link)
+    os.symlink("A", link)
+    self.assertNotEqual(digest, caching.tree_digest(self._tree))
+
+  def test_files(self):
+    digest = caching.tree_digest(self._binary)
+    self.assertNotEqual(digest, caching.tree_digest(self._tree))
+    with open(self._binary, "w") as f:
+      f.write("modified")
+    self.assertNotEqual(digest, caching.tree_digest(self._binary))
+
+
+if __name__ == "__main__":
+  unittest.main()
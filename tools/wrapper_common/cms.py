@@ -0,0 +1,95 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""In-process extraction of the payload of CMS (PKCS#7) signed data.
+
+Provisioning profiles (.mobileprovision/.provisionprofile) are CMS SignedData
+messages whose encapsulated content is the profile's plist. This reads that
+content directly out of the BER/DER encoding, the equivalent of
+`security cms -D` or `openssl smime -verify -noverify`, without spawning a
+process. The signature is *not* verified.
+"""
+
+from tools.wrapper_common import asn1
+
+_OID_SIGNED_DATA = "1.2.840.113549.1.7.2"
+
+# Context specific, constructed, tag number 0 ("[0] EXPLICIT").
+_TAG_EXPLICIT_0 = 0xA0
+
+
+class CmsError(ValueError):
+  """Raised when the data isn't a CMS SignedData message with content."""
+
+
+def extract_signed_data_content(data):
+  """Returns the encapsulated content of a CMS SignedData message.
+
+  Args:
+    data: The bytes of the BER/DER encoded ContentInfo.
+
+  Returns:
+    The bytes of the encapsulated content (eContent).
+
+  Raises:
+    CmsError: If the data isn't a SignedData message or has no content.
+  """
+  try:
+    # ContentInfo ::= SEQUENCE {
+    #   contentType ContentType,
+    #   content [0] EXPLICIT ANY DEFINED BY contentType }
+    content_info = asn1.parse_element(data)
+    asn1.expect(content_info, asn1.TAG_SEQUENCE)
+    content_type, content = _children(data, content_info, 2)[:2]
+    if asn1.oid(data, content_type) != _OID_SIGNED_DATA:
+      raise CmsError("Not a CMS SignedData message")
+    asn1.expect(content, _TAG_EXPLICIT_0)
+
+    # SignedData ::= SEQUENCE {
+    #   version CMSVersion,
+    #   digestAlgorithms DigestAlgorithmIdentifiers,
+    #   encapContentInfo EncapsulatedContentInfo,
+    #   ... }
+    signed_data = _children(data, content, 1)[0]
+    asn1.expect(signed_data, asn1.TAG_SEQUENCE)
+    encap_content_info = _children(data, signed_data, 3)[2]
+    asn1.expect(encap_content_info, asn1.TAG_SEQUENCE)
+
+    # EncapsulatedContentInfo ::= SEQUENCE {
+    #   eContentType ContentType,
+    #   eContent [0] EXPLICIT OCTET STRING OPTIONAL }
+    encap_children = asn1.children(data, encap_content_info)
+    if len(encap_children) < 2:
+      raise CmsError("CMS SignedData message has no encapsulated content")
+    e_content = encap_children[1]
+    asn1.expect(e_content, _TAG_EXPLICIT_0)
+    return asn1.octet_string(data, _children(data, e_content, 1)[0])
+  except asn1.Asn1Error as e:
+    raise CmsError("Malformed CMS SignedData message: %s" % e) from e
+
+
+def _children(data, element, min_count):
+  """Returns the children of element, requiring at least min_count."""
+  result = asn1.children(data, element)
+  if len(result) < min_count:
+    raise asn1.Asn1Error(
+        "Expected at least %d elements at offset %d, found %d" %
+        (min_count, element.start, len(result)))
+  return result
+
+
+def extract_signed_data_content_from_file(path):
+  """Returns the encapsulated content of the CMS SignedData file at path."""
+  with open(path, "rb") as f:
+    return extract_signed_data_content(f.read())
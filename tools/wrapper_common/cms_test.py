@@ -0,0 +1,69 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for wrapper_common.cms."""
+
+import unittest
+
+from tools.wrapper_common import asn1_test_utils
+from tools.wrapper_common import cms
+
+_PLIST = b'<?xml version="1.0"?><plist><dict/></plist>'
+
+_der = asn1_test_utils.der
+_ber = asn1_test_utils.ber
+
+
+class CmsTest(unittest.TestCase):
+
+  def test_der(self):
+    data = asn1_test_utils.signed_data(_der(0xA0, _der(0x04, _PLIST)))
+    self.assertEqual(_PLIST, cms.extract_signed_data_content(data))
+
+  def test_long_form_length(self):
+    payload = _PLIST * 100
+    data = asn1_test_utils.signed_data(_der(0xA0, _der(0x04, payload)))
+    self.assertEqual(payload, cms.extract_signed_data_content(data))
+
+  def test_indefinite_length_with_chunked_content(self):
+    # This is how Apple encodes provisioning profiles.
+    chunks = _der(0x04, _PLIST[:10]) + _der(0x04, _PLIST[10:])
+    data = asn1_test_utils.signed_data(
+        _ber(0xA0, _ber(0x24, chunks)), encode=_ber)
+    self.assertEqual(_PLIST, cms.extract_signed_data_content(data))
+
+  def test_not_signed_data(self):
+    data = asn1_test_utils.signed_data(
+        _der(0xA0, _der(0x04, _PLIST)),
+        content_type=asn1_test_utils.OID_DATA)
+    with self.assertRaisesRegex(cms.CmsError, "Not a CMS SignedData"):
+      cms.extract_signed_data_content(data)
+
+  def test_detached_content(self):
+    data = _der(
+        0x30, asn1_test_utils.OID_SIGNED_DATA,
+        _der(0xA0, _der(0x30, _der(0x02, b"\x01"), _der(0x31),
+                        _der(0x30, asn1_test_utils.OID_DATA), _der(0x31))))
+    with self.assertRaisesRegex(cms.CmsError, "no encapsulated content"):
+      cms.extract_signed_data_content(data)
+
+  def test_malformed(self):
+    data = asn1_test_utils.signed_data(_der(0xA0, _der(0x04, _PLIST)))
+    for bad in (b"", _PLIST, data[:len(data) // 2]):
+      with self.subTest(bad=bad):
+        with self.assertRaises(cms.CmsError):
+          cms.extract_signed_data_content(bad)
+
+
+if __name__ == "__main__":
+  unittest.main()
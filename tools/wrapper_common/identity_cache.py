@@ -0,0 +1,142 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Caches the code signing identities found on the system across actions.
+
+Every signing action needs the list of identities on the system, which means
+running `security find-identity` (and querying smartcards) or decoding every
+certificate in a directory. That list almost never changes during a build, so
+the first action to compute it shares it with the following ones for a short
+time.
+
+Entries are keyed by the caller's query and the state (paths, modification
+times and sizes) of the keychains or certificates it reads, so adding a
+certificate invalidates them right away; the time limit covers sources that
+can't be observed that way, such as smartcards. Processes computing the same
+entry are serialized with a lock file, so only one of them enumerates the
+identities.
+
+The cache is opt-in: it lives in the directory named by the
+`CODESIGN_IDENTITY_CACHE_DIR` environment variable, and is disabled when that
+variable isn't set. See wrapper_common.caching for the requirements on that
+directory.
+"""
+
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import time
+
+from tools.wrapper_common import caching
+
+# LINT.IfChange
+_IDENTITY_CACHE_DIR_ENV = "CODESIGN_IDENTITY_CACHE_DIR"
+_IDENTITY_CACHE_TTL_SECONDS = 120
+
+# The keychains `security find-identity` searches when none is given.
+_DEFAULT_KEYCHAIN_PATTERNS = [
+    "~/Library/Keychains/*.keychain",
+    "~/Library/Keychains/*.keychain-db",
+    "/Library/Keychains/System.keychain",
+]
+
+
+def _identity_cache_dir():
+  """Returns the cache directory, or None if the cache can't be used."""
+  return caching.trusted_cache_dir(os.environ.get(_IDENTITY_CACHE_DIR_ENV))
+
+
+def files_state(patterns):
+  """Returns the paths, modification times and sizes of the matching files.
+
+  Args:
+    patterns: A list of glob patterns, which may start with `~`.
+
+  Returns:
+    A JSON serializable description of the files, suitable for cache keys.
+  """
+  state = []
+  for pattern in patterns:
+    for path in sorted(glob.glob(os.path.expanduser(pattern))):
+      try:
+        stat = os.stat(path)
+      except OSError:
+        continue
+      state.append([path, stat.st_mtime_ns, stat.st_size])
+  return state
+
+
+def keychains_state(keychain=None):
+  """Returns the files_state of a keychain, or of the default keychains."""
+  return files_state([keychain] if keychain else _DEFAULT_KEYCHAIN_PATTERNS)
+
+
+def _load_identities(path):
+  """Returns the unexpired identities stored at path, or None."""
+  try:
+    with open(path, "r") as f:
+      entry = json.load(f)
+    age = time.time() - entry["time"]
+    if 0 <= age <= _IDENTITY_CACHE_TTL_SECONDS:
+      return entry["identities"]
+  except (OSError, ValueError, KeyError, TypeError):
+    pass
+  return None
+
+
+def _store_identities(path, identities):
+  """Atomically stores the identities at path, ignoring failures."""
+  caching.write_atomically(path, lambda f: json.dump(
+      {"time": time.time(), "identities": identities}, f))
+
+
+def cached_identities(key, find_identities):
+  """Returns the identities for a query, sharing them across processes.
+
+  Args:
+    key: A JSON serializable description of the query, including the state of
+      the files the identities are read from.
+    find_identities: A callable that enumerates the identities when there is
+      no usable cache entry. It must return a JSON serializable value.
+
+  Returns:
+    The value returned by find_identities, possibly by another process.
+    Empty results are never cached, since they usually mean something (e.g.
+    a locked keychain) is about to be fixed.
+  """
+  cache_dir = _identity_cache_dir()
+  if not cache_dir:
+    return find_identities()
+
+  digest = hashlib.sha256(
+      json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+  path = os.path.join(cache_dir, digest + ".json")
+  identities = _load_identities(path)
+  if identities is not None:
+    return identities
+
+  with open(path + ".lock", "a") as lock:
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    try:
+      # Another process may have enumerated them while this one waited.
+      identities = _load_identities(path)
+      if identities is None:
+        identities = find_identities()
+        if identities:
+          _store_identities(path, identities)
+    finally:
+      fcntl.flock(lock, fcntl.LOCK_UN)
+  return identities
+# LINT.ThenChange(../dossier_codesigningtool/dossier_codesigning_reader.py)
@@ -0,0 +1,100 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for wrapper_common.identity_cache."""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from tools.wrapper_common import identity_cache
+
+_IDENTITIES = {"A5FF43823C315FAE9362E43E294529B6AD1FFA6A": ["subject", None]}
+
+
+class IdentityCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self._tmp_dir)
+    self._cache_dir = os.path.join(self._tmp_dir, "cache")
+    self._certificate = os.path.join(self._tmp_dir, "identity.cer")
+    with open(self._certificate, "wb") as f:
+      f.write(b"certificate")
+
+    environ = mock.patch.dict(
+        os.environ,
+        {identity_cache._IDENTITY_CACHE_DIR_ENV: self._cache_dir})
+    environ.start()
+    self.addCleanup(environ.stop)
+    self._find_identities = mock.Mock(return_value=_IDENTITIES)
+
+  def _cached_identities(self):
+    key = ["test", identity_cache.files_state(
+        [os.path.join(self._tmp_dir, "*.cer")])]
+    return identity_cache.cached_identities(key, self._find_identities)
+
+  def test_identities_are_found_once(self):
+    self.assertEqual(_IDENTITIES, self._cached_identities())
+    self.assertEqual(_IDENTITIES, self._cached_identities())
+    self._find_identities.assert_called_once_with()
+
+  def test_changed_files_invalidate_entries(self):
+    self._cached_identities()
+    with open(os.path.join(self._tmp_dir, "other.cer"), "wb") as f:
+      f.write(b"other certificate")
+    self._cached_identities()
+    self.assertEqual(2, self._find_identities.call_count)
+
+  def test_expired_entries_are_ignored(self):
+    self._cached_identities()
+    expired = time.time() + identity_cache._IDENTITY_CACHE_TTL_SECONDS + 1
+    with mock.patch.object(time, "time", return_value=expired):
+      self._cached_identities()
+    self.assertEqual(2, self._find_identities.call_count)
+
+  def test_empty_results_are_not_cached(self):
+    self._find_identities.return_value = {}
+    self.assertEqual({}, self._cached_identities())
+    self._find_identities.return_value = _IDENTITIES
+    self.assertEqual(_IDENTITIES, self._cached_identities())
+
+  def test_cache_is_opt_in(self):
+    del os.environ[identity_cache._IDENTITY_CACHE_DIR_ENV]
+    self._cached_identities()
+    self._cached_identities()
+    self.assertEqual(2, self._find_identities.call_count)
+    self.assertFalse(os.path.exists(self._cache_dir))
+
+  def test_shared_directories_are_not_trusted(self):
+    os.makedirs(self._cache_dir)
+    os.chmod(self._cache_dir, 0o777)
+    self._cached_identities()
+    self._cached_identities()
+    self.assertEqual(2, self._find_identities.call_count)
+    self.assertEqual([], os.listdir(self._cache_dir))
+
+  def test_files_state_reports_modifications(self):
+    before = identity_cache.files_state([self._certificate])
+    stat = os.stat(self._certificate)
+    os.utime(self._certificate,
+             ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    self.assertNotEqual(before, identity_cache.files_state([self._certificate]))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -14,10 +14,21 @@
 #
 
 from tools.wrapper_common import execute
+from tools.wrapper_common import macho
 
 
 def invoke_lipo(binary_path, binary_slices, output_path):
-  """Wraps lipo with given arguments for inputs and outputs."""
+  """Wraps lipo with given arguments for inputs and outputs.
+
+  The slices are copied natively when the binary is a Mach-O or universal
+  binary; lipo is only run for anything else (e.g. static archives).
+  """
+  try:
+    macho.extract_archs(binary_path, binary_slices, output_path)
+    return
+  except macho.MachOError:
+    pass
+
   cmd = ["xcrun", "lipo", binary_path]
   # Create a thin binary if there's only one needed slice, otherwise create a
   # universal binary
@@ -35,8 +46,35 @@ def invoke_lipo(binary_path, binary_slices, output_path):
     print(stderr)
 
 
+def _lipo_info_archs(binary):
+  """Queries `lipo -info` for the archs of a binary, or None on failure."""
+  cmd = ["xcrun", "lipo", "-info", binary]
+  _, stdout, stderr = execute.execute_and_filter_output(cmd,
+                                                        raise_on_failure=True)
+  if stderr:
+    print(stderr)
+  if not stdout:
+    print("Internal Error: Did not receive output from lipo for inputs: " +
+          " ".join(cmd))
+    return None
+
+  cut_output = stdout.split(":")
+  if len(cut_output) < 3:
+    print("Internal Error: Unexpected output from lipo, received: " + stdout)
+    return None
+
+  archs_found = cut_output[2].strip().split(" ")
+  if not archs_found:
+    print("Internal Error: Could not find architecture for binary: " + binary)
+    return None
+  return archs_found
+
+
 def find_archs_for_binaries(binary_list):
-  """Queries lipo to identify binary archs from each of the binaries.
+  """Identifies the binary archs from each of the binaries.
+
+  The Mach-O and fat headers are read directly; `lipo -info` is only used for
+  files that can't be read that way (e.g. static archives).
 
   Args:
     binary_list: A list of strings, each of which is the path to a binary whose
@@ -57,25 +95,12 @@ def find_archs_for_binaries(binary_list):
   archs_by_binary = dict()
 
   for binary in binary_list:
-    cmd = ["xcrun", "lipo", "-info", binary]
-    _, stdout, stderr = execute.execute_and_filter_output(cmd,
-                                                          raise_on_failure=True)
-    if stderr:
-      print(stderr)
-    if not stdout:
-      print("Internal Error: Did not receive output from lipo for inputs: " +
-            " ".join(cmd))
-      return (None, None)
-
-    cut_output = stdout.split(":")
-    if len(cut_output) < 3:
-      print("Internal Error: Unexpected output from lipo, received: " + stdout)
-      return (None, None)
-
-    archs_found = cut_output[2].strip().split(" ")
-    if not archs_found:
-      print("Internal Error: Could not find architecture for binary: " + binary)
-      return (None, None)
+    try:
+      archs_found = macho.read_archs(binary)
+    except macho.MachOError:
+      archs_found = _lipo_info_archs(binary)
+      if not archs_found:
+        return (None, None)
 
     archs_by_binary[binary] = set(archs_found)
 
@@ -0,0 +1,536 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Native support for Mach-O and universal (fat) binaries.
+
+The readers only look at the headers of a file (a few hundred bytes) to answer
+the questions the tools would otherwise spawn `lipo`/`otool` for, and slices
+are extracted without copying them through userspace where the platform
+allows it. Everything here works on any host platform.
+"""
+
+import collections
+import functools
+import os
+import shutil
+import struct
+import tempfile
+
+# <mach-o/fat.h>
+_FAT_MAGIC = 0xCAFEBABE
+_FAT_MAGIC_64 = 0xCAFEBABF
+
+# <mach-o/loader.h>
+_MH_MAGIC = 0xFEEDFACE
+_MH_CIGAM = 0xCEFAEDFE
+_MH_MAGIC_64 = 0xFEEDFACF
+_MH_CIGAM_64 = 0xCFFAEDFE
+
+_MACH_HEADER_SIZE = 28
+_MACH_HEADER_64_SIZE = 32
+
+_LC_VERSION_MIN_MACOSX = 0x24
+_LC_VERSION_MIN_IPHONEOS = 0x25
+_LC_VERSION_MIN_TVOS = 0x2F
+_LC_VERSION_MIN_WATCHOS = 0x30
+_LC_BUILD_VERSION = 0x32
+_LC_LOAD_DYLIB = 0xC
+_LC_ID_DYLIB = 0xD
+_LC_LOAD_WEAK_DYLIB = 0x80000018
+_LC_RPATH = 0x8000001C
+_LC_REEXPORT_DYLIB = 0x8000001F
+_LC_LOAD_UPWARD_DYLIB = 0x80000023
+
+# The load commands that reference a dylib the binary links against.
+_DEPENDENT_DYLIB_COMMANDS = frozenset([
+    _LC_LOAD_DYLIB,
+    _LC_LOAD_WEAK_DYLIB,
+    _LC_REEXPORT_DYLIB,
+    _LC_LOAD_UPWARD_DYLIB,
+])
+
+# LC_VERSION_MIN_* command -> platform name, as printed by otool.
+_VERSION_MIN_PLATFORMS = {
+    _LC_VERSION_MIN_MACOSX: "macosx",
+    _LC_VERSION_MIN_IPHONEOS: "iphoneos",
+    _LC_VERSION_MIN_TVOS: "tvos",
+    _LC_VERSION_MIN_WATCHOS: "watchos",
+}
+
+# LC_BUILD_VERSION platform -> platform name, as printed by otool.
+_BUILD_VERSION_PLATFORMS = {
+    1: "macos",
+    2: "ios",
+    3: "tvos",
+    4: "watchos",
+    5: "bridgeos",
+    6: "maccatalyst",
+    7: "iossimulator",
+    8: "tvossimulator",
+    9: "watchossimulator",
+    10: "driverkit",
+    11: "xros",
+    12: "xrossimulator",
+}
+
+# <mach/machine.h>
+_CPU_ARCH_ABI64 = 0x01000000
+_CPU_ARCH_ABI64_32 = 0x02000000
+_CPU_SUBTYPE_MASK = 0xFF000000
+
+_CPU_TYPE_X86 = 7
+_CPU_TYPE_X86_64 = _CPU_TYPE_X86 | _CPU_ARCH_ABI64
+_CPU_TYPE_ARM = 12
+_CPU_TYPE_ARM64 = _CPU_TYPE_ARM | _CPU_ARCH_ABI64
+_CPU_TYPE_ARM64_32 = _CPU_TYPE_ARM | _CPU_ARCH_ABI64_32
+_CPU_TYPE_POWERPC = 18
+_CPU_TYPE_POWERPC64 = _CPU_TYPE_POWERPC | _CPU_ARCH_ABI64
+
+# (cputype, cpusubtype) -> the architecture name used by lipo and clang.
+_ARCH_NAMES = {
+    (_CPU_TYPE_X86, 3): "i386",
+    (_CPU_TYPE_X86_64, 3): "x86_64",
+    (_CPU_TYPE_X86_64, 8): "x86_64h",
+    (_CPU_TYPE_ARM, 5): "armv4t",
+    (_CPU_TYPE_ARM, 6): "armv6",
+    (_CPU_TYPE_ARM, 7): "armv5",
+    (_CPU_TYPE_ARM, 9): "armv7",
+    (_CPU_TYPE_ARM, 10): "armv7f",
+    (_CPU_TYPE_ARM, 11): "armv7s",
+    (_CPU_TYPE_ARM, 12): "armv7k",
+    (_CPU_TYPE_ARM, 13): "armv8",
+    (_CPU_TYPE_ARM, 14): "armv6m",
+    (_CPU_TYPE_ARM, 15): "armv7m",
+    (_CPU_TYPE_ARM, 16): "armv7em",
+    (_CPU_TYPE_ARM64, 0): "arm64",
+    (_CPU_TYPE_ARM64, 1): "arm64v8",
+    (_CPU_TYPE_ARM64, 2): "arm64e",
+    (_CPU_TYPE_ARM64_32, 0): "arm64_32",
+    (_CPU_TYPE_ARM64_32, 1): "arm64_32",
+    (_CPU_TYPE_POWERPC, 0): "ppc",
+    (_CPU_TYPE_POWERPC64, 0): "ppc64",
+}
+
+# Java class files share the fat magic; real fat files never have anywhere
+# near this many architectures (cctools uses the same heuristic).
+_MAX_FAT_ARCHS = 30
+
+_FAT_HEADER_SIZE = 8
+_FAT_ARCH_SIZE = 20
+_FAT_ARCH_64_SIZE = 32
+
+_COPY_BUFFER_SIZE = 1024 * 1024
+
+# Enough to hold the fat header and the fat_arch_64 entries for any
+# reasonable number of slices.
+_HEADER_READ_SIZE = 4096
+
+# A slice of a binary.
+#   arch: The architecture name (e.g. "arm64").
+#   cputype: The raw CPU type.
+#   cpusubtype: The raw CPU subtype (including the capability bits).
+#   offset: The offset of the slice's Mach-O header in the file.
+#   size: The size of the slice in bytes.
+#   align: The alignment of the slice as a power of 2 (0 for thin files).
+Slice = collections.namedtuple(
+    "Slice", ["arch", "cputype", "cpusubtype", "offset", "size", "align"])
+
+
+class MachOError(ValueError):
+  """Raised when a file isn't a Mach-O or universal binary."""
+
+
+def arch_name(cputype, cpusubtype):
+  """Returns the architecture name for a cputype/cpusubtype pair.
+
+  Args:
+    cputype: The CPU type from a Mach-O or fat header.
+    cpusubtype: The CPU subtype from the same header; the capability bits are
+      ignored.
+
+  Returns:
+    The architecture name, as used by lipo.
+
+  Raises:
+    MachOError: If the pair isn't a known architecture.
+  """
+  name = _ARCH_NAMES.get((cputype, cpusubtype & ~_CPU_SUBTYPE_MASK))
+  if not name:
+    raise MachOError("Unknown architecture: cputype %d cpusubtype %d" %
+                     (cputype, cpusubtype & ~_CPU_SUBTYPE_MASK))
+  return name
+
+
+def _thin_slice(header, file_size):
+  """Returns the Slice for a thin Mach-O, or None if it isn't one."""
+  if len(header) < 12:
+    return None
+  magic = struct.unpack_from("<I", header)[0]
+  if magic in (_MH_MAGIC, _MH_MAGIC_64):
+    endian = "<"
+  elif magic in (_MH_CIGAM, _MH_CIGAM_64):
+    endian = ">"
+  else:
+    return None
+  cputype, cpusubtype = struct.unpack_from(endian + "iI", header, 4)
+  return Slice(arch_name(cputype, cpusubtype), cputype, cpusubtype, 0,
+               file_size, 0)
+
+
+def _fat_slices(header, file_size):
+  """Returns the Slices of a fat binary, or None if it isn't one."""
+  if len(header) < 8:
+    return None
+  magic, nfat_arch = struct.unpack_from(">II", header)
+  if magic not in (_FAT_MAGIC, _FAT_MAGIC_64) or nfat_arch > _MAX_FAT_ARCHS:
+    return None
+
+  if magic == _FAT_MAGIC_64:
+    entry_format, entry_size = ">iIQQI4x", _FAT_ARCH_64_SIZE
+  else:
+    entry_format, entry_size = ">iIIII", _FAT_ARCH_SIZE
+  if _FAT_HEADER_SIZE + nfat_arch * entry_size > len(header):
+    raise MachOError("Truncated fat header")
+
+  slices = []
+  for i in range(nfat_arch):
+    cputype, cpusubtype, offset, size, align = struct.unpack_from(
+        entry_format, header, _FAT_HEADER_SIZE + i * entry_size)
+    if offset + size > file_size:
+      raise MachOError("Slice %d extends past the end of the file" % i)
+    slices.append(Slice(arch_name(cputype, cpusubtype), cputype, cpusubtype,
+                        offset, size, align))
+  return slices
+
+
+def _read_slices(f):
+  """Returns the slices of the binary open as f."""
+  header = f.read(_HEADER_READ_SIZE)
+  file_size = os.fstat(f.fileno()).st_size
+  slices = _fat_slices(header, file_size)
+  if slices is not None:
+    return slices
+  thin = _thin_slice(header, file_size)
+  if thin is not None:
+    return [thin]
+  raise MachOError("Not a Mach-O or universal binary: %s" % f.name)
+
+
+def read_slices(path):
+  """Returns the slices of the Mach-O or universal binary at path.
+
+  Only the headers are read; for a thin binary a single Slice covering the
+  whole file is returned.
+
+  Args:
+    path: The path to the binary.
+
+  Returns:
+    A list of Slices, in the order they appear in the fat header.
+
+  Raises:
+    MachOError: If the file isn't a Mach-O or universal binary, or uses an
+      unknown architecture.
+  """
+  with open(path, "rb") as f:
+    return _read_slices(f)
+
+
+def read_archs(path):
+  """Returns the architecture names of the binary at path, in file order."""
+  return [x.arch for x in read_slices(path)]
+
+
+def _load_commands(f, s):
+  """Yields the load commands of a slice of an open binary.
+
+  Args:
+    f: The binary, opened for reading.
+    s: The Slice whose load commands should be read.
+
+  Yields:
+    Tuples of the command, the byte order prefix for `struct` ("<" or ">")
+    and the bytes of the whole command (including its cmd and cmdsize).
+
+  Raises:
+    MachOError: If the load commands are malformed.
+  """
+  f.seek(s.offset)
+  header = f.read(_MACH_HEADER_64_SIZE)
+  if len(header) < _MACH_HEADER_SIZE:
+    raise MachOError("Truncated Mach-O header in %s" % f.name)
+  magic = struct.unpack_from("<I", header)[0]
+  endian = "<" if magic in (_MH_MAGIC, _MH_MAGIC_64) else ">"
+  header_size = (_MACH_HEADER_64_SIZE
+                 if magic in (_MH_MAGIC_64, _MH_CIGAM_64) else
+                 _MACH_HEADER_SIZE)
+  ncmds, sizeofcmds = struct.unpack_from(endian + "II", header, 16)
+
+  f.seek(s.offset + header_size)
+  commands = f.read(sizeofcmds)
+  if len(commands) < sizeofcmds:
+    raise MachOError("Truncated load commands in %s" % f.name)
+
+  offset = 0
+  for _ in range(ncmds):
+    if offset + 8 > sizeofcmds:
+      raise MachOError("Truncated load commands in %s" % f.name)
+    cmd, cmdsize = struct.unpack_from(endian + "II", commands, offset)
+    if cmdsize < 8 or offset + cmdsize > sizeofcmds:
+      raise MachOError("Malformed load command in %s" % f.name)
+    yield cmd, endian, commands[offset:offset + cmdsize]
+    offset += cmdsize
+
+
+def _format_version(version):
+  """Formats a version encoded as xxxx.yy.zz nibbles, like otool does."""
+  major, minor, patch = version >> 16, (version >> 8) & 0xFF, version & 0xFF
+  if patch:
+    return "%d.%d.%d" % (major, minor, patch)
+  return "%d.%d" % (major, minor)
+
+
+# The deployment target of a slice of a binary.
+#   arch: The architecture name of the slice.
+#   platform: The platform name (e.g. "ios" or "iphoneos").
+#   version: The minimum OS version (e.g. "12.2").
+MinOSVersion = collections.namedtuple(
+    "MinOSVersion", ["arch", "platform", "version"])
+
+
+def _min_os_version(path, arch, cmd, endian, data):
+  """Returns the MinOSVersion of an LC_BUILD_VERSION/LC_VERSION_MIN_*."""
+  if len(data) < 16:
+    raise MachOError("Truncated version load command in %s" % path)
+  if cmd == _LC_BUILD_VERSION:
+    platform, minos = struct.unpack_from(endian + "II", data, 8)
+    platform = _BUILD_VERSION_PLATFORMS.get(platform, str(platform))
+  else:
+    minos = struct.unpack_from(endian + "I", data, 8)[0]
+    platform = _VERSION_MIN_PLATFORMS[cmd]
+  return MinOSVersion(arch, platform, _format_version(minos))
+
+
+def _load_command_string(path, endian, data):
+  """Returns the lc_str of an LC_RPATH or dylib_command.
+
+  Both commands start with the offset of the string, right after cmdsize.
+  """
+  if len(data) < 12:
+    raise MachOError("Truncated load command in %s" % path)
+  offset = struct.unpack_from(endian + "I", data, 8)[0]
+  if offset < 12 or offset >= len(data):
+    raise MachOError("Malformed load command string in %s" % path)
+  end = data.find(b"\0", offset)
+  return data[offset:end if end != -1 else len(data)].decode(
+      "utf-8", "surrogateescape")
+
+
+# The paths a binary's load commands refer to, across all of its slices.
+#   install_name: The LC_ID_DYLIB name of a dylib, or None.
+#   rpaths: The LC_RPATH paths, without duplicates, in file order.
+#   dylibs: The names of the dylibs it links against (LC_LOAD_DYLIB and
+#       friends), without duplicates, in file order.
+LinkInfo = collections.namedtuple(
+    "LinkInfo", ["install_name", "rpaths", "dylibs"])
+
+
+# Everything the tools need to know about a binary, read in a single pass.
+#   slices: The Slices of the binary, in file order.
+#   min_os_versions: The MinOSVersions of every slice, in file order. A slice
+#       may have more than one (e.g. zippered binaries) or none at all.
+#   link_info: The LinkInfo of the binary.
+MachOInfo = collections.namedtuple(
+    "MachOInfo", ["slices", "min_os_versions", "link_info"])
+
+
+def read_info(path):
+  """Returns the MachOInfo of a binary.
+
+  Only the headers and load commands of each slice are read.
+
+  Args:
+    path: The path to the Mach-O or universal binary.
+
+  Returns:
+    The MachOInfo.
+
+  Raises:
+    MachOError: If the file isn't a Mach-O or universal binary or its load
+      commands are malformed.
+  """
+  min_os_versions = []
+  install_name = None
+  rpaths = {}
+  dylibs = {}
+  with open(path, "rb") as f:
+    slices = _read_slices(f)
+    for s in slices:
+      for cmd, endian, data in _load_commands(f, s):
+        if cmd == _LC_BUILD_VERSION or cmd in _VERSION_MIN_PLATFORMS:
+          min_os_versions.append(
+              _min_os_version(path, s.arch, cmd, endian, data))
+        elif cmd == _LC_ID_DYLIB:
+          install_name = install_name or _load_command_string(
+              path, endian, data)
+        elif cmd == _LC_RPATH:
+          rpaths[_load_command_string(path, endian, data)] = None
+        elif cmd in _DEPENDENT_DYLIB_COMMANDS:
+          dylibs[_load_command_string(path, endian, data)] = None
+  return MachOInfo(slices, min_os_versions,
+                   LinkInfo(install_name, list(rpaths), list(dylibs)))
+
+
+def read_min_os_versions(path):
+  """Returns the MinOSVersions of a binary; see read_info."""
+  return read_info(path).min_os_versions
+
+
+def read_link_info(path):
+  """Returns the LinkInfo of a binary; see read_info."""
+  return read_info(path).link_info
+
+
+def _compare_slices(a, b):
+  """Orders slices in a fat file the way lipo does."""
+  if a.cputype == b.cputype:
+    return (a.cpusubtype > b.cpusubtype) - (a.cpusubtype < b.cpusubtype)
+  # lipo always places the arm64 family after all the other slices.
+  if a.cputype == _CPU_TYPE_ARM64:
+    return 1
+  if b.cputype == _CPU_TYPE_ARM64:
+    return -1
+  return a.align - b.align
+
+
+def _round_up(value, align):
+  return (value + (1 << align) - 1) & ~((1 << align) - 1)
+
+
+def _copy_range(src, dst, offset, size):
+  """Appends size bytes of src starting at offset to dst.
+
+  The copy is done by the kernel when the platform supports it, so the data
+  never has to pass through this process.
+  """
+  if hasattr(os, "copy_file_range"):
+    dst.flush()
+    try:
+      while size:
+        copied = os.copy_file_range(src.fileno(), dst.fileno(), size, offset)
+        if not copied:
+          raise MachOError("Unexpected end of file in %s" % src.name)
+        offset += copied
+        size -= copied
+      return
+    except OSError:
+      # Not supported between these files (e.g. across file systems on older
+      # kernels), copy the remainder through a buffer instead.
+      pass
+
+  buffer = memoryview(bytearray(min(size, _COPY_BUFFER_SIZE)))
+  src.seek(offset)
+  while size:
+    read = src.readinto(buffer[:min(size, len(buffer))])
+    if not read:
+      raise MachOError("Unexpected end of file in %s" % src.name)
+    dst.write(buffer[:read])
+    size -= read
+
+
+def _fat_layout(slices, entry_size):
+  """Returns the offsets of the slices in a fat file and the file's size."""
+  offset = _FAT_HEADER_SIZE + len(slices) * entry_size
+  offsets = []
+  for s in slices:
+    offset = _round_up(offset, s.align)
+    offsets.append(offset)
+    offset += s.size
+  return offsets, offset
+
+
+def _write_fat(src, dst, slices):
+  """Writes a fat binary holding the given slices of src to dst.
+
+  Like lipo, a 32-bit fat header is written unless the offsets or sizes of
+  the slices don't fit in it, whatever header the input had.
+  """
+  slices = sorted(slices, key=functools.cmp_to_key(_compare_slices))
+  offsets, file_size = _fat_layout(slices, _FAT_ARCH_SIZE)
+  fat64 = file_size > 0xFFFFFFFF
+  if fat64:
+    offsets, _ = _fat_layout(slices, _FAT_ARCH_64_SIZE)
+
+  header = [struct.pack(">II", _FAT_MAGIC_64 if fat64 else _FAT_MAGIC,
+                        len(slices))]
+  for s, offset in zip(slices, offsets):
+    if fat64:
+      header.append(struct.pack(">iIQQII", s.cputype, s.cpusubtype, offset,
+                                s.size, s.align, 0))
+    else:
+      header.append(struct.pack(">iIIII", s.cputype, s.cpusubtype, offset,
+                                s.size, s.align))
+  header = b"".join(header)
+  dst.write(header)
+
+  position = len(header)
+  for s, offset in zip(slices, offsets):
+    dst.write(b"\0" * (offset - position))
+    _copy_range(src, dst, s.offset, s.size)
+    position = offset + s.size
+
+
+def extract_archs(path, archs, output_path):
+  """Writes the given architectures of a binary to a new file.
+
+  This is the equivalent of `lipo -thin` when a single architecture is
+  requested (the slice is written on its own) and `lipo -extract` otherwise
+  (a fat binary laid out the way lipo would is written). The output is
+  written atomically and may replace the input; if output_path is a symlink,
+  the file it points to is replaced.
+
+  Args:
+    path: The path to the Mach-O or universal binary.
+    archs: An iterable of architecture names to keep.
+    output_path: The path of the binary to write.
+
+  Raises:
+    MachOError: If the file isn't a Mach-O or universal binary, or doesn't
+      contain all of the requested architectures.
+  """
+  archs = set(archs)
+  with open(path, "rb") as src:
+    slices = _read_slices(src)
+    selected = [x for x in slices if x.arch in archs]
+    missing = archs - set(x.arch for x in selected)
+    if missing:
+      raise MachOError("%s does not contain the architectures: %s" %
+                       (path, ", ".join(sorted(missing))))
+
+    # Replace the file a symlink points to rather than the symlink itself.
+    output_path = os.path.realpath(output_path)
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(output_path),
+        prefix=".%s." % os.path.basename(output_path))
+    try:
+      with open(fd, "wb") as dst:
+        if len(selected) == 1:
+          _copy_range(src, dst, selected[0].offset, selected[0].size)
+        else:
+          _write_fat(src, dst, selected)
+      shutil.copymode(path, temp_path)
+      os.replace(temp_path, output_path)
+    except BaseException:
+      os.remove(temp_path)
+      raise
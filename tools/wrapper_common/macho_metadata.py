@@ -0,0 +1,140 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Memoized Mach-O metadata shared by the tools.
+
+Several tools ask the same questions about the same binaries (architectures,
+deployment targets, install names, rpaths and linked dylibs). This module
+parses each binary once with `macho.read_info` and hands out the resulting
+`macho.MachOInfo` record from then on.
+
+Records are memoized for the lifetime of the process, keyed by the binary's
+path, inode, modification time and size, so a binary that is rewritten is
+parsed again. When the `MACHO_METADATA_CACHE_DIR` environment variable is set
+(e.g. with `--action_env`), records are also persisted as small JSON files in
+that directory and shared by every action that uses these tools. Those are
+keyed by device, inode, modification time and size, which stay the same when
+Bazel links the same file into different sandboxes. The directory is only
+used if nobody but the current user can write to it.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from tools.wrapper_common import caching
+from tools.wrapper_common import macho
+
+CACHE_DIR_ENV = "MACHO_METADATA_CACHE_DIR"
+
+# Bump when the format of the records or what read_info reports changes.
+_CACHE_ENTRY_SUFFIX = ".macho1.json"
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+def _cache_path(cache_dir, stat):
+  key = "%d:%d:%d:%d" % (stat.st_dev, stat.st_ino, stat.st_mtime_ns,
+                         stat.st_size)
+  return os.path.join(
+      cache_dir,
+      hashlib.sha256(key.encode()).hexdigest() + _CACHE_ENTRY_SUFFIX)
+
+
+def _to_json(info):
+  return {
+      "slices": [list(x) for x in info.slices],
+      "min_os_versions": [list(x) for x in info.min_os_versions],
+      "link_info": list(info.link_info),
+  }
+
+
+def _from_json(value):
+  return macho.MachOInfo(
+      slices=[macho.Slice(*x) for x in value["slices"]],
+      min_os_versions=[macho.MinOSVersion(*x)
+                       for x in value["min_os_versions"]],
+      link_info=macho.LinkInfo(*value["link_info"]))
+
+
+def _load_cached(cache_path):
+  """Returns the record at cache_path, or None if it can't be used."""
+  try:
+    with open(cache_path, "r") as f:
+      return _from_json(json.load(f))
+  except (OSError, ValueError, KeyError, TypeError):
+    # Missing, partially written by an older version or otherwise unreadable
+    # entries are simply recomputed.
+    return None
+
+
+def _store_cached(cache_path, info):
+  """Atomically writes the record to cache_path, ignoring failures."""
+  caching.write_atomically(cache_path, lambda f: json.dump(_to_json(info), f))
+
+
+def read(path):
+  """Returns the macho.MachOInfo of a binary, parsing it at most once.
+
+  Args:
+    path: The path to the Mach-O or universal binary.
+
+  Returns:
+    The macho.MachOInfo of the binary.
+
+  Raises:
+    OSError: If the binary can't be read.
+    macho.MachOError: If the file isn't a Mach-O or universal binary or its
+      load commands are malformed.
+  """
+  stat = os.stat(path)
+  key = (os.path.abspath(path), stat.st_ino, stat.st_mtime_ns, stat.st_size)
+  with _memo_lock:
+    info = _memo.get(key)
+  if info:
+    return info
+
+  cache_dir = caching.trusted_cache_dir(os.environ.get(CACHE_DIR_ENV))
+  cache_path = cache_dir and _cache_path(cache_dir, stat)
+  info = cache_path and _load_cached(cache_path)
+  if not info:
+    info = macho.read_info(path)
+    if cache_path:
+      _store_cached(cache_path, info)
+
+  with _memo_lock:
+    _memo[key] = info
+  return info
+
+
+def archs(path):
+  """Returns the architecture names of a binary, in file order.
+
+  This parses the load commands of every slice unless the binary was already
+  read; callers that only need the architectures should use
+  `macho.read_archs`, which only reads the headers.
+  """
+  return [x.arch for x in read(path).slices]
+
+
+def min_os_versions(path):
+  """Returns the macho.MinOSVersions of every slice of a binary."""
+  return read(path).min_os_versions
+
+
+def link_info(path):
+  """Returns the macho.LinkInfo of a binary."""
+  return read(path).link_info
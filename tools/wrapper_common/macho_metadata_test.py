@@ -0,0 +1,112 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for wrapper_common.macho_metadata."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from tools.wrapper_common import macho
+from tools.wrapper_common import macho_metadata
+from tools.wrapper_common import macho_test_utils
+
+_ARM64 = macho_test_utils.ARM64
+_X86_64 = macho_test_utils.X86_64
+
+
+def _macho(arch, rpath):
+  """Returns a 64-bit Mach-O executable with a single LC_RPATH."""
+  return macho_test_utils.thin_macho(
+      arch, [macho_test_utils.path_command(macho_test_utils.LC_RPATH, rpath)],
+      filetype=macho_test_utils.MH_EXECUTE)
+
+
+class MachOMetadataTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self._tmp_dir)
+    self._cache_dir = os.path.join(self._tmp_dir, "cache")
+    self._binary = os.path.join(self._tmp_dir, "binary")
+    self._write(_ARM64, "/usr/lib")
+
+    memo = mock.patch.dict(macho_metadata._memo, clear=True)
+    memo.start()
+    self.addCleanup(memo.stop)
+    environ = mock.patch.dict(os.environ)
+    environ.start()
+    self.addCleanup(environ.stop)
+    os.environ.pop(macho_metadata.CACHE_DIR_ENV, None)
+
+  def _write(self, arch, rpath):
+    with open(self._binary, "wb") as f:
+      f.write(_macho(arch, rpath))
+
+  def test_parses_each_binary_once(self):
+    with mock.patch.object(
+        macho, "read_info", wraps=macho.read_info) as read_info:
+      self.assertEqual(["arm64"], macho_metadata.archs(self._binary))
+      self.assertEqual([], macho_metadata.min_os_versions(self._binary))
+      self.assertEqual(
+          ["/usr/lib"], macho_metadata.link_info(self._binary).rpaths)
+      read_info.assert_called_once_with(self._binary)
+
+  def test_rewritten_binary_is_parsed_again(self):
+    self.assertEqual(["arm64"], macho_metadata.archs(self._binary))
+    self._write(_X86_64, "/usr/local/lib")
+    self.assertEqual(["x86_64"], macho_metadata.archs(self._binary))
+
+  def test_disk_cache_is_shared_across_processes(self):
+    os.environ[macho_metadata.CACHE_DIR_ENV] = self._cache_dir
+    expected = macho_metadata.read(self._binary)
+    self.assertEqual(1, len(os.listdir(self._cache_dir)))
+
+    # Simulate another action by forgetting the memoized records.
+    macho_metadata._memo.clear()
+    with mock.patch.object(macho, "read_info") as read_info:
+      self.assertEqual(expected, macho_metadata.read(self._binary))
+      read_info.assert_not_called()
+
+  def test_unreadable_disk_cache_entries_are_replaced(self):
+    os.environ[macho_metadata.CACHE_DIR_ENV] = self._cache_dir
+    expected = macho_metadata.read(self._binary)
+    entry = os.path.join(self._cache_dir, os.listdir(self._cache_dir)[0])
+    with open(entry, "w") as f:
+      f.write('{"slices": ')
+
+    macho_metadata._memo.clear()
+    self.assertEqual(expected, macho_metadata.read(self._binary))
+    with open(entry) as f:
+      self.assertIn("/usr/lib", f.read())
+
+  def test_shared_disk_cache_is_not_used(self):
+    os.makedirs(self._cache_dir)
+    os.chmod(self._cache_dir, 0o777)
+    os.environ[macho_metadata.CACHE_DIR_ENV] = self._cache_dir
+    macho_metadata.read(self._binary)
+    self.assertEqual([], os.listdir(self._cache_dir))
+
+  def test_errors_are_not_memoized(self):
+    with open(self._binary, "wb") as f:
+      f.write(b"not a binary")
+    with self.assertRaises(macho.MachOError):
+      macho_metadata.read(self._binary)
+    self.assertEqual({}, macho_metadata._memo)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,253 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for wrapper_common.macho."""
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+from tools.wrapper_common import macho
+from tools.wrapper_common import macho_test_utils
+
+_MH_MAGIC_64 = macho_test_utils.MH_MAGIC_64
+_LC_VERSION_MIN_IPHONEOS = macho_test_utils.LC_VERSION_MIN_IPHONEOS
+_LC_BUILD_VERSION = macho_test_utils.LC_BUILD_VERSION
+_LC_LOAD_DYLIB = macho_test_utils.LC_LOAD_DYLIB
+_LC_ID_DYLIB = macho_test_utils.LC_ID_DYLIB
+_LC_LOAD_WEAK_DYLIB = macho_test_utils.LC_LOAD_WEAK_DYLIB
+_LC_RPATH = macho_test_utils.LC_RPATH
+_PLATFORM_MACOS = macho_test_utils.PLATFORM_MACOS
+_PLATFORM_IOSSIMULATOR = macho_test_utils.PLATFORM_IOSSIMULATOR
+_ARM64 = macho_test_utils.ARM64
+_ARM64E = macho_test_utils.ARM64E
+_ARM64_32 = macho_test_utils.ARM64_32
+_X86_64 = macho_test_utils.X86_64
+_ARMV7K = macho_test_utils.ARMV7K
+
+thin_macho = macho_test_utils.thin_macho
+fat_macho = macho_test_utils.fat_macho
+version = macho_test_utils.version
+build_version_command = macho_test_utils.build_version_command
+version_min_command = macho_test_utils.version_min_command
+path_command = macho_test_utils.path_command
+
+
+class MachOTestCase(unittest.TestCase):
+  """Base class for the tests, with helpers to write binaries."""
+
+  def setUp(self):
+    super().setUp()
+    self._tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self._tmp_dir)
+
+  def write(self, name, data):
+    path = os.path.join(self._tmp_dir, name)
+    with open(path, "wb") as f:
+      f.write(data)
+    return path
+
+
+class ReadSlicesTest(MachOTestCase):
+
+  def test_thin(self):
+    path = self.write("thin", thin_macho(_ARM64, size=100))
+    self.assertEqual(
+        [macho.Slice("arm64", _ARM64[0], _ARM64[1], 0, 100, 0)],
+        macho.read_slices(path))
+
+  def test_fat(self):
+    for fat64 in (False, True):
+      with self.subTest(fat64=fat64):
+        path = self.write(
+            "fat",
+            fat_macho([
+                thin_macho(arch)
+                for arch in (_X86_64, _ARM64, _ARM64E, _ARM64_32, _ARMV7K)
+            ], fat64=fat64))
+        self.assertEqual(["x86_64", "arm64", "arm64e", "arm64_32", "armv7k"],
+                         macho.read_archs(path))
+        slices = macho.read_slices(path)
+        self.assertTrue(all(x.offset % (1 << 14) == 0 for x in slices))
+        with open(path, "rb") as f:
+          data = f.read()
+        for s in slices:
+          self.assertEqual(
+              struct.pack("<I", _MH_MAGIC_64), data[s.offset:s.offset + 4])
+
+  def test_not_macho(self):
+    for data in (b"", b"!<arch>\n", b"\xca\xfe\xba\xbe\x00\x00\x00\x33"):
+      with self.subTest(data=data):
+        path = self.write("other", data + b"\0" * 64)
+        with self.assertRaises(macho.MachOError):
+          macho.read_slices(path)
+
+  def test_unknown_arch(self):
+    path = self.write("thin", thin_macho((99, 0)))
+    with self.assertRaisesRegex(macho.MachOError, "Unknown architecture"):
+      macho.read_slices(path)
+
+
+class ExtractArchsTest(MachOTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._slices = {
+        arch: thin_macho(arch, size=size)
+        for arch, size in ((_ARM64, 5000), (_ARM64E, 300), (_X86_64, 20000))
+    }
+    self._fat = self.write(
+        "fat", fat_macho([self._slices[x] for x in (_ARM64E, _X86_64, _ARM64)]))
+
+  def _read(self, path):
+    with open(path, "rb") as f:
+      return f.read()
+
+  def test_thin(self):
+    output = os.path.join(self._tmp_dir, "out")
+    macho.extract_archs(self._fat, ["x86_64"], output)
+    self.assertEqual(self._slices[_X86_64], self._read(output))
+
+  def test_extract_uses_lipo_layout(self):
+    # lipo sorts the slices by alignment, with the arm64 family last.
+    expected = fat_macho([self._slices[x] for x in (_X86_64, _ARM64, _ARM64E)])
+    output = os.path.join(self._tmp_dir, "out")
+    macho.extract_archs(self._fat, {"arm64e", "x86_64", "arm64"}, output)
+    self.assertEqual(expected, self._read(output))
+
+    expected = fat_macho([self._slices[x] for x in (_X86_64, _ARM64)])
+    macho.extract_archs(self._fat, ["arm64", "x86_64"], output)
+    self.assertEqual(expected, self._read(output))
+
+  def test_buffered_copy(self):
+    expected = fat_macho([self._slices[x] for x in (_X86_64, _ARM64)])
+    output = os.path.join(self._tmp_dir, "out")
+    with mock.patch.object(
+        macho.os, "copy_file_range", create=True,
+        side_effect=OSError("unsupported")):
+      macho.extract_archs(self._fat, ["arm64", "x86_64"], output)
+    self.assertEqual(expected, self._read(output))
+
+  def test_in_place_keeps_mode(self):
+    os.chmod(self._fat, 0o751)
+    macho.extract_archs(self._fat, ["arm64"], self._fat)
+    self.assertEqual(self._slices[_ARM64], self._read(self._fat))
+    self.assertEqual(0o751, os.stat(self._fat).st_mode & 0o777)
+    self.assertEqual(["fat"], os.listdir(self._tmp_dir))
+
+  def test_fat64_input_gets_32_bit_header(self):
+    fat64 = self.write(
+        "fat64",
+        fat_macho([self._slices[x] for x in (_ARM64E, _X86_64, _ARM64)],
+                  fat64=True))
+    expected = fat_macho([self._slices[x] for x in (_X86_64, _ARM64)])
+    output = os.path.join(self._tmp_dir, "out")
+    macho.extract_archs(fat64, ["arm64", "x86_64"], output)
+    self.assertEqual(expected, self._read(output))
+
+  def test_in_place_through_symlink(self):
+    link = os.path.join(self._tmp_dir, "link")
+    os.symlink("fat", link)
+    macho.extract_archs(link, ["arm64"], link)
+    self.assertTrue(os.path.islink(link))
+    self.assertEqual(self._slices[_ARM64], self._read(self._fat))
+    self.assertEqual(["fat", "link"], sorted(os.listdir(self._tmp_dir)))
+
+  def test_missing_arch(self):
+    output = os.path.join(self._tmp_dir, "out")
+    with self.assertRaisesRegex(macho.MachOError, "armv7k"):
+      macho.extract_archs(self._fat, ["arm64", "armv7k"], output)
+    self.assertFalse(os.path.exists(output))
+
+
+class ReadMinOSVersionsTest(MachOTestCase):
+
+  def test_versions_of_every_slice(self):
+    path = self.write(
+        "fat",
+        fat_macho([
+            thin_macho(_X86_64, [
+                build_version_command(_PLATFORM_MACOS, version(10, 14, 4)),
+                build_version_command(_PLATFORM_IOSSIMULATOR, version(13, 1)),
+            ]),
+            thin_macho(_ARMV7K, [
+                struct.pack("<II", 0x19, 8),  # An unrelated command.
+                version_min_command(_LC_VERSION_MIN_IPHONEOS, version(9, 0)),
+            ]),
+            thin_macho(_ARM64),
+        ]))
+    self.assertEqual([
+        macho.MinOSVersion("x86_64", "macos", "10.14.4"),
+        macho.MinOSVersion("x86_64", "iossimulator", "13.1"),
+        macho.MinOSVersion("armv7k", "iphoneos", "9.0"),
+    ], macho.read_min_os_versions(path))
+
+  def test_malformed_load_commands(self):
+    command = build_version_command(_PLATFORM_MACOS, version(11, 0))
+    for data in (
+        thin_macho(_ARM64, [command])[:-4],
+        thin_macho(_ARM64, [command[:4] + struct.pack("<I", 400) +
+                            command[8:]]),
+        thin_macho(_ARM64, [struct.pack("<II", _LC_BUILD_VERSION, 8)]),
+    ):
+      with self.subTest(data=data):
+        path = self.write("thin", data)
+        with self.assertRaises(macho.MachOError):
+          macho.read_min_os_versions(path)
+
+
+class ReadLinkInfoTest(MachOTestCase):
+
+  def test_paths_of_every_slice(self):
+    path = self.write(
+        "fat",
+        fat_macho([
+            thin_macho(_X86_64, [
+                path_command(_LC_ID_DYLIB, "@rpath/Foo.framework/Foo"),
+                path_command(_LC_RPATH, "@executable_path/Frameworks"),
+                path_command(_LC_LOAD_DYLIB, "/usr/lib/libSystem.B.dylib"),
+            ]),
+            thin_macho(_ARM64, [
+                path_command(_LC_ID_DYLIB, "@rpath/Foo.framework/Foo"),
+                path_command(_LC_RPATH, "@executable_path/Frameworks"),
+                path_command(_LC_RPATH, "/a/lib/clang/17/lib/darwin"),
+                path_command(_LC_LOAD_DYLIB, "/usr/lib/libSystem.B.dylib"),
+                path_command(_LC_LOAD_WEAK_DYLIB, "@rpath/libclang_rt.dylib"),
+            ]),
+        ]))
+    self.assertEqual(
+        macho.LinkInfo(
+            install_name="@rpath/Foo.framework/Foo",
+            rpaths=["@executable_path/Frameworks",
+                    "/a/lib/clang/17/lib/darwin"],
+            dylibs=["/usr/lib/libSystem.B.dylib", "@rpath/libclang_rt.dylib"]),
+        macho.read_link_info(path))
+
+  def test_executable(self):
+    path = self.write(
+        "thin", thin_macho(_ARM64, filetype=macho_test_utils.MH_EXECUTE))
+    self.assertEqual(macho.LinkInfo(None, [], []), macho.read_link_info(path))
+
+  def test_malformed_string_offset(self):
+    command = path_command(_LC_RPATH, "/usr/lib")
+    command = command[:8] + struct.pack("<I", len(command)) + command[12:]
+    path = self.write("thin", thin_macho(_ARM64, [command]))
+    with self.assertRaises(macho.MachOError):
+      macho.read_link_info(path)
+
+
+if __name__ == "__main__":
+  unittest.main()
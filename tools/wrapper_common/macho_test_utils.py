@@ -0,0 +1,101 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Builders of synthetic Mach-O binaries for tests."""
+
+import struct
+
+MH_MAGIC_64 = 0xFEEDFACF
+MH_EXECUTE = 2
+MH_DYLIB = 6
+LC_VERSION_MIN_IPHONEOS = 0x25
+LC_BUILD_VERSION = 0x32
+LC_LOAD_DYLIB = 0xC
+LC_ID_DYLIB = 0xD
+LC_LOAD_WEAK_DYLIB = 0x80000018
+LC_RPATH = 0x8000001C
+PLATFORM_MACOS = 1
+PLATFORM_IOS = 2
+PLATFORM_IOSSIMULATOR = 7
+
+# (cputype, cpusubtype) of some architectures.
+ARM64 = (0x0100000C, 0)
+ARM64E = (0x0100000C, 0x80000002)  # Includes the pointer auth ABI bit.
+ARM64_32 = (0x0200000C, 1)
+X86_64 = (0x01000007, 3)
+ARMV7K = (12, 12)
+
+
+def thin_macho(arch, load_commands=(), filetype=MH_DYLIB, size=None):
+  """Returns the bytes of a 64-bit little endian Mach-O.
+
+  Args:
+    arch: The (cputype, cpusubtype) of the binary.
+    load_commands: The encoded load commands to include.
+    filetype: The Mach-O file type.
+    size: If given, pad the binary with zeros to this size.
+  """
+  commands = b"".join(load_commands)
+  data = struct.pack("<IiIIIIII", MH_MAGIC_64, arch[0], arch[1], filetype,
+                     len(load_commands), len(commands), 0, 0) + commands
+  if size is not None:
+    data += b"\0" * (size - len(data))
+  return data
+
+
+def version(major, minor, patch=0):
+  """Returns a version encoded as xxxx.yy.zz nibbles."""
+  return major << 16 | minor << 8 | patch
+
+
+def build_version_command(platform, minos):
+  """Returns an LC_BUILD_VERSION load command without any tools."""
+  return struct.pack("<IIIIII", LC_BUILD_VERSION, 24, platform, minos, minos,
+                     0)
+
+
+def version_min_command(cmd, minos):
+  """Returns an LC_VERSION_MIN_* load command."""
+  return struct.pack("<IIII", cmd, 16, minos, minos)
+
+
+def path_command(cmd, path):
+  """Returns an LC_RPATH or dylib_command referring to the given path."""
+  header_size = 12 if cmd == LC_RPATH else 24
+  path = path.encode() + b"\0"
+  path += b"\0" * (-(header_size + len(path)) % 8)
+  command = struct.pack("<III", cmd, header_size + len(path), header_size)
+  if cmd != LC_RPATH:
+    # The timestamp, current and compatibility versions.
+    command += struct.pack("<III", 2, version(1, 0), version(1, 0))
+  return command + path
+
+
+def fat_macho(slices, fat64=False, align=14):
+  """Returns the bytes of a universal binary holding the given slices."""
+  magic, entry_size = (0xCAFEBABF, 32) if fat64 else (0xCAFEBABE, 20)
+  offset = 8 + entry_size * len(slices)
+  header = struct.pack(">II", magic, len(slices))
+  body = b""
+  for data in slices:
+    aligned = (offset + (1 << align) - 1) & ~((1 << align) - 1)
+    body += b"\0" * (aligned - offset) + data
+    cputype, cpusubtype = struct.unpack_from("<iI", data, 4)
+    if fat64:
+      header += struct.pack(">iIQQII", cputype, cpusubtype, aligned, len(data),
+                            align, 0)
+    else:
+      header += struct.pack(">iIIII", cputype, cpusubtype, aligned, len(data),
+                            align)
+    offset = aligned + len(data)
+  return header + body
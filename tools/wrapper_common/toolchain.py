@@ -0,0 +1,115 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Resolves the paths of Xcode tools once per process and per Xcode.
+
+`xcrun --find` takes a noticeable amount of time, and signing a bundle used to
+run it once per signed path. The paths it returns only depend on the selected
+Xcode, so they are memoized for the lifetime of the process and, when
+`DEVELOPER_DIR` is set (as it is for every Bazel action using Xcode), also
+persisted in a small JSON descriptor of that Xcode's tools shared by the
+following actions. Persisted paths that no longer point to an executable are
+resolved again.
+
+Descriptors are opt-in: they live in the directory named by the
+`TOOLCHAIN_CACHE_DIR` environment variable, and only the in-process memo is
+used when that variable isn't set. See wrapper_common.caching for the
+requirements on that directory.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from tools.wrapper_common import caching
+from tools.wrapper_common import execute
+
+# LINT.IfChange
+_TOOLCHAIN_CACHE_DIR_ENV = "TOOLCHAIN_CACHE_DIR"
+
+_tool_paths = {}
+_tool_paths_lock = threading.Lock()
+
+
+def _toolchain_cache_dir():
+  """Returns the descriptor directory, or None if it can't be used."""
+  return caching.trusted_cache_dir(os.environ.get(_TOOLCHAIN_CACHE_DIR_ENV))
+
+
+def _load_descriptor(path):
+  """Returns the tool paths stored at path, or an empty dict."""
+  try:
+    with open(path, "r") as f:
+      descriptor = json.load(f)
+    if isinstance(descriptor, dict):
+      return descriptor
+  except (OSError, ValueError):
+    pass
+  return {}
+
+
+def _store_descriptor(path, descriptor):
+  """Atomically stores the tool paths at path, ignoring failures."""
+  caching.write_atomically(
+      path, lambda f: json.dump(descriptor, f, sort_keys=True))
+
+
+def _descriptor_path(developer_dir):
+  """Returns the path of the descriptor for an Xcode, or None."""
+  if not developer_dir:
+    # Without DEVELOPER_DIR the result depends on `xcode-select`, which can
+    # change at any time.
+    return None
+  cache_dir = _toolchain_cache_dir()
+  if not cache_dir:
+    return None
+  digest = hashlib.sha256(developer_dir.encode("utf-8")).hexdigest()
+  return os.path.join(cache_dir, digest + ".json")
+# LINT.ThenChange(../dossier_codesigningtool/dossier_codesigning_reader.py)
+
+
+def find_tool(name):
+  """Returns the path of an Xcode tool, as `xcrun --find` would.
+
+  Args:
+    name: The name of the tool, e.g. "codesign_allocate".
+
+  Returns:
+    The absolute path of the tool in the selected Xcode.
+
+  Raises:
+    subprocess.CalledProcessError: If xcrun can't find the tool.
+  """
+  developer_dir = os.environ.get("DEVELOPER_DIR")
+  key = (developer_dir, name)
+  # Lookups are serialized so that concurrent signing threads share the first
+  # one instead of all running xcrun.
+  with _tool_paths_lock:
+    path = _tool_paths.get(key)
+    if path:
+      return path
+
+    descriptor_path = _descriptor_path(developer_dir)
+    descriptor = _load_descriptor(descriptor_path) if descriptor_path else {}
+    path = descriptor.get(name)
+    if not isinstance(path, str) or not os.access(path, os.X_OK):
+      _, stdout, _ = execute.execute_and_filter_output(
+          ["xcrun", "--find", name], raise_on_failure=True)
+      path = stdout.strip()
+      if descriptor_path:
+        descriptor[name] = path
+        _store_descriptor(descriptor_path, descriptor)
+
+    _tool_paths[key] = path
+    return path
@@ -0,0 +1,97 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for wrapper_common.toolchain."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from tools.wrapper_common import execute
+from tools.wrapper_common import toolchain
+
+
+class FindToolTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self._tmp_dir)
+    self._tool = os.path.join(self._tmp_dir, "codesign_allocate")
+    with open(self._tool, "w") as f:
+      f.write("#!/bin/sh\n")
+    os.chmod(self._tool, 0o755)
+
+    tool_paths = mock.patch.dict(toolchain._tool_paths, clear=True)
+    tool_paths.start()
+    self.addCleanup(tool_paths.stop)
+    environ = mock.patch.dict(os.environ, {
+        "DEVELOPER_DIR": "/Applications/Xcode.app/Contents/Developer",
+        toolchain._TOOLCHAIN_CACHE_DIR_ENV: os.path.join(
+            self._tmp_dir, "cache"),
+    })
+    environ.start()
+    self.addCleanup(environ.stop)
+    execute_mock = mock.patch.object(
+        execute, "execute_and_filter_output",
+        return_value=(0, self._tool + "\n", ""))
+    self._execute = execute_mock.start()
+    self.addCleanup(execute_mock.stop)
+
+  def test_tool_is_found_once_per_process(self):
+    self.assertEqual(self._tool, toolchain.find_tool("codesign_allocate"))
+    self.assertEqual(self._tool, toolchain.find_tool("codesign_allocate"))
+    self._execute.assert_called_once_with(
+        ["xcrun", "--find", "codesign_allocate"], raise_on_failure=True)
+
+  def test_descriptor_is_shared_across_processes(self):
+    toolchain.find_tool("codesign_allocate")
+    # Simulate another action by forgetting the memoized paths.
+    toolchain._tool_paths.clear()
+    self.assertEqual(self._tool, toolchain.find_tool("codesign_allocate"))
+    self._execute.assert_called_once()
+
+  def test_descriptors_are_per_developer_dir(self):
+    toolchain.find_tool("codesign_allocate")
+    toolchain._tool_paths.clear()
+    os.environ["DEVELOPER_DIR"] = "/Applications/Xcode-beta.app"
+    toolchain.find_tool("codesign_allocate")
+    self.assertEqual(2, self._execute.call_count)
+
+  def test_missing_tools_are_found_again(self):
+    toolchain.find_tool("codesign_allocate")
+    toolchain._tool_paths.clear()
+    os.remove(self._tool)
+    toolchain.find_tool("codesign_allocate")
+    self.assertEqual(2, self._execute.call_count)
+
+  def test_descriptors_are_opt_in(self):
+    del os.environ[toolchain._TOOLCHAIN_CACHE_DIR_ENV]
+    toolchain.find_tool("codesign_allocate")
+    toolchain._tool_paths.clear()
+    toolchain.find_tool("codesign_allocate")
+    self.assertEqual(2, self._execute.call_count)
+    self.assertFalse(os.path.exists(os.path.join(self._tmp_dir, "cache")))
+
+  def test_nothing_is_persisted_without_developer_dir(self):
+    del os.environ["DEVELOPER_DIR"]
+    toolchain.find_tool("codesign_allocate")
+    toolchain._tool_paths.clear()
+    toolchain.find_tool("codesign_allocate")
+    self.assertEqual(2, self._execute.call_count)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,118 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Reads the few fields of X.509 certificates needed to match identities.
+
+Code signing identities are referred to by the SHA-1 fingerprint of their
+certificate and matched by the common name of its subject; both are computed
+here without spawning `openssl`.
+"""
+
+import hashlib
+
+from tools.wrapper_common import asn1
+
+# LINT.IfChange
+# Tags of the string types that can hold attribute values in a Name.
+_STRING_DECODERS = {
+    0x0C: lambda x: x.decode("utf-8"),  # UTF8String
+    0x13: lambda x: x.decode("ascii"),  # PrintableString
+    0x14: lambda x: x.decode("latin-1"),  # TeletexString
+    0x16: lambda x: x.decode("ascii"),  # IA5String
+    0x1C: lambda x: x.decode("utf-32-be"),  # UniversalString
+    0x1E: lambda x: x.decode("utf-16-be"),  # BMPString
+}
+
+# The short names OpenSSL uses for the attributes found in signing
+# certificates.
+_ATTRIBUTE_NAMES = {
+    "2.5.4.3": "CN",
+    "2.5.4.6": "C",
+    "2.5.4.7": "L",
+    "2.5.4.8": "ST",
+    "2.5.4.10": "O",
+    "2.5.4.11": "OU",
+    "0.9.2342.19200300.100.1.1": "UID",
+    "1.2.840.113549.1.9.1": "emailAddress",
+}
+# LINT.ThenChange(../dossier_codesigningtool/dossier_codesigning_reader.py)
+
+# The explicitly tagged version field that starts v2 and v3 certificates.
+_TAG_VERSION = 0xA0
+
+
+class X509Error(ValueError):
+  """Raised when the data isn't a valid certificate."""
+
+
+def fingerprint(der):
+  """Returns the SHA-1 fingerprint of a DER certificate, as uppercase hex."""
+  return hashlib.sha1(der).hexdigest().upper()
+
+
+def subject(der):
+  """Returns the attributes of the subject of a DER certificate.
+
+  Args:
+    der: The DER encoded certificate.
+
+  Returns:
+    A list of (name, value) tuples, in the order they appear in the
+    certificate. Names are OpenSSL's short names (e.g. "CN"), or the dotted
+    OID for unknown attributes.
+
+  Raises:
+    X509Error: If the certificate can't be parsed.
+  """
+  try:
+    certificate = asn1.parse_element(der)
+    asn1.expect(certificate, asn1.TAG_SEQUENCE)
+    tbs_certificate = asn1.children(der, certificate)[0]
+    asn1.expect(tbs_certificate, asn1.TAG_SEQUENCE)
+    fields = asn1.children(der, tbs_certificate)
+    # version (optional), serialNumber, signature, issuer, validity, subject
+    subject_index = 5 if fields and fields[0].tag == _TAG_VERSION else 4
+    if len(fields) <= subject_index:
+      raise X509Error("Truncated TBSCertificate")
+    name = fields[subject_index]
+    asn1.expect(name, asn1.TAG_SEQUENCE)
+
+    attributes = []
+    for rdn in asn1.children(der, name):
+      asn1.expect(rdn, asn1.TAG_SET)
+      for attribute in asn1.children(der, rdn):
+        asn1.expect(attribute, asn1.TAG_SEQUENCE)
+        type_and_value = asn1.children(der, attribute)
+        if len(type_and_value) != 2:
+          raise X509Error("Malformed AttributeTypeAndValue")
+        attribute_type, value = type_and_value
+        oid = asn1.oid(der, attribute_type)
+        decode = _STRING_DECODERS.get(value.tag)
+        if not decode:
+          raise X509Error("Unsupported string type 0x%02x for %s" %
+                          (value.tag, oid))
+        attributes.append((_ATTRIBUTE_NAMES.get(oid, oid),
+                           decode(asn1.content(der, value))))
+    return attributes
+  except (asn1.Asn1Error, IndexError, UnicodeDecodeError) as e:
+    raise X509Error("Invalid certificate: %s" % e) from e
+
+
+def common_name(der):
+  """Returns the first CN of a DER certificate's subject, or None."""
+  for name, value in subject(der):
+    if name == "CN":
+      return value
+  return None
+
@@ -0,0 +1,96 @@
+# Copyright 2026 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for wrapper_common.x509."""
+
+import base64
+import unittest
+
+from tools.wrapper_common import asn1_test_utils
+from tools.wrapper_common import x509
+
+# A self-signed certificate with the subject layout of an Apple development
+# certificate, the expected values come from `openssl x509`.
+_CERTIFICATE = base64.b64decode(
+    "MIICdzCCAh2gAwIBAgIUDShSLScaUVBfj7C9R0V+AZZBE3gwCgYIKoZIzj0EAwIw"
+    "gZAxGjAYBgoJkiaJk/IsZAEBDApBQkNERTEyMzQ1MTcwNQYDVQQDDC5BcHBsZSBE"
+    "ZXZlbG9wbWVudDogSmFuZSBBcHBsZXNlZWQgKEFCQ0RFMTIzNDUpMRMwEQYDVQQL"
+    "DApURUFNSUQxMjM0MRcwFQYDVQQKDA5KYW5lIEFwcGxlc2VlZDELMAkGA1UEBhMC"
+    "VVMwHhcNMjYxMDE5MTAxMDI5WhcNMzYxMDE2MTAxMDI5WjCBkDEaMBgGCgmSJomT"
+    "8ixkAQEMCkFCQ0RFMTIzNDUxNzA1BgNVBAMMLkFwcGxlIERldmVsb3BtZW50OiBK"
+    "YW5lIEFwcGxlc2VlZCAoQUJDREUxMjM0NSkxEzARBgNVBAsMClRFQU1JRDEyMzQx"
+    "FzAVBgNVBAoMDkphbmUgQXBwbGVzZWVkMQswCQYDVQQGEwJVUzBZMBMGByqGSM49"
+    "AgEGCCqGSM49AwEHA0IABGR06PamUpt7Nbkzwa5IIUXhf3z6t9qGmy9EoaYSPimN"
+    "sj8nb4yDToHZqleBbODEqnTDuc4gc3f2smYimo1uRUSjUzBRMB0GA1UdDgQWBBSM"
+    "ycnr0ukyrtJWha+0RY51jZ/bUzAfBgNVHSMEGDAWgBSMycnr0ukyrtJWha+0RY51"
+    "jZ/bUzAPBgNVHRMBAf8EBTADAQH/MAoGCCqGSM49BAMCA0gAMEUCIFeoyo2kZ+SR"
+    "UCciYwFyrk14ixs7gdxrSI+dDJ3wquriAiEA6hNm/nGSiw2HSXQsVLGq7G2oeqrh"
+    "CFhlDUpLcGDm28c=")
+_FINGERPRINT = "A5FF43823C315FAE9362E43E294529B6AD1FFA6A"
+
+_der = asn1_test_utils.der
+
+
+def _v1_certificate(name):
+  """Returns a (signature-less) v1 certificate with the given subject."""
+  empty = _der(0x30)
+  tbs_certificate = _der(0x30, _der(0x02, b"\x01"), empty, empty, empty, name)
+  return _der(0x30, tbs_certificate, empty, _der(0x03, b"\x00"))
+
+
+def _attribute(oid, tag, value):
+  return _der(0x31, _der(0x30, _der(0x06, oid), _der(tag, value)))
+
+
+class X509Test(unittest.TestCase):
+
+  def test_fingerprint(self):
+    self.assertEqual(_FINGERPRINT, x509.fingerprint(_CERTIFICATE))
+
+  def test_subject(self):
+    self.assertEqual([
+        ("UID", "ABCDE12345"),
+        ("CN", "Apple Development: Jane Appleseed (ABCDE12345)"),
+        ("OU", "TEAMID1234"),
+        ("O", "Jane Appleseed"),
+        ("C", "US"),
+    ], x509.subject(_CERTIFICATE))
+    self.assertEqual("Apple Development: Jane Appleseed (ABCDE12345)",
+                     x509.common_name(_CERTIFICATE))
+
+  def test_v1_certificate_and_string_types(self):
+    cn = bytes.fromhex("550403")
+    certificate = _v1_certificate(_der(
+        0x30,
+        _attribute(bytes.fromhex("2a03"), 0x13, b"Other"),
+        _attribute(cn, 0x1E, "Développeur".encode("utf-16-be")),
+        _attribute(cn, 0x0C, b"Second")))
+    self.assertEqual([("1.2.3", "Other"), ("CN", "Développeur"),
+                      ("CN", "Second")], x509.subject(certificate))
+    self.assertEqual("Développeur", x509.common_name(certificate))
+
+  def test_no_common_name(self):
+    certificate = _v1_certificate(_der(
+        0x30, _attribute(bytes.fromhex("550406"), 0x13, b"US")))
+    self.assertIsNone(x509.common_name(certificate))
+
+  def test_malformed(self):
+    for data in (b"", b"not a certificate", _CERTIFICATE[:100],
+                 _v1_certificate(_der(0x30, _der(0x31, _der(0x30))))):
+      with self.subTest(data=data):
+        with self.assertRaises(x509.X509Error):
+          x509.subject(data)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -3,6 +3,7 @@
 import shutil
 import logging
 from lib.shell import shell
+from tools.wrapper_common import macho
 
 
 class LipoUtil:
@@ -19,6 +20,10 @@ class LipoUtil:
 
     def current_archs(self, binary: str) -> list:
         "Returns the list of architectures in the given binary."
+        try:
+            return macho.read_archs(binary)
+        except macho.MachOError:
+            pass
         archs = self.info(binary)
         try:
             return archs.split("is architecture: ")[1].split()
@@ -27,6 +32,11 @@ class LipoUtil:
 
     def extract_or_thin(self, binary: str, archs: list[str]):
         "Keeps only the given archs in the given binary."
+        try:
+            macho.extract_archs(binary, archs, binary)
+            return
+        except macho.MachOError:
+            pass
         cmd = [self.lipo_path, binary]
         if len(archs) == 1:
             cmd.extend(["-thin", archs[0]])